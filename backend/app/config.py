@@ -4,15 +4,34 @@ CliniqAI Backend Configuration
 import os
 from pathlib import Path
 
-# Base directory
-BASE_DIR = Path("D:/cliniqai")
+# Base directory (the repository root unless CLINIQAI_BASE_DIR is set)
+BASE_DIR = Path(os.getenv("CLINIQAI_BASE_DIR", Path(__file__).resolve().parents[2]))
 
 # Database
-DATABASE_URL = "sqlite:///./cliniqai.db"
+DATABASE_URL = os.getenv("CLINIQAI_DATABASE_URL", "sqlite:///./cliniqai.db")
 
 # Models directory
-DIABETES_MODEL_DIR = BASE_DIR / "diabetes_model"
-HEART_MODEL_DIR = BASE_DIR / "heart_model"
+DIABETES_MODEL_DIR = Path(os.getenv("CLINIQAI_DIABETES_MODEL_DIR", BASE_DIR / "diabetes_model"))
+HEART_MODEL_DIR = Path(os.getenv("CLINIQAI_HEART_MODEL_DIR", BASE_DIR / "heart_model"))
+
+# Serve from the pickle-free artifacts built by `python -m app.jobs.build_artifacts` when present
+MODEL_ARTIFACTS_ENABLED = True
+ARTIFACT_VERIFY_CHECKSUMS = True
+
+# Poll the model directories this often and hot reload changed models (0 disables)
+MODEL_WATCH_INTERVAL_SECONDS = 30
+
+# Also warm XGBoost at startup with one matrix too large for the native engine; off by
+# default, since importing and loading it delays readiness that most traffic never needs
+WARMUP_XGBOOST = False
+
+# Candidate models scored in shadow next to production (unset disables shadow mode)
+SHADOW_MODEL_DIRS = {
+    "diabetes": os.getenv("CLINIQAI_DIABETES_SHADOW_DIR"),
+    "heart_disease": os.getenv("CLINIQAI_HEART_SHADOW_DIR"),
+}
+SHADOW_SAMPLE_RATE = 1.0
+SHADOW_MAX_PENDING = 64
 
 # JWT Settings
 SECRET_KEY = "cliniqai-secret-key-change-in-production-2024"
@@ -21,6 +40,51 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
 # API Settings
 API_PREFIX = "/api/v1"
+# Rows per page of the history and patient listings, by default and at most
+LIST_PAGE_DEFAULT = 50
+LIST_PAGE_MAX = 200
+
+# Batch prediction settings
+MAX_BATCH_PREDICTION_ROWS = 5000
+
+# Result cache settings (scored + explained inputs, keyed by model version and features)
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = 60 * 60
+
+# What-if sweeps: largest grid scored in one request and most steps per swept feature
+WHAT_IF_SWEEP_MAX_POINTS = 10000
+WHAT_IF_SWEEP_MAX_STEPS = 201
+
+# What-if sessions: each user's scored patient, kept so edits only re-evaluate the splits they touch
+WHAT_IF_SESSION_MAX = 256
+WHAT_IF_SESSION_TTL_SECONDS = 15 * 60
+# Counterfactual search: latency budget, candidate grid size and steps per input
+COUNTERFACTUAL_BUDGET_MS = 200
+COUNTERFACTUAL_MAX_CANDIDATES = 50000
+COUNTERFACTUAL_MAX_STEPS = 16
+
+# What-if WebSocket: time allowed for the opening message that carries the JWT
+WHAT_IF_WS_AUTH_TIMEOUT_SECONDS = 10
+
+# Micro-batching of concurrent single-patient requests
+MICRO_BATCH_ENABLED = True
+MICRO_BATCH_WINDOW_MS = 3
+MICRO_BATCH_MAX_ROWS = 64
+MICRO_BATCH_MAX_QUEUE = 1024
+
+# Deferred explanations (explain=deferred): rows explained per background batch,
+# and how long an SSE stream waits before sending a keep-alive
+DEFERRED_EXPLAIN_MAX_ROWS = 64
+DEFERRED_EXPLAIN_MAX_QUEUE = 10000
+EXPLANATION_STREAM_KEEPALIVE_SECONDS = 15
+
+# Where CPU-bound SHAP, bootstrap intervals and PDF rendering run: "inline", "thread" or "process".
+# Scoring itself stays in the serving process; its native engine is too quick to be worth a hop
+INFERENCE_BACKEND = "inline"
+INFERENCE_WORKERS = os.cpu_count() or 1
+# Matrices are split across workers only in chunks of at least this many rows
+INFERENCE_MIN_CHUNK_ROWS = 64
 
 # CORS
 CORS_ORIGINS = [
@@ -33,3 +97,23 @@ CORS_ORIGINS = [
 # Bootstrap settings for confidence intervals
 BOOTSTRAP_ITERATIONS = 100
 CONFIDENCE_LEVEL = 0.95
+# Rows traversed together through every replica tree, bounding temporary memory
+BOOTSTRAP_CHUNK_ELEMENTS = 1 << 20
+# Larger calls keep the fixed-width interval: replicas cost about 4 ms per row at N=100
+BOOTSTRAP_MAX_ROWS = 256
+
+# Split-conformal intervals (python -m app.jobs.calibrate_conformal)
+CONFORMAL_DEFAULT_COVERAGE = 0.9
+CONFORMAL_CALIBRATION_FRACTION = 0.2
+
+# Population percentiles (python -m app.jobs.build_population_index)
+# Lower edges of the age bands peers are grouped by, together with gender
+POPULATION_AGE_BANDS = (30, 40, 50, 60, 70)
+POPULATION_MIN_GROUP_ROWS = 200
+
+# Probability calibration (python -m app.jobs.calibrate_probabilities)
+CALIBRATION_METHOD = "isotonic"
+CALIBRATION_FIT_FRACTION = 0.5
+# Models retrained for the out-of-fold probabilities the map is fitted on
+CALIBRATION_FOLDS = 5
+CALIBRATION_CURVE_BINS = 10
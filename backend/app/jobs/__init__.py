@@ -0,0 +1 @@
+# CliniqAI Offline Jobs
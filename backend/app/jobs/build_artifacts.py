@@ -0,0 +1,31 @@
+"""
+CliniqAI Artifact Build Job
+
+Converts each model's pickles into a versioned, pickle-free artifact
+directory (UBJSON booster, scaler parameters, .npy tree arrays and SHAP
+tables, manifest with checksums) that serving memory-maps:
+
+    python -m app.jobs.build_artifacts
+"""
+from ..services.artifacts import write_artifact
+from ..services.model_bundle import DISEASE_TYPES, load_bundle, source_files
+
+
+def build_artifacts():
+    """Write <model_dir>/artifacts/<version>/ for every model and point LATEST at it"""
+    for disease_type in DISEASE_TYPES:
+        # Always start from the pickles, never from a previously built artifact
+        bundle = load_bundle(disease_type, use_artifacts=False)
+        if not bundle.can_predict or bundle.engine is None:
+            print(f"Skipping {disease_type}: model, scaler or tree engine could not be loaded")
+            continue
+        path = write_artifact(
+            bundle.model_dir, disease_type, bundle.base_version, bundle.config,
+            bundle.model, bundle.scaler, bundle.engine,
+            source_files(disease_type, bundle.model_dir)
+        )
+        print(f"Built {disease_type} artifact {bundle.base_version} at {path}")
+
+
+if __name__ == "__main__":
+    build_artifacts()
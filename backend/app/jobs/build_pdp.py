@@ -0,0 +1,107 @@
+"""
+CliniqAI Partial Dependence Job
+
+Computes partial-dependence and ICE curves for every input of both models
+over a random sample of the bundled datasets, one feature per worker
+process, and stores them for `/predictions/info/{disease_type}/pdp`:
+
+    python -m app.jobs.build_pdp [--sample N] [--grid G] [--ice K] [--workers W]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..services import pdp
+from ..services.model_bundle import DISEASE_TYPES, MODEL_DIRS, get_bundle
+from .datasets import load_dataset
+
+DEFAULT_SAMPLE = 2000
+DEFAULT_GRID = 20
+DEFAULT_ICE = 50
+SEED = 0
+
+# Per-process state of pool workers: the sample of each disease, encoded once
+_worker_samples: Dict[str, Tuple[List[Dict[str, Any]], np.ndarray]] = {}
+
+
+def _init_worker(samples: Dict[str, List[Dict[str, Any]]], model_dirs: Dict[str, str]):
+    MODEL_DIRS.update({disease_type: Path(path) for disease_type, path in model_dirs.items()})
+    for disease_type, rows in samples.items():
+        _worker_samples[disease_type] = (rows, get_bundle(disease_type).encode_batch(rows))
+
+
+def _compute(disease_type: str, name: str, grid: List[Any], n_ice: int) -> Tuple[np.ndarray, np.ndarray]:
+    rows, X = _worker_samples[disease_type]
+    return pdp.compute_feature(get_bundle(disease_type), rows, X, name, grid, n_ice)
+
+
+def sample_rows(disease_type: str, sample_size: int) -> List[Dict[str, Any]]:
+    """A reproducible random sample of a model's dataset"""
+    rows, _ = load_dataset(disease_type, get_bundle(disease_type).model_dir)
+    if len(rows) <= sample_size:
+        return rows
+    chosen = np.random.default_rng(SEED).choice(len(rows), size=sample_size, replace=False)
+    return [rows[i] for i in np.sort(chosen)]
+
+
+def build_pdp(
+    sample_size: int = DEFAULT_SAMPLE,
+    grid_points: int = DEFAULT_GRID,
+    n_ice: int = DEFAULT_ICE,
+    workers: Optional[int] = None
+):
+    """Compute and store the curves of every feature of every loaded model"""
+    workers = workers or os.cpu_count() or 1
+    samples = {}
+    for disease_type in DISEASE_TYPES:
+        bundle = get_bundle(disease_type)
+        if not bundle.can_predict:
+            print(f"Skipping {disease_type}: model could not be loaded")
+            continue
+        samples[disease_type] = sample_rows(disease_type, sample_size)
+
+    jobs = []
+    for disease_type, rows in samples.items():
+        for feature in pdp.features(get_bundle(disease_type)):
+            jobs.append((disease_type, feature, pdp.feature_grid(rows, feature[0], feature[2], grid_points)))
+
+    started = time.perf_counter()
+    if workers > 1:
+        # spawn keeps workers free of the parent's XGBoost thread pool
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(samples, {disease_type: str(path) for disease_type, path in MODEL_DIRS.items()})
+        ) as pool:
+            futures = [pool.submit(_compute, disease_type, feature[0], grid, n_ice) for disease_type, feature, grid in jobs]
+            results = [future.result() for future in futures]
+    else:
+        _init_worker(samples, {})
+        results = [_compute(disease_type, feature[0], grid, n_ice) for disease_type, feature, grid in jobs]
+
+    for disease_type, rows in samples.items():
+        curves = [
+            (feature, grid, pd, ice)
+            for (job_disease, feature, grid), (pd, ice) in zip(jobs, results)
+            if job_disease == disease_type
+        ]
+        path = pdp.write_pdp(get_bundle(disease_type), len(rows), curves)
+        print(f"Built {disease_type} curves for {len(curves)} features over {len(rows)} rows at {path}")
+    print(f"Scored curves in {time.perf_counter() - started:.1f} s on {workers} worker(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sample", type=int, default=DEFAULT_SAMPLE, help="Dataset rows to average over")
+    parser.add_argument("--grid", type=int, default=DEFAULT_GRID, help="Most grid points per numeric feature")
+    parser.add_argument("--ice", type=int, default=DEFAULT_ICE, help="Sampled patients to keep ICE curves for")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+    build_pdp(args.sample, args.grid, args.ice, args.workers)
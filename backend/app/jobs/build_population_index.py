@@ -0,0 +1,72 @@
+"""
+CliniqAI Population Index Job
+
+Scores every row of each bundled dataset with the serving model and stores
+the sorted risks, overall and per gender and age band, for the population
+percentile of every prediction:
+
+    python -m app.jobs.build_population_index [--min-group N]
+"""
+import argparse
+import shutil
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+from ..config import POPULATION_AGE_BANDS, POPULATION_MIN_GROUP_ROWS
+from ..services import model_service
+from ..services.model_bundle import DISEASE_TYPES, get_bundle
+from ..services.population import ALL_GROUP, PopulationIndex, index_path, peer_group
+from .datasets import load_dataset
+
+SCORE_CHUNK_ROWS = 8192
+
+
+def build_population_index(min_group: int = POPULATION_MIN_GROUP_ROWS):
+    """Score and store the population of every loaded model for its current version"""
+    for disease_type in DISEASE_TYPES:
+        bundle = get_bundle(disease_type)
+        if not bundle.can_predict:
+            print(f"Skipping {disease_type}: model could not be loaded")
+            continue
+
+        rows, _ = load_dataset(disease_type, bundle.model_dir)
+        probabilities = np.concatenate([
+            model_service.predict_proba_matrix(bundle, bundle.encode_batch(rows[start:start + SCORE_CHUNK_ROWS]))
+            for start in range(0, len(rows), SCORE_CHUNK_ROWS)
+        ])
+
+        members = defaultdict(list)
+        for i, row in enumerate(rows):
+            members[peer_group(row)].append(i)
+        scores = {ALL_GROUP: probabilities}
+        # Too few rows make a noisy percentile; those patients get the overall one only
+        scores.update({
+            group: probabilities[indices]
+            for group, indices in members.items()
+            if group is not None and len(indices) >= min_group
+        })
+
+        index = PopulationIndex(scores, {
+            "disease_type": disease_type,
+            "model_version": bundle.version,
+            "age_bands": list(POPULATION_AGE_BANDS),
+            "min_group_rows": min_group,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+        # Written beside the target and renamed, so serving never loads half an index
+        path = index_path(bundle)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        index.save(tmp)
+        shutil.rmtree(path, ignore_errors=True)
+        tmp.rename(path)
+        print(f"Indexed {len(rows)} {disease_type} risks in {len(scores) - 1} peer groups at {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min-group", type=int, default=POPULATION_MIN_GROUP_ROWS, help="Fewest rows a peer group needs")
+    args = parser.parse_args()
+    build_population_index(args.min_group)
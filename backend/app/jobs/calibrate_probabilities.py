@@ -0,0 +1,138 @@
+"""
+CliniqAI Probability Calibration Job
+
+Fits isotonic (or Platt) regression of each model's outcome on its raw
+probability and stores the resulting lookup table for serving:
+
+    python -m app.jobs.calibrate_probabilities [--method isotonic|platt] [--folds K] [--fraction F] [--seed S]
+
+The serving model's train/test split is not recorded, and its outputs on
+rows it was trained on are overconfident. So the map is fitted on
+out-of-fold probabilities instead: K models are retrained with the serving
+model's hyperparameters, each scoring the fold it did not see. A seeded
+share of those rows fits the map and the rest evaluate it.
+
+A calibrated model serves under a new version, so reload the models and
+rerun the jobs whose tables hold served probabilities (calibrate_conformal,
+build_population_index, build_pdp) afterwards.
+"""
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from ..config import CALIBRATION_METHOD, CALIBRATION_FIT_FRACTION, CALIBRATION_FOLDS, CALIBRATION_CURVE_BINS
+from ..services.calibration import ProbabilityCalibration, calibration_path, reliability_curve
+from ..services.model_bundle import DISEASE_TYPES, get_bundle
+from .datasets import load_dataset
+from .train_bootstrap import training_params
+
+# Platt tables are sampled at this many points, evenly spaced in margin
+PLATT_KNOTS = 257
+PLATT_MARGIN_RANGE = 12.0
+# A finite sample never supports a risk of exactly 0 or 1
+RISK_FLOOR = 1e-3
+
+
+def fit_isotonic(probabilities: np.ndarray, labels: np.ndarray):
+    from sklearn.isotonic import IsotonicRegression
+    iso = IsotonicRegression(y_min=RISK_FLOOR, y_max=1.0 - RISK_FLOOR, out_of_bounds="clip").fit(probabilities, labels)
+    return iso.X_thresholds_, iso.y_thresholds_
+
+
+def fit_platt(probabilities: np.ndarray, labels: np.ndarray):
+    from sklearn.linear_model import LogisticRegression
+    eps = 1e-7
+    clipped = np.clip(probabilities, eps, 1 - eps)
+    logit = np.log(clipped / (1 - clipped))[:, None]
+    platt = LogisticRegression(C=1e6).fit(logit, labels)
+    margins = np.linspace(-PLATT_MARGIN_RANGE, PLATT_MARGIN_RANGE, PLATT_KNOTS)
+    x = 1.0 / (1.0 + np.exp(-margins))
+    y = np.clip(platt.predict_proba(margins[:, None])[:, 1], RISK_FLOOR, 1.0 - RISK_FLOOR)
+    return x, y
+
+
+FITS = {"isotonic": fit_isotonic, "platt": fit_platt}
+
+
+def out_of_fold_probabilities(bundle, X: np.ndarray, y: np.ndarray, folds: int, rng) -> np.ndarray:
+    """Raw probability of every row from a model with the serving hyperparameters that never saw it"""
+    import xgboost
+
+    booster = bundle.model.get_booster()
+    params = training_params(booster)
+    n_rounds = booster.num_boosted_rounds()
+    fold = rng.permutation(len(X)) % folds
+    probabilities = np.empty(len(X), dtype=np.float64)
+    for k in range(folds):
+        train, held_out = fold != k, fold == k
+        dtrain = xgboost.DMatrix(X[train], label=y[train], feature_names=bundle.feature_cols)
+        model = xgboost.train(params, dtrain, num_boost_round=n_rounds)
+        probabilities[held_out] = model.predict(xgboost.DMatrix(X[held_out], feature_names=bundle.feature_cols))
+    return probabilities
+
+
+def brier(probabilities: np.ndarray, labels: np.ndarray) -> float:
+    return round(float(np.mean((probabilities - labels) ** 2)), 5)
+
+
+def calibrate_probabilities(
+    method: str = CALIBRATION_METHOD,
+    fraction: float = CALIBRATION_FIT_FRACTION,
+    folds: int = CALIBRATION_FOLDS,
+    seed: int = 0
+):
+    """Fit, evaluate and store the calibration table of every loaded model"""
+    rng = np.random.default_rng(seed)
+    for disease_type in DISEASE_TYPES:
+        bundle = get_bundle(disease_type)
+        if not bundle.can_predict:
+            print(f"Skipping {disease_type}: model could not be loaded")
+            continue
+
+        rows, y = load_dataset(disease_type, bundle.model_dir)
+        y = y.astype(np.float64)
+        raw = out_of_fold_probabilities(bundle, bundle.encode_batch(rows), y, folds, rng)
+
+        order = rng.permutation(len(raw))
+        n_fit = max(1, int(len(raw) * fraction))
+        fit, held_out = order[:n_fit], order[n_fit:]
+        if not len(held_out):
+            # Nothing left to evaluate on; report the fit rows instead
+            held_out = fit
+
+        knots_x, knots_y = FITS[method](raw[fit], y[fit])
+        calibration = ProbabilityCalibration(knots_x, knots_y, {
+            "disease_type": disease_type,
+            "model_version": bundle.base_version,
+            "method": method,
+            "folds": folds,
+            "fit_rows": int(len(fit)),
+            "evaluation_rows": int(len(held_out)),
+            "seed": seed,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+        calibrated = calibration.apply(raw[held_out])
+        calibration.meta.update({
+            "brier_raw": brier(raw[held_out], y[held_out]),
+            "brier_calibrated": brier(calibrated, y[held_out]),
+            "raw_curve": reliability_curve(raw[held_out], y[held_out], CALIBRATION_CURVE_BINS),
+            "calibrated_curve": reliability_curve(calibrated, y[held_out], CALIBRATION_CURVE_BINS),
+        })
+
+        path = calibration_path(bundle.model_dir, bundle.base_version)
+        calibration.save(path)
+        print(
+            f"Calibrated {disease_type} {bundle.base_version} ({method}, {len(calibration.x)} knots): Brier "
+            f"{calibration.meta['brier_raw']} -> {calibration.meta['brier_calibrated']} on {len(held_out)} rows at {path}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--method", choices=sorted(FITS), default=CALIBRATION_METHOD)
+    parser.add_argument("--fraction", type=float, default=CALIBRATION_FIT_FRACTION, help="Share of each dataset the map is fitted on")
+    parser.add_argument("--folds", type=int, default=CALIBRATION_FOLDS, help="Models retrained for out-of-fold probabilities")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    calibrate_probabilities(args.method, args.fraction, args.folds, args.seed)
@@ -0,0 +1,68 @@
+"""
+CliniqAI Tree Engine Parity Check
+
+Scores the bundled CSV datasets with both XGBClassifier.predict_proba and
+the native tree engine and fails if any probability differs by more than
+the tolerance:
+
+    python -m app.jobs.check_tree_parity [--limit N] [--tolerance T]
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from ..services.model_bundle import DISEASE_TYPES, BUNDLE_FILES, get_bundle
+from ..services.tree_engine import TreeEnsemble
+from .datasets import load_dataset
+
+DEFAULT_TOLERANCE = 1e-6
+
+
+def check_parity(limit: int = None, tolerance: float = DEFAULT_TOLERANCE) -> bool:
+    """Compare engine and XGBoost probabilities on every dataset row; returns True on parity"""
+    ok = True
+    for disease_type in DISEASE_TYPES:
+        bundle = get_bundle(disease_type)
+        if bundle.model is None:
+            print(f"{disease_type}: model could not be loaded")
+            ok = False
+            continue
+
+        rows, _ = load_dataset(disease_type, bundle.model_dir, limit)
+        X = bundle.encode_batch(rows)
+        model = bundle.model
+        trees_path = bundle.model_dir / BUNDLE_FILES[disease_type]["trees"]
+
+        start = time.perf_counter()
+        expected = model.predict_proba(X)[:, 1]
+        xgb_seconds = time.perf_counter() - start
+
+        engines = [("booster", TreeEnsemble.from_booster(model))]
+        if trees_path.exists():
+            engines.append(("exported", TreeEnsemble.load(trees_path)))
+
+        for source, engine in engines:
+            start = time.perf_counter()
+            actual = engine.predict_proba(X)
+            engine_seconds = time.perf_counter() - start
+
+            max_diff = float(np.max(np.abs(actual - expected)))
+            passed = max_diff <= tolerance
+            ok = ok and passed
+            print(
+                f"{disease_type} [{source}]: {len(rows)} rows, max |diff| = {max_diff:.2e} "
+                f"({'OK' if passed else 'FAIL'}), xgboost {xgb_seconds * 1000:.1f} ms, "
+                f"engine {engine_seconds * 1000:.1f} ms"
+            )
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--limit", type=int, default=None, help="Only score the first N rows of each dataset")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+    sys.exit(0 if check_parity(args.limit, args.tolerance) else 1)
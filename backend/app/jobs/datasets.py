@@ -0,0 +1,86 @@
+"""
+CliniqAI Dataset Loaders - Bundled training CSVs as API-shaped inputs
+"""
+import csv
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..schemas import DiabetesPredictionInput, HeartPredictionInput
+
+DIABETES_DATASET = "diabetes_prediction_dataset.csv"
+HEART_DATASET = "cardio_train.csv"
+
+
+def _in_schema_range(schema, row: Dict[str, Any]) -> bool:
+    """Check numeric fields against the ge/le bounds declared on the input schema"""
+    for name, field in schema.model_fields.items():
+        if name not in row or not isinstance(row[name], float):
+            continue
+        for meta in field.metadata:
+            if getattr(meta, "ge", None) is not None and row[name] < meta.ge:
+                return False
+            if getattr(meta, "le", None) is not None and row[name] > meta.le:
+                return False
+    return True
+
+
+def load_diabetes_dataset(model_dir: Path, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Load diabetes_prediction_dataset.csv as (input dicts, labels)"""
+    rows, labels = [], []
+    with open(Path(model_dir) / DIABETES_DATASET, newline="") as f:
+        for record in csv.DictReader(f):
+            row = {
+                "gender": record["gender"],
+                "age": float(record["age"]),
+                "hypertension": record["hypertension"] == "1",
+                "heart_disease": record["heart_disease"] == "1",
+                # The dataset writes unknown smoking status as "No Info"
+                "smoking_history": "unknown" if record["smoking_history"] == "No Info" else record["smoking_history"],
+                "bmi": float(record["bmi"]),
+                "HbA1c_level": float(record["HbA1c_level"]),
+                "blood_glucose_level": float(record["blood_glucose_level"]),
+            }
+            if not _in_schema_range(DiabetesPredictionInput, row):
+                continue
+            rows.append(row)
+            labels.append(int(record["diabetes"]))
+            if limit and len(rows) >= limit:
+                break
+    return rows, np.asarray(labels, dtype=np.int8)
+
+
+def load_heart_dataset(model_dir: Path, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Load cardio_train.csv as (input dicts, labels), deriving age in years and BMI"""
+    rows, labels = [], []
+    with open(Path(model_dir) / HEART_DATASET, newline="") as f:
+        for record in csv.DictReader(f, delimiter=";"):
+            height_m = float(record["height"]) / 100
+            row = {
+                "age": float(record["age"]) / 365,
+                "gender": "Female" if record["gender"] == "1" else "Male",
+                "ap_hi": float(record["ap_hi"]),
+                "ap_lo": float(record["ap_lo"]),
+                "smoke": record["smoke"] == "1",
+                "alco": record["alco"] == "1",
+                "active": record["active"] == "1",
+                "bmi": float(record["weight"]) / (height_m * height_m),
+            }
+            if not _in_schema_range(HeartPredictionInput, row):
+                continue
+            rows.append(row)
+            labels.append(int(record["cardio"]))
+            if limit and len(rows) >= limit:
+                break
+    return rows, np.asarray(labels, dtype=np.int8)
+
+
+DATASET_LOADERS = {
+    "diabetes": load_diabetes_dataset,
+    "heart_disease": load_heart_dataset,
+}
+
+
+def load_dataset(disease_type: str, model_dir: Path, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Load the bundled training dataset of a disease model"""
+    return DATASET_LOADERS[disease_type](model_dir, limit)
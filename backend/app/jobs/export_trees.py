@@ -0,0 +1,27 @@
+"""
+CliniqAI Tree Export Job
+
+Flattens the pickled XGBoost models into numpy node arrays for the native
+tree engine:
+
+    python -m app.jobs.export_trees
+"""
+from ..services.model_bundle import DISEASE_TYPES, BUNDLE_FILES, get_bundle
+from ..services.tree_engine import TreeEnsemble
+
+
+def export_trees():
+    """Write model_trees.npz / heart_model_trees.npz next to the pickled models"""
+    for disease_type in DISEASE_TYPES:
+        bundle = get_bundle(disease_type)
+        if bundle.model is None:
+            print(f"Skipping {disease_type}: model could not be loaded")
+            continue
+        path = bundle.model_dir / BUNDLE_FILES[disease_type]["trees"]
+        engine = TreeEnsemble.from_booster(bundle.model)
+        engine.save(path)
+        print(f"Exported {engine.n_trees} {disease_type} trees (max depth {engine.max_depth}) to {path}")
+
+
+if __name__ == "__main__":
+    export_trees()
@@ -5,20 +5,37 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from app.config import CORS_ORIGINS
-from app.database import init_db
-from app.routers import auth, predictions, patients, reports
+from app.database import init_db, async_engine
+from app.routers import auth, predictions, patients, reports, models
+from app.services import executor, explanations, metrics, model_registry, shadow, warmup
+from app.services.scheduler import SchedulerBusy
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database and warm up models on startup"""
     init_db()
+    # Load every model before accepting traffic so no request pays the unpickling cost
+    await asyncio.to_thread(warmup.warm_up_models)
+    # Start the configured inference pool; process workers load their own bundles
+    await asyncio.to_thread(executor.start)
+    # Shadow candidates are only loaded when a shadow model directory is configured
+    await asyncio.to_thread(shadow.load_candidates)
+    # Explain predictions left pending by explain=deferred before a restart
+    await asyncio.to_thread(explanations.resume_pending)
+    # Hot reload models whose files change; requests keep using the old bundle until the swap
+    model_registry.start_watcher()
     yield
+    model_registry.stop_watcher()
+    executor.shutdown()
+    await async_engine.dispose()
 
 
 app = FastAPI(
@@ -42,6 +59,13 @@ app.include_router(auth.router, prefix="/api/v1")
 app.include_router(predictions.router, prefix="/api/v1")
 app.include_router(patients.router, prefix="/api/v1")
 app.include_router(reports.router, prefix="/api/v1")
+app.include_router(models.router, prefix="/api/v1")
+
+
+@app.exception_handler(SchedulerBusy)
+def scheduler_busy_handler(request, exc: SchedulerBusy):
+    """Shed load when an inference queue is full instead of queueing without bound"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
 @app.get("/")
@@ -60,6 +84,22 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness endpoint - 200 only once every model is loaded and warm"""
+    readiness = warmup.get_readiness()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content=readiness
+    )
+
+
+@app.get("/metrics")
+def metrics_snapshot():
+    """In-process statistics such as result cache hits, misses and evictions"""
+    return metrics.snapshot()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
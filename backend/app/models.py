@@ -1,7 +1,7 @@
 """
 CliniqAI Database Models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -28,6 +28,11 @@ class User(Base):
 class PatientRecord(Base):
     """Patient record model"""
     __tablename__ = "patient_records"
+    # Newest-first listings page on (created_at, id), for everyone or for one user
+    __table_args__ = (
+        Index("ix_patient_records_created_at_id", "created_at", "id"),
+        Index("ix_patient_records_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -45,6 +50,11 @@ class PatientRecord(Base):
 class Prediction(Base):
     """Prediction model"""
     __tablename__ = "predictions"
+    # Newest-first listings page on (created_at, id), for everyone or for one user
+    __table_args__ = (
+        Index("ix_predictions_created_at_id", "created_at", "id"),
+        Index("ix_predictions_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -57,15 +67,50 @@ class Prediction(Base):
     confidence_interval_low = Column(Float, nullable=False)
     confidence_interval_high = Column(Float, nullable=False)
     
-    # SHAP values
+    # Split-conformal interval at the requested coverage, and the calibration table it came from
+    conformal_interval_low = Column(Float, nullable=True)
+    conformal_interval_high = Column(Float, nullable=True)
+    conformal_coverage = Column(Float, nullable=True)
+    conformal_version = Column(String, nullable=True)
+    
+    # SHAP values and clinical explanation; "pending" until a deferred explanation is filled in
     shap_values = Column(JSON, nullable=True)
+    clinical_explanation = Column(Text, nullable=True)
+    explanation_status = Column(String, nullable=True)  # "pending", "ready" or "failed"
     
     # Input data (snapshot)
     input_data = Column(JSON, nullable=False)
     
+    # Version of the model bundle that produced this prediction
+    model_version = Column(String, nullable=True)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="predictions")
     patient_record = relationship("PatientRecord", back_populates="predictions")
+
+
+class ShadowComparison(Base):
+    """Production and shadow candidate scores for one patient"""
+    __tablename__ = "shadow_comparisons"
+
+    id = Column(Integer, primary_key=True, index=True)
+    disease_type = Column(String, nullable=False, index=True)
+    production_version = Column(String, nullable=False)
+    candidate_version = Column(String, nullable=False, index=True)
+
+    # Scores and the risk categories they fall into
+    production_probability = Column(Float, nullable=False)
+    candidate_probability = Column(Float, nullable=False)
+    delta = Column(Float, nullable=False)
+    production_category = Column(String, nullable=False)
+    candidate_category = Column(String, nullable=False)
+
+    # Per-row latency of each model on the same encoded batch
+    production_latency_ms = Column(Float, nullable=False)
+    candidate_latency_ms = Column(Float, nullable=False)
+    batch_size = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,60 @@
+"""
+CliniqAI Models Router
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+import asyncio
+
+from ..models import User
+from ..auth import get_current_user
+from ..services import model_registry, shadow
+from ..services.model_bundle import DISEASE_TYPES
+
+router = APIRouter(prefix="/models", tags=["Models"])
+
+
+@router.get("")
+def get_models(current_user: User = Depends(get_current_user)):
+    """Serving version of each model and the outcome of its latest reload"""
+    return model_registry.get_registry_status()
+
+
+@router.post("/{disease_type}/reload")
+async def reload_model(
+    disease_type: str,
+    force: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    """Load, smoke test and swap in a model's current files - doctors only"""
+    if current_user.role != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can reload models")
+    if disease_type not in DISEASE_TYPES:
+        raise HTTPException(status_code=404, detail="Disease type not found")
+
+    # Requests keep being served by the current bundle while the new one loads
+    return await asyncio.to_thread(model_registry.reload_model, disease_type, force)
+
+
+@router.get("/{disease_type}/shadow")
+async def get_shadow_report(
+    disease_type: str,
+    candidate_version: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Score deltas, risk category agreement and latency of the shadow candidate against production"""
+    if disease_type not in DISEASE_TYPES:
+        raise HTTPException(status_code=404, detail="Disease type not found")
+    return await asyncio.to_thread(shadow.get_report, disease_type, candidate_version)
+
+
+@router.post("/{disease_type}/shadow/reload")
+async def reload_shadow_candidate(
+    disease_type: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Load and smoke test the candidate from its configured directory - doctors only"""
+    if current_user.role != "doctor":
+        raise HTTPException(status_code=403, detail="Only doctors can reload models")
+    if disease_type not in DISEASE_TYPES:
+        raise HTTPException(status_code=404, detail="Disease type not found")
+    return await asyncio.to_thread(shadow.load_candidate, disease_type)
@@ -1,16 +1,20 @@
 """
 CliniqAI Patients Router
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional
 
+from ..config import LIST_PAGE_DEFAULT, LIST_PAGE_MAX
 from ..database import get_db
+from ..pagination import keyset_page, split_page
 from ..models import User, PatientRecord, Prediction
 from ..schemas import (
     PatientRecordCreate,
     PatientRecordResponse,
-    PatientRecordList,
+    PatientRecordPage,
     PatientComparisonRequest,
     PatientComparisonResponse,
     PredictionResponse
@@ -20,29 +24,44 @@ from ..auth import get_current_user
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
 
-@router.get("/", response_model=List[PatientRecordList])
-def get_patients(
+@router.get("/", response_model=PatientRecordPage)
+async def get_patients(
+    limit: int = Query(LIST_PAGE_DEFAULT, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    disease_type: Optional[str] = Query(None, pattern="^(diabetes|heart_disease)$"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all patient records - doctors see all, patients see their own"""
-    if current_user.role == "doctor":
-        # Doctors can see all patient records
-        patients = db.query(PatientRecord).order_by(PatientRecord.created_at.desc()).all()
-    else:
+    """
+    Patient records, newest first, one page at a time - doctors see all,
+    patients see their own. Pass next_cursor back as ?cursor= for the next page.
+    """
+    # Only the listed columns; input_data stays in the database
+    query = select(
+        PatientRecord.id,
+        PatientRecord.user_id,
+        PatientRecord.patient_name,
+        PatientRecord.disease_type,
+        PatientRecord.created_at
+    )
+    if current_user.role != "doctor":
         # Patients can only see their own records
-        patients = db.query(PatientRecord).filter(
-            PatientRecord.user_id == current_user.id
-        ).order_by(PatientRecord.created_at.desc()).all()
+        query = query.where(PatientRecord.user_id == current_user.id)
+    if disease_type:
+        query = query.where(PatientRecord.disease_type == disease_type)
+    rows = (await db.execute(
+        keyset_page(query, PatientRecord.created_at, PatientRecord.id, cursor, limit)
+    )).all()
     
-    return patients
+    rows, next_cursor = split_page(rows, limit)
+    return PatientRecordPage(items=[dict(row._mapping) for row in rows], next_cursor=next_cursor)
 
 
 @router.post("/", response_model=PatientRecordResponse)
-def create_patient_record(
+async def create_patient_record(
     record_data: PatientRecordCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new patient record"""
     record = PatientRecord(
@@ -53,23 +72,27 @@ def create_patient_record(
     )
     
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await db.commit()
+    # Load predictions too; async sessions cannot lazy-load them during serialization
+    await db.refresh(record, attribute_names=["predictions"])
     
     return record
 
 
 @router.get("/{record_id}", response_model=PatientRecordResponse)
-def get_patient_record(
+async def get_patient_record(
     record_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific patient record"""
-    record = db.query(PatientRecord).filter(
-        PatientRecord.id == record_id,
-        PatientRecord.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(PatientRecord).where(
+            PatientRecord.id == record_id,
+            PatientRecord.user_id == current_user.id
+        ).options(selectinload(PatientRecord.predictions))
+    )
+    record = result.scalar_one_or_none()
     
     if not record:
         raise HTTPException(status_code=404, detail="Patient record not found")
@@ -78,43 +101,39 @@ def get_patient_record(
 
 
 @router.post("/compare", response_model=PatientComparisonResponse)
-def compare_patients(
+async def compare_patients(
     request: PatientComparisonRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Compare two patient records - doctors can compare any, patients can only compare their own"""
     # Doctors can compare any patients, patients can only compare their own
-    if current_user.role == "doctor":
-        record1 = db.query(PatientRecord).filter(
-            PatientRecord.id == request.record_id_1
-        ).first()
-        
-        record2 = db.query(PatientRecord).filter(
-            PatientRecord.id == request.record_id_2
-        ).first()
-    else:
-        record1 = db.query(PatientRecord).filter(
-            PatientRecord.id == request.record_id_1,
-            PatientRecord.user_id == current_user.id
-        ).first()
-        
-        record2 = db.query(PatientRecord).filter(
-            PatientRecord.id == request.record_id_2,
-            PatientRecord.user_id == current_user.id
-        ).first()
+    async def get_record(record_id: int):
+        query = select(PatientRecord).where(PatientRecord.id == record_id).options(
+            selectinload(PatientRecord.predictions)
+        )
+        if current_user.role != "doctor":
+            query = query.where(PatientRecord.user_id == current_user.id)
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+    
+    record1 = await get_record(request.record_id_1)
+    record2 = await get_record(request.record_id_2)
     
     if not record1 or not record2:
         raise HTTPException(status_code=404, detail="Patient record not found")
     
     # Get latest predictions for each record
-    pred1 = db.query(Prediction).filter(
-        Prediction.patient_record_id == record1.id
-    ).order_by(Prediction.created_at.desc()).first()
+    async def get_latest_prediction(record_id: int):
+        result = await db.execute(
+            select(Prediction).where(
+                Prediction.patient_record_id == record_id
+            ).order_by(Prediction.created_at.desc()).limit(1)
+        )
+        return result.scalar_one_or_none()
     
-    pred2 = db.query(Prediction).filter(
-        Prediction.patient_record_id == record2.id
-    ).order_by(Prediction.created_at.desc()).first()
+    pred1 = await get_latest_prediction(record1.id)
+    pred2 = await get_latest_prediction(record2.id)
     
     if not pred1 or not pred2:
         raise HTTPException(
@@ -139,9 +158,11 @@ def compare_patients(
             risk_category=pred1.risk_category,
             confidence_interval_low=pred1.confidence_interval_low,
             confidence_interval_high=pred1.confidence_interval_high,
-            shap_values=pred1.shap_values,
-            clinical_explanation="",
+            shap_values=pred1.shap_values or [],
+            clinical_explanation=pred1.clinical_explanation or "",
             disease_type=pred1.disease_type,
+            model_version=pred1.model_version,
+            explanation_status=pred1.explanation_status,
             created_at=pred1.created_at
         ),
         prediction_2=PredictionResponse(
@@ -149,9 +170,11 @@ def compare_patients(
             risk_category=pred2.risk_category,
             confidence_interval_low=pred2.confidence_interval_low,
             confidence_interval_high=pred2.confidence_interval_high,
-            shap_values=pred2.shap_values,
-            clinical_explanation="",
+            shap_values=pred2.shap_values or [],
+            clinical_explanation=pred2.clinical_explanation or "",
             disease_type=pred2.disease_type,
+            model_version=pred2.model_version,
+            explanation_status=pred2.explanation_status,
             created_at=pred2.created_at
         ),
         differences=differences
@@ -159,24 +182,28 @@ def compare_patients(
 
 
 @router.get("/{record_id}/predictions", response_model=List[PredictionResponse])
-def get_patient_predictions(
+async def get_patient_predictions(
     record_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all predictions for a patient record"""
     # Verify record belongs to user
-    record = db.query(PatientRecord).filter(
+    result = await db.execute(select(PatientRecord.id).where(
         PatientRecord.id == record_id,
         PatientRecord.user_id == current_user.id
-    ).first()
+    ))
+    record = result.scalar_one_or_none()
     
     if not record:
         raise HTTPException(status_code=404, detail="Patient record not found")
     
-    predictions = db.query(Prediction).filter(
-        Prediction.patient_record_id == record_id
-    ).order_by(Prediction.created_at.desc()).all()
+    result = await db.execute(
+        select(Prediction).where(
+            Prediction.patient_record_id == record_id
+        ).order_by(Prediction.created_at.desc())
+    )
+    predictions = result.scalars().all()
     
     return [
         PredictionResponse(
@@ -185,9 +212,11 @@ def get_patient_predictions(
             risk_category=p.risk_category,
             confidence_interval_low=p.confidence_interval_low,
             confidence_interval_high=p.confidence_interval_high,
-            shap_values=p.shap_values,
-            clinical_explanation="",
+            shap_values=p.shap_values or [],
+            clinical_explanation=p.clinical_explanation or "",
             disease_type=p.disease_type,
+            model_version=p.model_version,
+            explanation_status=p.explanation_status,
             created_at=p.created_at
         )
         for p in predictions
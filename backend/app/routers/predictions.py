@@ -1,87 +1,154 @@
 """
 CliniqAI Predictions Router
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from typing import Dict, Any, List, Optional
+import asyncio
 
-from ..database import get_db
+from ..config import (
+    DEFERRED_EXPLAIN_MAX_QUEUE,
+    EXPLANATION_STREAM_KEEPALIVE_SECONDS,
+    WHAT_IF_WS_AUTH_TIMEOUT_SECONDS,
+    COUNTERFACTUAL_BUDGET_MS,
+    CONFORMAL_DEFAULT_COVERAGE,
+    LIST_PAGE_DEFAULT,
+    LIST_PAGE_MAX,
+)
+from ..database import get_db, AsyncSessionLocal
+from ..pagination import keyset_page, split_page
 from ..models import User, Prediction, PatientRecord
 from ..schemas import (
     DiabetesPredictionInput,
     HeartPredictionInput,
+    DiabetesBatchPredictionInput,
+    HeartBatchPredictionInput,
+    PREDICTION_INPUT_MODELS,
     PredictionResponse,
+    PredictionHistoryPage,
+    PredictionHistorySummary,
     WhatIfPredictionRequest,
+    WhatIfSweepRequest,
+    WhatIfSweepResponse,
+    ExplainBatchRequest,
+    ExplainBatchResponse,
+    ExplanationResponse,
+    CounterfactualResponse,
+    PDPResponse,
+    CalibrationCurveResponse,
     ModelInfoResponse
 )
-from ..auth import get_current_user
-from ..services import model_service, shap_service
+from ..auth import get_current_user, authenticate_token
+from ..services import model_service, inference, explanations, shadow, what_if, counterfactual, pdp, conformal, population
+from ..services.model_bundle import get_bundle
+from ..services.scheduler import SchedulerBusy
 
 router = APIRouter(prefix="/predictions", tags=["Predictions"])
 
+RISK_LEVELS = {
+    "Low": "0-30%",
+    "Moderate": "30-50%",
+    "High": "50-70%",
+    "Critical": "70-100%"
+}
 
-@router.post("/diabetes", response_model=PredictionResponse)
-def predict_diabetes(
-    input_data: DiabetesPredictionInput,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Make diabetes prediction"""
+# Columns of a history listing; the JSON inputs and SHAP values stay in the database
+HISTORY_COLUMNS = (
+    Prediction.id,
+    Prediction.risk_probability,
+    Prediction.risk_category,
+    Prediction.confidence_interval_low,
+    Prediction.confidence_interval_high,
+    Prediction.conformal_interval_low,
+    Prediction.conformal_interval_high,
+    Prediction.conformal_coverage,
+    Prediction.conformal_version,
+    Prediction.disease_type,
+    Prediction.model_version,
+    Prediction.explanation_status,
+    Prediction.created_at,
+)
+
+COVERAGE_QUERY = Query(
+    None, gt=0, lt=1,
+    description=f"Coverage of the conformal interval (default {CONFORMAL_DEFAULT_COVERAGE})"
+)
+
+
+async def _predict_single(
+    disease_type: str,
+    input_data: Any,
+    explain: str,
+    coverage: Optional[float],
+    background_tasks: BackgroundTasks,
+    current_user: User,
+    db: AsyncSession
+) -> PredictionResponse:
+    """Score one patient and save it; with explain=deferred the SHAP values are filled in later"""
     # Convert input to dict
     data = input_data.model_dump()
     
     # Get patient name from input
     patient_name = data.pop('patient_name', 'Unknown Patient')
     
-    # Get prediction
-    probability, threshold = model_service.predict_diabetes(data)
+    if explain == "deferred":
+        if explanations.queue_depth() >= DEFERRED_EXPLAIN_MAX_QUEUE:
+            raise SchedulerBusy("deferred explanation queue is full")
+        # Risk only; the explanation follows from the background worker
+        result = (await inference.score_risk_async(disease_type, [data]))[0]
+    else:
+        # Score and explain in one pass, or reuse the result for an identical input
+        result = (await inference.score_rows_async(disease_type, [data]))[0]
+    # A shadow candidate, if any, scores the same input after the response is sent
+    shadow.schedule(background_tasks, disease_type, [data], [result], RISK_LEVELS)
+    probability = result["risk_probability"]
+    shap_values = result["shap_values"]
+    ci_low, ci_high = result["confidence_interval_low"], result["confidence_interval_high"]
+    clinical_explanation = result["clinical_explanation"]
+    pending = shap_values is None
+    interval = conformal.intervals(disease_type, result["model_version"], [probability], coverage)[0]
+    rank = population.percentiles(disease_type, result["model_version"], [probability], [data])[0]
     
     # Get risk category
-    risk_category = model_service.get_risk_category(probability, {
-        "Low": "0-30%",
-        "Moderate": "30-50%",
-        "High": "50-70%",
-        "Critical": "70-100%"
-    })
-    
-    # Get confidence interval
-    ci_low, ci_high = shap_service.calculate_confidence_interval(probability)
-    
-    # Get SHAP values
-    shap_values = shap_service.generate_shap_values_diabetes(data)
-    
-    # Get clinical explanation
-    clinical_explanation = shap_service.generate_clinical_explanation(
-        "diabetes", probability, shap_values, data
-    )
+    risk_category = model_service.get_risk_category(probability, RISK_LEVELS)
     
     # Create patient record first
     patient_record = PatientRecord(
         user_id=current_user.id,
         patient_name=patient_name,
-        disease_type="diabetes",
+        disease_type=disease_type,
         input_data=data
     )
     db.add(patient_record)
-    db.commit()
-    db.refresh(patient_record)
+    await db.commit()
+    await db.refresh(patient_record)
     
     # Create prediction record with patient_record_id
     prediction = Prediction(
         user_id=current_user.id,
         patient_record_id=patient_record.id,
-        disease_type="diabetes",
+        disease_type=disease_type,
         risk_probability=probability,
         risk_category=risk_category,
         confidence_interval_low=ci_low,
         confidence_interval_high=ci_high,
         shap_values=shap_values,
-        input_data=data
+        clinical_explanation=clinical_explanation,
+        explanation_status=explanations.PENDING if pending else explanations.READY,
+        input_data=data,
+        model_version=result["model_version"],
+        **interval
     )
     
     db.add(prediction)
-    db.commit()
-    db.refresh(prediction)
+    await db.commit()
+    await db.refresh(prediction)
+    
+    if pending:
+        explanations.submit(prediction.id, disease_type, data, prediction.model_version)
     
     return PredictionResponse(
         id=prediction.id,
@@ -89,166 +156,459 @@ def predict_diabetes(
         risk_category=risk_category,
         confidence_interval_low=ci_low,
         confidence_interval_high=ci_high,
-        shap_values=shap_values,
-        clinical_explanation=clinical_explanation,
-        disease_type="diabetes",
+        **interval,
+        **rank,
+        shap_values=shap_values or [],
+        clinical_explanation=clinical_explanation or "",
+        disease_type=disease_type,
+        model_version=prediction.model_version,
+        explanation_status=prediction.explanation_status,
         created_at=prediction.created_at
     )
 
 
+@router.post("/diabetes", response_model=PredictionResponse)
+async def predict_diabetes(
+    input_data: DiabetesPredictionInput,
+    background_tasks: BackgroundTasks,
+    explain: str = Query("inline", pattern="^(inline|deferred)$"),
+    coverage: Optional[float] = COVERAGE_QUERY,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Make diabetes prediction; explain=deferred returns the risk first and the SHAP values later"""
+    return await _predict_single("diabetes", input_data, explain, coverage, background_tasks, current_user, db)
+
+
 @router.post("/heart_disease", response_model=PredictionResponse)
-def predict_heart_disease(
+async def predict_heart_disease(
     input_data: HeartPredictionInput,
+    background_tasks: BackgroundTasks,
+    explain: str = Query("inline", pattern="^(inline|deferred)$"),
+    coverage: Optional[float] = COVERAGE_QUERY,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Make heart disease prediction"""
-    # Convert input to dict
-    data = input_data.model_dump()
-    
-    # Get patient name from input
-    patient_name = data.pop('patient_name', 'Unknown Patient')
-    
-    # Get prediction
-    probability, threshold = model_service.predict_heart_disease(data)
-    
-    # Get risk category
-    risk_category = model_service.get_risk_category(probability, {
-        "Low": "0-30%",
-        "Moderate": "30-50%",
-        "High": "50-70%",
-        "Critical": "70-100%"
-    })
+    """Make heart disease prediction; explain=deferred returns the risk first and the SHAP values later"""
+    return await _predict_single("heart_disease", input_data, explain, coverage, background_tasks, current_user, db)
+
+
+async def _predict_batch(
+    disease_type: str,
+    patients: List[Any],
+    coverage: Optional[float],
+    background_tasks: BackgroundTasks,
+    current_user: User,
+    db: AsyncSession
+) -> List[PredictionResponse]:
+    """Score a batch of patients with one model call and persist it in one transaction"""
+    rows = [p.model_dump() for p in patients]
+    patient_names = [row.pop('patient_name', None) or 'Unknown Patient' for row in rows]
     
-    # Get confidence interval
-    ci_low, ci_high = shap_service.calculate_confidence_interval(probability)
+    # Encode once, then score and explain every row not already cached in one pass
+    results = await inference.score_rows_async(disease_type, rows)
+    shadow.schedule(background_tasks, disease_type, rows, results, RISK_LEVELS)
+    # Every row was scored by the same bundle, so one table lookup covers the batch
+    intervals = conformal.intervals(
+        disease_type, results[0]["model_version"] if results else None,
+        [result["risk_probability"] for result in results], coverage
+    )
+    ranks = population.percentiles(
+        disease_type, results[0]["model_version"] if results else None,
+        [result["risk_probability"] for result in results], rows
+    )
     
-    # Get SHAP values
-    shap_values = shap_service.generate_shap_values_heart(data)
+    patient_records = [
+        PatientRecord(
+            user_id=current_user.id,
+            patient_name=name,
+            disease_type=disease_type,
+            input_data=row
+        )
+        for name, row in zip(patient_names, rows)
+    ]
+    db.add_all(patient_records)
+    await db.flush()
     
-    # Get clinical explanation
-    clinical_explanation = shap_service.generate_clinical_explanation(
-        "heart_disease", probability, shap_values, data
-    )
+    predictions = [
+        Prediction(
+            user_id=current_user.id,
+            patient_record_id=record.id,
+            disease_type=disease_type,
+            risk_probability=result["risk_probability"],
+            risk_category=model_service.get_risk_category(result["risk_probability"], RISK_LEVELS),
+            confidence_interval_low=result["confidence_interval_low"],
+            confidence_interval_high=result["confidence_interval_high"],
+            shap_values=result["shap_values"],
+            clinical_explanation=result["clinical_explanation"],
+            explanation_status=explanations.READY,
+            input_data=row,
+            model_version=result["model_version"],
+            **interval
+        )
+        for record, row, result, interval in zip(patient_records, rows, results, intervals)
+    ]
+    db.add_all(predictions)
+    await db.flush()
     
-    # Create patient record first
-    patient_record = PatientRecord(
-        user_id=current_user.id,
-        patient_name=patient_name,
-        disease_type="heart_disease",
-        input_data=data
-    )
-    db.add(patient_record)
-    db.commit()
-    db.refresh(patient_record)
+    # Build the response before commit so no row needs to be refreshed
+    response = [
+        PredictionResponse(
+            id=p.id,
+            risk_probability=p.risk_probability,
+            risk_category=p.risk_category,
+            confidence_interval_low=p.confidence_interval_low,
+            confidence_interval_high=p.confidence_interval_high,
+            conformal_interval_low=p.conformal_interval_low,
+            conformal_interval_high=p.conformal_interval_high,
+            conformal_coverage=p.conformal_coverage,
+            conformal_version=p.conformal_version,
+            **rank,
+            shap_values=p.shap_values,
+            clinical_explanation=result["clinical_explanation"],
+            disease_type=disease_type,
+            model_version=p.model_version,
+            explanation_status=p.explanation_status,
+            created_at=p.created_at
+        )
+        for p, result, rank in zip(predictions, results, ranks)
+    ]
+    await db.commit()
     
-    # Create prediction record with patient_record_id
-    prediction = Prediction(
-        user_id=current_user.id,
-        patient_record_id=patient_record.id,
-        disease_type="heart_disease",
-        risk_probability=probability,
-        risk_category=risk_category,
-        confidence_interval_low=ci_low,
-        confidence_interval_high=ci_high,
-        shap_values=shap_values,
-        input_data=data
-    )
+    return response
+
+
+@router.post("/diabetes/batch", response_model=List[PredictionResponse])
+async def predict_diabetes_batch(
+    batch: DiabetesBatchPredictionInput,
+    background_tasks: BackgroundTasks,
+    coverage: Optional[float] = COVERAGE_QUERY,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Make diabetes predictions for a batch of patients"""
+    return await _predict_batch("diabetes", batch.patients, coverage, background_tasks, current_user, db)
+
+
+@router.post("/heart_disease/batch", response_model=List[PredictionResponse])
+async def predict_heart_disease_batch(
+    batch: HeartBatchPredictionInput,
+    background_tasks: BackgroundTasks,
+    coverage: Optional[float] = COVERAGE_QUERY,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Make heart disease predictions for a batch of patients"""
+    return await _predict_batch("heart_disease", batch.patients, coverage, background_tasks, current_user, db)
+
+
+def _what_if_response(disease_type: str, row: Dict[str, Any], result: Dict[str, Any], coverage: Optional[float]) -> PredictionResponse:
+    probability = result["risk_probability"]
+    interval = conformal.intervals(disease_type, result["model_version"], [probability], coverage)[0]
+    rank = population.percentiles(disease_type, result["model_version"], [probability], [row])[0]
     
-    db.add(prediction)
-    db.commit()
-    db.refresh(prediction)
+    # Get risk category
+    risk_category = model_service.get_risk_category(probability, RISK_LEVELS)
     
     return PredictionResponse(
-        id=prediction.id,
         risk_probability=probability,
         risk_category=risk_category,
-        confidence_interval_low=ci_low,
-        confidence_interval_high=ci_high,
-        shap_values=shap_values,
-        clinical_explanation=clinical_explanation,
-        disease_type="heart_disease",
-        created_at=prediction.created_at
+        confidence_interval_low=result["confidence_interval_low"],
+        confidence_interval_high=result["confidence_interval_high"],
+        **interval,
+        **rank,
+        shap_values=result["shap_values"],
+        clinical_explanation=result["clinical_explanation"],
+        disease_type=disease_type,
+        model_version=result["model_version"]
     )
 
 
 @router.post("/what-if", response_model=PredictionResponse)
-def what_if_prediction(
+async def what_if_prediction(
     request: WhatIfPredictionRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """What-if prediction without saving to database"""
+    """What-if prediction without saving to database, re-scoring only what the edit changed"""
     data = request.input_data
     
-    if request.disease_type == "diabetes":
-        probability, _ = model_service.predict_diabetes(data)
-        shap_values = shap_service.generate_shap_values_diabetes(data)
-    else:
-        probability, _ = model_service.predict_heart_disease(data)
-        shap_values = shap_service.generate_shap_values_heart(data)
-    
-    # Get risk category
-    risk_category = model_service.get_risk_category(probability, {
-        "Low": "0-30%",
-        "Moderate": "30-50%",
-        "High": "50-70%",
-        "Critical": "70-100%"
-    })
-    
-    # Get confidence interval
-    ci_low, ci_high = shap_service.calculate_confidence_interval(probability)
-    
-    # Get clinical explanation
-    clinical_explanation = shap_service.generate_clinical_explanation(
-        request.disease_type, probability, shap_values, data
+    result = await asyncio.to_thread(
+        what_if.sessions.score, current_user.id, request.disease_type, data, request.shap_method
     )
+    return _what_if_response(request.disease_type, data, result, request.coverage)
+
+
+@router.websocket("/what-if/ws")
+async def what_if_socket(websocket: WebSocket):
+    """
+    What-if simulator over one connection, authenticated once.
+
+    The first message is a what-if request plus the JWT:
+    {"token", "disease_type", "input_data", "shap_method", "coverage"}. After that each
+    message is an edit, {"seq": n, "changes": {field: value}}, checked against
+    the disease's input schema; invalid edits get an error frame. Edits that
+    arrive while a state is being scored are merged, and only the newest
+    state is scored next. Results are pushed as {"type": "result", "seq", ...}
+    with the seq of the last edit they include; the opening state is seq 0.
+    """
+    await websocket.accept()
+    try:
+        opening = await asyncio.wait_for(websocket.receive_json(), WHAT_IF_WS_AUTH_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+        await _close_quietly(websocket, status.WS_1008_POLICY_VIOLATION)
+        return
+
+    async with AsyncSessionLocal() as db:
+        user = await authenticate_token(opening.get("token") if isinstance(opening, dict) else None, db)
+    if user is None:
+        await websocket.send_json({"type": "error", "detail": "Could not validate credentials"})
+        await _close_quietly(websocket, status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        request = WhatIfPredictionRequest.model_validate(opening)
+    except ValidationError as e:
+        await websocket.send_json({"type": "error", "detail": e.errors(include_url=False, include_context=False)})
+        await _close_quietly(websocket, status.WS_1003_UNSUPPORTED_DATA)
+        return
+
+    input_model = PREDICTION_INPUT_MODELS[request.disease_type]
+    stream = what_if.open_stream(request.input_data)
+    send_lock = asyncio.Lock()
+
+    async def send(message: Dict[str, Any]):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def push_results():
+        while True:
+            seq = None
+            try:
+                seq, row = await stream.latest()
+                result = await asyncio.to_thread(
+                    what_if.sessions.score, user.id, request.disease_type, row, request.shap_method
+                )
+                response = _what_if_response(request.disease_type, row, result, request.coverage)
+                await send({"type": "result", "seq": seq, **response.model_dump(mode="json")})
+            except Exception as e:
+                await send({"type": "error", "seq": seq, "detail": str(e)})
+
+    def close_on_failure(task: asyncio.Task):
+        # An error frame that cannot be sent ends the pusher; drop the connection with it
+        if not task.cancelled() and task.exception() is not None:
+            asyncio.ensure_future(_close_quietly(websocket, status.WS_1011_INTERNAL_ERROR))
+
+    pusher = asyncio.create_task(push_results())
+    pusher.add_done_callback(close_on_failure)
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await send({"type": "error", "detail": "Messages must be JSON"})
+                continue
+            changes = message.get("changes") if isinstance(message, dict) else None
+            seq = message.get("seq") if isinstance(message, dict) else None
+            if not isinstance(changes, dict) or not isinstance(seq, int):
+                await send({"type": "error", "seq": seq, "detail": "Expected {\"seq\": int, \"changes\": {field: value}}"})
+                continue
+            unknown = sorted(set(changes) - set(input_model.model_fields))
+            if unknown:
+                await send({"type": "error", "seq": seq, "detail": f"Unknown {request.disease_type} fields: {', '.join(unknown)}"})
+                continue
+            try:
+                edited = input_model.model_validate({**stream.row, **changes})
+            except ValidationError as e:
+                await send({"type": "error", "seq": seq, "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            stream.apply(seq, {field: getattr(edited, field) for field in changes})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pusher.cancel()
+
+
+async def _close_quietly(websocket: WebSocket, code: int):
+    try:
+        await websocket.close(code=code)
+    except RuntimeError:
+        # The client already went away
+        pass
+
+
+@router.post("/what-if/sweep", response_model=WhatIfSweepResponse)
+async def what_if_sweep(
+    request: WhatIfSweepRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Risk curve (one feature) or surface (two features) around a patient, scored in one batch"""
+    try:
+        return await asyncio.to_thread(
+            what_if.sweep,
+            request.disease_type,
+            request.input_data,
+            [feature.model_dump() for feature in request.features]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.post("/explain", response_model=ExplainBatchResponse)
+async def explain_batch(
+    request: ExplainBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Per-feature contributions for many patients in one call, without saving to database"""
+    try:
+        return await asyncio.to_thread(
+            model_service.explain_rows, request.disease_type, request.patients, request.method, request.top_k
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/history", response_model=PredictionHistoryPage)
+async def get_prediction_history(
+    limit: int = Query(LIST_PAGE_DEFAULT, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None,
+    disease_type: Optional[str] = Query(None, pattern="^(diabetes|heart_disease)$"),
+    risk_category: Optional[str] = Query(None, pattern="^(Low|Moderate|High|Critical)$"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Prediction history, newest first, one page at a time - doctors see all,
+    patients see their own. Pass next_cursor back as ?cursor= for the next page.
+    """
+    # Only the listed columns, with the patient name joined in, in one query
+    query = select(
+        *HISTORY_COLUMNS, PatientRecord.patient_name
+    ).outerjoin(PatientRecord, Prediction.patient_record_id == PatientRecord.id)
+    query = _visible_predictions(query, current_user, disease_type, risk_category)
+    rows = (await db.execute(
+        keyset_page(query, Prediction.created_at, Prediction.id, cursor, limit)
+    )).all()
     
-    return PredictionResponse(
-        risk_probability=probability,
-        risk_category=risk_category,
-        confidence_interval_low=ci_low,
-        confidence_interval_high=ci_high,
-        shap_values=shap_values,
-        clinical_explanation=clinical_explanation,
-        disease_type=request.disease_type
+    rows, next_cursor = split_page(rows, limit)
+    items = [
+        {**row._mapping, "patient_name": row.patient_name or "Unknown Patient"}
+        for row in rows
+    ]
+    return PredictionHistoryPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/history/summary", response_model=PredictionHistorySummary)
+async def get_prediction_history_summary(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Prediction counts by disease and risk category, counted in the database"""
+    query = select(Prediction.disease_type, Prediction.risk_category, func.count())
+    query = _visible_predictions(query, current_user).group_by(Prediction.disease_type, Prediction.risk_category)
+    by_disease_type: Dict[str, int] = {}
+    by_risk_category: Dict[str, int] = {}
+    for disease, category, count in (await db.execute(query)).all():
+        by_disease_type[disease] = by_disease_type.get(disease, 0) + count
+        by_risk_category[category] = by_risk_category.get(category, 0) + count
+    return PredictionHistorySummary(
+        total=sum(by_disease_type.values()),
+        by_disease_type=by_disease_type,
+        by_risk_category=by_risk_category
+    )
+
+
+def _visible_predictions(
+    query,
+    current_user: User,
+    disease_type: Optional[str] = None,
+    risk_category: Optional[str] = None
+):
+    """Restrict a predictions query to what the user may see, and to the requested filters"""
+    if current_user.role != "doctor":
+        query = query.where(Prediction.user_id == current_user.id)
+    if disease_type:
+        query = query.where(Prediction.disease_type == disease_type)
+    if risk_category:
+        query = query.where(Prediction.risk_category == risk_category)
+    return query
+
+
+async def _get_visible_prediction(db: AsyncSession, prediction_id: int, current_user: User) -> Prediction:
+    """A prediction the user may see - doctors see all, patients their own"""
+    query = select(Prediction).where(Prediction.id == prediction_id).execution_options(populate_existing=True)
+    if current_user.role != "doctor":
+        query = query.where(Prediction.user_id == current_user.id)
+    prediction = (await db.execute(query)).scalar_one_or_none()
+    if not prediction:
+        raise HTTPException(status_code=404, detail="Prediction not found")
+    return prediction
+
+
+def _explanation_response(prediction: Prediction) -> ExplanationResponse:
+    return ExplanationResponse(
+        prediction_id=prediction.id,
+        status=prediction.explanation_status or explanations.READY,
+        shap_values=prediction.shap_values or [],
+        clinical_explanation=prediction.clinical_explanation,
+        model_version=prediction.model_version
     )
 
 
-@router.get("/history")
-def get_prediction_history(
+@router.get("/{prediction_id}/explanation", response_model=ExplanationResponse)
+async def get_explanation(
+    prediction_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get prediction history - doctors see all, patients see their own"""
-    if current_user.role == "doctor":
-        predictions = db.query(Prediction).order_by(Prediction.created_at.desc()).all()
-    else:
-        predictions = db.query(Prediction).filter(
-            Prediction.user_id == current_user.id
-        ).order_by(Prediction.created_at.desc()).all()
+    """Poll the explanation of a prediction made with explain=deferred"""
+    return _explanation_response(await _get_visible_prediction(db, prediction_id, current_user))
+
+
+@router.get("/{prediction_id}/explanation/stream")
+async def stream_explanation(
+    prediction_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Server-sent events: one "explanation" event once the prediction is explained, keep-alives until then"""
+    await _get_visible_prediction(db, prediction_id, current_user)
     
-    # Add patient name to each prediction
-    result = []
-    for p in predictions:
-        patient_name = "Unknown Patient"
-        if p.patient_record_id:
-            patient_record = db.query(PatientRecord).filter(PatientRecord.id == p.patient_record_id).first()
-            if patient_record:
-                patient_name = patient_record.patient_name
-        
-        pred_dict = {
-            "id": p.id,
-            "risk_probability": p.risk_probability,
-            "risk_category": p.risk_category,
-            "confidence_interval_low": p.confidence_interval_low,
-            "confidence_interval_high": p.confidence_interval_high,
-            "disease_type": p.disease_type,
-            "created_at": p.created_at,
-            "patient_name": patient_name
-        }
-        result.append(pred_dict)
+    async def events():
+        # The request's session is closed once streaming starts, so the stream uses its own
+        async with AsyncSessionLocal() as session:
+            while True:
+                prediction = await _get_visible_prediction(session, prediction_id, current_user)
+                if prediction.explanation_status != explanations.PENDING:
+                    yield f"event: explanation\ndata: {_explanation_response(prediction).model_dump_json()}\n\n"
+                    return
+                if await request.is_disconnected():
+                    return
+                explained = await explanations.wait_for(prediction_id, EXPLANATION_STREAM_KEEPALIVE_SECONDS)
+                if not explained:
+                    yield ": keep-alive\n\n"
     
-    return result
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/{prediction_id}/counterfactuals", response_model=CounterfactualResponse)
+async def get_counterfactuals(
+    prediction_id: int,
+    max_results: int = Query(3, ge=1, le=10),
+    budget_ms: float = Query(COUNTERFACTUAL_BUDGET_MS, ge=10, le=2000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Smallest changes to the modifiable inputs of a saved prediction that bring its risk below the threshold"""
+    prediction = await _get_visible_prediction(db, prediction_id, current_user)
+    try:
+        result = await asyncio.to_thread(
+            counterfactual.search, prediction.disease_type, prediction.input_data, max_results, budget_ms
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return CounterfactualResponse(prediction_id=prediction_id, **result)
 
 
 @router.get("/info/{disease_type}", response_model=ModelInfoResponse)
@@ -262,3 +622,41 @@ def get_model_info(disease_type: str):
         raise HTTPException(status_code=404, detail="Disease type not found")
     
     return info
+
+
+@router.get("/info/{disease_type}/pdp", response_model=PDPResponse)
+async def get_partial_dependence(
+    disease_type: str,
+    feature: Optional[str] = None,
+    ice: bool = True
+):
+    """Precomputed partial-dependence and ICE curves of the current model, from `python -m app.jobs.build_pdp`"""
+    if disease_type not in ("diabetes", "heart_disease"):
+        raise HTTPException(status_code=404, detail="Disease type not found")
+    curves = await asyncio.to_thread(pdp.get_pdp, disease_type)
+    if curves is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No partial dependence curves for the current {disease_type} model; run python -m app.jobs.build_pdp"
+        )
+    
+    features = [f for f in curves["features"] if feature is None or f["name"] == feature]
+    if feature is not None and not features:
+        raise HTTPException(status_code=404, detail=f"Unknown feature '{feature}'")
+    if not ice:
+        features = [{**f, "ice": []} for f in features]
+    return PDPResponse(**{**curves, "features": features})
+
+
+@router.get("/info/{disease_type}/calibration", response_model=CalibrationCurveResponse)
+def get_calibration_curve(disease_type: str):
+    """Reliability curves of the current model before and after its calibration, from `python -m app.jobs.calibrate_probabilities`"""
+    if disease_type not in ("diabetes", "heart_disease"):
+        raise HTTPException(status_code=404, detail="Disease type not found")
+    bundle = get_bundle(disease_type)
+    if bundle.calibration is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"The current {disease_type} model is not calibrated; run python -m app.jobs.calibrate_probabilities"
+        )
+    return CalibrationCurveResponse(**{**bundle.calibration.meta, "model_version": bundle.version})
@@ -3,28 +3,31 @@ CliniqAI Reports Router
 """
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import Response
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 
 from ..database import get_db
 from ..models import User, Prediction
 from ..auth import get_current_user
-from ..services import pdf_service
+from ..services import executor, pdf_service, population
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
 
 
 @router.get("/pdf")
-def download_pdf_report(
+async def download_pdf_report(
     prediction_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Download PDF report for a prediction"""
     # Get prediction
-    prediction = db.query(Prediction).filter(
+    result = await db.execute(select(Prediction).where(
         Prediction.id == prediction_id,
         Prediction.user_id == current_user.id
-    ).first()
+    ))
+    prediction = result.scalar_one_or_none()
     
     if not prediction:
         raise HTTPException(status_code=404, detail="Prediction not found")
@@ -33,14 +36,18 @@ def download_pdf_report(
     patient_name = "Patient"
     if prediction.patient_record_id:
         from ..models import PatientRecord
-        record = db.query(PatientRecord).filter(
-            PatientRecord.id == prediction.patient_record_id
-        ).first()
+        record = await db.get(PatientRecord, prediction.patient_record_id)
         if record:
             patient_name = record.patient_name
     
-    # Generate PDF
-    pdf_bytes = pdf_service.generate_pdf_bytes(
+    rank = population.percentiles(
+        prediction.disease_type, prediction.model_version, [prediction.risk_probability], [prediction.input_data]
+    )[0]
+    
+    # Generate PDF on the inference backend; rendering is CPU-bound
+    pdf_bytes = await asyncio.to_thread(
+        executor.run,
+        pdf_service.generate_pdf_bytes,
         patient_name=patient_name,
         disease_type=prediction.disease_type,
         input_data=prediction.input_data,
@@ -49,6 +56,7 @@ def download_pdf_report(
             "risk_category": prediction.risk_category,
             "confidence_interval_low": prediction.confidence_interval_low,
             "confidence_interval_high": prediction.confidence_interval_high,
+            **rank,
         },
         shap_values=prediction.shap_values or [],
         clinical_explanation="See prediction details for clinical interpretation."
@@ -1,10 +1,12 @@
 """
 CliniqAI Pydantic Schemas
 """
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, ValidationError, model_validator
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 
+from .config import MAX_BATCH_PREDICTION_ROWS, WHAT_IF_SWEEP_MAX_STEPS
+
 
 # Auth Schemas
 class UserCreate(BaseModel):
@@ -64,6 +66,28 @@ class HeartPredictionInput(BaseModel):
     patient_name: Optional[str] = None
 
 
+# Input schema of each disease, for requests that carry raw rows
+PREDICTION_INPUT_MODELS = {"diabetes": DiabetesPredictionInput, "heart_disease": HeartPredictionInput}
+
+
+def validate_input_row(disease_type: str, row: Any, location: str) -> Dict[str, Any]:
+    """A raw row validated as the disease's input, or ValueError naming its first bad field"""
+    try:
+        return PREDICTION_INPUT_MODELS[disease_type].model_validate(row).model_dump()
+    except ValidationError as e:
+        first = e.errors()[0]
+        field = ".".join(str(part) for part in first["loc"])
+        raise ValueError(f"{location}.{field}: {first['msg']}")
+
+
+class DiabetesBatchPredictionInput(BaseModel):
+    patients: List[DiabetesPredictionInput] = Field(..., min_length=1, max_length=MAX_BATCH_PREDICTION_ROWS)
+
+
+class HeartBatchPredictionInput(BaseModel):
+    patients: List[HeartPredictionInput] = Field(..., min_length=1, max_length=MAX_BATCH_PREDICTION_ROWS)
+
+
 # Prediction Output Schemas
 class SHAPValue(BaseModel):
     feature: str
@@ -77,15 +101,59 @@ class PredictionResponse(BaseModel):
     risk_category: str
     confidence_interval_low: float
     confidence_interval_high: float
-    shap_values: List[SHAPValue]
+    # Interval containing the outcome with probability conformal_coverage; None if the model is uncalibrated
+    conformal_interval_low: Optional[float] = None
+    conformal_interval_high: Optional[float] = None
+    conformal_coverage: Optional[float] = None
+    conformal_version: Optional[str] = None
+    # Percent of the model's training population with a lower risk, overall and among peers of the same gender and age band
+    population_percentile: Optional[float] = None
+    peer_percentile: Optional[float] = None
+    peer_group: Optional[str] = None
+    shap_values: List[SHAPValue] = []
     clinical_explanation: str
     disease_type: str
+    model_version: Optional[str] = None
+    explanation_status: Optional[str] = None
     created_at: Optional[datetime] = None
 
     class Config:
+        # Allow fields named model_* such as model_version
+        protected_namespaces = ()
         from_attributes = True
 
 
+class PredictionHistoryItem(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    id: int
+    risk_probability: float
+    risk_category: str
+    confidence_interval_low: float
+    confidence_interval_high: float
+    conformal_interval_low: Optional[float] = None
+    conformal_interval_high: Optional[float] = None
+    conformal_coverage: Optional[float] = None
+    conformal_version: Optional[str] = None
+    disease_type: str
+    model_version: Optional[str] = None
+    explanation_status: Optional[str] = None
+    created_at: Optional[datetime] = None
+    patient_name: str
+
+
+class PredictionHistoryPage(BaseModel):
+    items: List[PredictionHistoryItem]
+    # Pass as ?cursor= for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+class PredictionHistorySummary(BaseModel):
+    total: int
+    by_disease_type: Dict[str, int]
+    by_risk_category: Dict[str, int]
+
+
 # Patient Record Schemas
 class PatientRecordCreate(BaseModel):
     patient_name: str
@@ -118,6 +186,12 @@ class PatientRecordList(BaseModel):
         from_attributes = True
 
 
+class PatientRecordPage(BaseModel):
+    items: List[PatientRecordList]
+    # Pass as ?cursor= for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+
 # Comparison Schemas
 class PatientComparisonRequest(BaseModel):
     record_id_1: int
@@ -168,3 +242,178 @@ class PDFReportRequest(BaseModel):
 class WhatIfPredictionRequest(BaseModel):
     disease_type: str = Field(..., pattern="^(diabetes|heart_disease)$")
     input_data: Dict[str, Any]
+    # "approximate" (Saabas) is much cheaper and suits interactive sliders
+    shap_method: str = Field("exact", pattern="^(exact|approximate)$")
+    # Coverage of the conformal interval (default CONFORMAL_DEFAULT_COVERAGE)
+    coverage: Optional[float] = Field(None, gt=0, lt=1)
+
+    @model_validator(mode="after")
+    def validate_input_data(self):
+        self.input_data = validate_input_row(self.disease_type, self.input_data, "input_data")
+        return self
+
+
+class SweepFeature(BaseModel):
+    name: str  # input field, e.g. "HbA1c_level"
+    min: Optional[float] = None
+    max: Optional[float] = None
+    steps: int = Field(25, ge=2, le=WHAT_IF_SWEEP_MAX_STEPS)
+    # Explicit values instead of a range, e.g. for categories and flags
+    values: Optional[List[Any]] = Field(None, min_length=1, max_length=WHAT_IF_SWEEP_MAX_STEPS)
+
+
+class WhatIfSweepRequest(BaseModel):
+    disease_type: str = Field(..., pattern="^(diabetes|heart_disease)$")
+    input_data: Dict[str, Any]
+    features: List[SweepFeature] = Field(..., min_length=1, max_length=2)
+
+
+class SweepAxis(BaseModel):
+    name: str
+    values: List[Any]
+
+
+class SweepCrossing(BaseModel):
+    type: str  # "threshold" or "category"
+    feature: str
+    from_value: Any
+    to_value: Any
+    from_state: str
+    to_state: str
+    at: Optional[float] = None  # interpolated crossing point on numeric axes
+    fixed: Optional[Dict[str, Any]] = None  # value of the other feature on a surface
+
+
+class WhatIfSweepResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    disease_type: str
+    model_version: str
+    threshold: float
+    base_risk_probability: float
+    base_risk_category: str
+    features: List[SweepAxis]
+    # A curve for one feature, or a surface indexed [first feature][second feature]
+    risk: Union[List[float], List[List[float]]]
+    risk_categories: Union[List[str], List[List[str]]]
+    crossings: List[SweepCrossing]
+
+
+# Counterfactual Schemas
+class CounterfactualChange(BaseModel):
+    feature: str  # input field, e.g. "bmi"
+    from_value: Any
+    to_value: Any
+
+
+class CounterfactualOption(BaseModel):
+    changes: List[CounterfactualChange]
+    risk_probability: float
+    risk_category: str
+    # Size of the changes in clinical units, e.g. 1 per BMI point or per 0.5 HbA1c
+    cost: float
+
+
+class CounterfactualResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    prediction_id: int
+    disease_type: str
+    model_version: str
+    threshold: float
+    # Risk of the saved inputs under the current model
+    risk_probability: float
+    # Cheapest first; empty when the risk is already below the threshold or nothing found in budget
+    options: List[CounterfactualOption]
+    candidates_total: int
+    candidates_scored: int
+    # False when the latency budget ran out before max_results options were found
+    complete: bool
+    elapsed_ms: float
+
+
+# Partial Dependence Schemas
+class PDPFeature(BaseModel):
+    name: str  # input field, e.g. "bmi"
+    display_name: str
+    kind: str  # "numeric", "flag" or "category"
+    grid: List[Any]
+    # Mean risk over the sample at each grid value
+    partial_dependence: List[float]
+    # One curve per sampled patient, left empty when not requested
+    ice: List[List[float]] = []
+
+
+class PDPResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    disease_type: str
+    model_version: str
+    sample_size: int
+    ice_rows: int
+    created_at: str
+    features: List[PDPFeature]
+
+
+class CalibrationBin(BaseModel):
+    predicted: float  # mean predicted risk in the bin
+    observed: float  # share of positive outcomes in the bin
+    count: int
+
+
+class CalibrationCurveResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    disease_type: str
+    model_version: str
+    method: str  # "isotonic" or "platt"
+    fit_rows: int
+    evaluation_rows: int
+    created_at: str
+    # Over the held-out rows, before and after calibration
+    brier_raw: float
+    brier_calibrated: float
+    raw_curve: List[CalibrationBin]
+    calibrated_curve: List[CalibrationBin]
+
+
+# Batch Explanation Schemas
+class ExplainBatchRequest(BaseModel):
+    disease_type: str = Field(..., pattern="^(diabetes|heart_disease)$")
+    patients: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BATCH_PREDICTION_ROWS)
+    method: str = Field("exact", pattern="^(exact|approximate)$")
+    top_k: Optional[int] = Field(None, ge=1)
+
+    @model_validator(mode="after")
+    def validate_patients(self):
+        """Each row must be a valid input of the chosen disease; rows are kept as their validated dicts"""
+        self.patients = [
+            validate_input_row(self.disease_type, row, f"patients[{i}]") for i, row in enumerate(self.patients)
+        ]
+        return self
+
+
+class ExplainBatchResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    disease_type: str
+    method: str
+    model_version: str
+    feature_names: List[str]
+    base_value: float
+    risk_probabilities: List[float]
+    # One row per patient, one column per feature in feature_names order
+    contributions: List[List[float]]
+    # Largest contributions per patient, present when top_k was requested
+    top_features: Optional[List[List[SHAPValue]]] = None
+
+
+# Deferred Explanation Schema
+class ExplanationResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    prediction_id: int
+    status: str  # "pending", "ready" or "failed"
+    shap_values: List[SHAPValue] = []
+    clinical_explanation: Optional[str] = None
+    model_version: Optional[str] = None
@@ -0,0 +1,192 @@
+"""
+CliniqAI Model Artifacts - Pickle-free, memory-mapped model directories
+
+Layout written by `python -m app.jobs.build_artifacts`:
+
+    <model_dir>/artifacts/LATEST            name of the current version directory
+    <model_dir>/artifacts/<version>/
+        manifest.json                       version, sources, scaler columns, file checksums
+        config.json                         copy of the model config
+        booster.ubj                         XGBoost booster (UBJSON)
+        scaler_mean.npy, scaler_scale.npy   StandardScaler parameters
+        trees/*.npy, trees/trees.json       flattened trees and SHAP tables
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from .tree_engine import TreeEnsemble
+
+ARTIFACTS_DIRNAME = "artifacts"
+LATEST_FILENAME = "LATEST"
+MANIFEST_FILENAME = "manifest.json"
+FORMAT_VERSION = 1
+
+
+class ScalerParams:
+    """The fitted StandardScaler attributes the feature encoder reads, without sklearn"""
+
+    def __init__(self, feature_names_in_: List[str], mean_: np.ndarray, scale_: np.ndarray):
+        self.feature_names_in_ = np.asarray(feature_names_in_, dtype=object)
+        self.mean_ = mean_
+        self.scale_ = scale_
+
+
+class LazyBooster:
+    """
+    XGBoost booster read from UBJSON on first use.
+
+    The native engine serves scoring and SHAP, so most processes never import
+    xgboost; large batches and the pred_contribs fallback still can.
+    """
+
+    def __init__(self, path: Path, feature_names: List[str]):
+        self.path = Path(path)
+        self.feature_names = list(feature_names)
+        self._booster = None
+        self._lock = threading.Lock()
+
+    def get_booster(self):
+        if self._booster is None:
+            with self._lock:
+                if self._booster is None:
+                    import xgboost
+                    self._booster = xgboost.Booster(model_file=str(self.path))
+        return self._booster
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        import xgboost
+        p = self.get_booster().predict(xgboost.DMatrix(X, feature_names=self.feature_names))
+        return np.column_stack([1.0 - p, p])
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_artifact(model_dir: Path) -> Optional[Path]:
+    """The current artifact directory of a model, or None if none was built"""
+    latest = Path(model_dir) / ARTIFACTS_DIRNAME / LATEST_FILENAME
+    if not latest.exists():
+        return None
+    path = latest.parent / latest.read_text().strip()
+    return path if (path / MANIFEST_FILENAME).exists() else None
+
+
+def write_artifact(
+    model_dir: Path,
+    disease_type: str,
+    version: str,
+    config: Dict[str, Any],
+    model,
+    scaler,
+    engine: TreeEnsemble,
+    source_files: List[Path]
+) -> Path:
+    """
+    Write a versioned artifact directory and point LATEST at it.
+    The directory is assembled under a temporary name and renamed into place,
+    so readers never see a partial artifact.
+    """
+    root = Path(model_dir) / ARTIFACTS_DIRNAME
+    final = root / version
+    staging = root / f".{version}.tmp"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir(parents=True)
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster.save_model(str(staging / "booster.ubj"))
+    np.save(staging / "scaler_mean.npy", np.asarray(scaler.mean_, dtype=np.float64))
+    np.save(staging / "scaler_scale.npy", np.asarray(scaler.scale_, dtype=np.float64))
+    with open(staging / "config.json", "w") as f:
+        json.dump(config, f, indent=2)
+    engine.build_shap_tables()
+    engine.save_dir(staging / "trees")
+
+    files = {
+        str(path.relative_to(staging)): {"sha256": sha256_file(path), "bytes": path.stat().st_size}
+        for path in sorted(staging.rglob("*")) if path.is_file()
+    }
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "disease_type": disease_type,
+        "version": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "feature_cols": list(config.get("feature_cols", [])),
+        "scaler_columns": [str(c) for c in getattr(scaler, "feature_names_in_", config.get("scale_cols", []))],
+        "sources": {path.name: sha256_file(path) for path in source_files if path.exists()},
+        "files": files,
+    }
+    with open(staging / MANIFEST_FILENAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if final.exists():
+        shutil.rmtree(final)
+    staging.rename(final)
+
+    latest_tmp = root / f".{LATEST_FILENAME}.tmp"
+    latest_tmp.write_text(version)
+    os.replace(latest_tmp, root / LATEST_FILENAME)
+    return final
+
+
+def verify_artifact(path: Path, manifest: Dict[str, Any]):
+    """Raise ValueError if any file differs from the checksum recorded in the manifest"""
+    for name, entry in manifest["files"].items():
+        file_path = path / name
+        if not file_path.exists():
+            raise ValueError(f"Artifact file missing: {name}")
+        if sha256_file(file_path) != entry["sha256"]:
+            raise ValueError(f"Artifact checksum mismatch: {name}")
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    with open(Path(path) / MANIFEST_FILENAME, "r") as f:
+        return json.load(f)
+
+
+def changed_sources(manifest: Dict[str, Any], source_files: List[Path]) -> List[str]:
+    """
+    Source files that differ from the ones the artifact was built from.
+    Sources that are not deployed are skipped, so artifact-only model directories stay valid.
+    """
+    built_from = manifest.get("sources", {})
+    return [path.name for path in source_files if path.exists() and built_from.get(path.name) != sha256_file(path)]
+
+
+def read_artifact(path: Path, verify: bool = True) -> Dict[str, Any]:
+    """Load an artifact directory: config, lazy booster, scaler parameters and memory-mapped trees"""
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format: {manifest.get('format_version')}")
+    if verify:
+        verify_artifact(path, manifest)
+
+    with open(path / "config.json", "r") as f:
+        config = json.load(f)
+
+    return {
+        "manifest": manifest,
+        "version": manifest["version"],
+        "config": config,
+        "model": LazyBooster(path / "booster.ubj", manifest["feature_cols"]),
+        "scaler": ScalerParams(
+            manifest["scaler_columns"],
+            np.load(path / "scaler_mean.npy"),
+            np.load(path / "scaler_scale.npy")
+        ),
+        "engine": TreeEnsemble.load_dir(path / "trees", mmap_mode="r"),
+    }
@@ -0,0 +1,188 @@
+"""
+CliniqAI Bootstrap Service - Confidence intervals from bootstrap replicas of each model
+
+Replicas are trained offline by `python -m app.jobs.train_bootstrap` on
+resamples of the model's dataset and stored per model version:
+
+    <model_dir>/bootstrap/<version>/
+        replicas.json           trees and base margin of each replica, training settings
+        *.npy, trees.json       every replica's trees stacked into one TreeEnsemble (save_dir layout)
+
+A request scores all replicas in one traversal of the stacked trees. How
+far their margins spread around their median gives the interval, placed
+around the served probability: replicas are fitted to the dataset as it
+is, so their own probabilities need not match the serving model's scale
+or its calibration.
+"""
+import json
+import threading
+from functools import partial
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import CONFIDENCE_LEVEL, BOOTSTRAP_CHUNK_ELEMENTS, BOOTSTRAP_MAX_ROWS
+from . import executor, metrics, shap_service
+from .model_bundle import ModelBundle, add_reload_listener, get_bundle_version, reload_bundle
+from .tree_engine import TreeEnsemble
+
+BOOTSTRAP_DIRNAME = "bootstrap"
+REPLICAS_FILENAME = "replicas.json"
+
+
+class ReplicaEnsemble:
+    """Bootstrap replicas of one model, stacked so every replica is scored in one pass"""
+
+    def __init__(self, engine: TreeEnsemble, tree_counts: np.ndarray, base_margins: np.ndarray, meta: Dict[str, Any]):
+        self.engine = engine
+        self.tree_counts = np.asarray(tree_counts, dtype=np.int64)
+        self.base_margins = np.asarray(base_margins, dtype=np.float64)
+        self.meta = meta
+        self._starts = np.concatenate([[0], np.cumsum(self.tree_counts)[:-1]])
+
+    @property
+    def n_replicas(self) -> int:
+        return len(self.tree_counts)
+
+    @classmethod
+    def from_engines(cls, engines: List[TreeEnsemble], meta: Dict[str, Any]) -> "ReplicaEnsemble":
+        return cls(
+            TreeEnsemble.concatenate(engines),
+            [engine.n_trees for engine in engines],
+            [engine.base_margin for engine in engines],
+            meta
+        )
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_replicas) margin of every row under every replica"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        chunk = max(1, BOOTSTRAP_CHUNK_ELEMENTS // self.engine.n_trees)
+        margins = np.empty((len(X), self.n_replicas))
+        for start in range(0, len(X), chunk):
+            leaves = self.engine.leaf_indices(X[start:start + chunk])
+            margins[start:start + chunk] = np.add.reduceat(self.engine.value[leaves], self._starts, axis=1, dtype=np.float64)
+        return margins + self.base_margins
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_replicas) probability of every row under every replica"""
+        return 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+
+    def margin_spread(self, X: np.ndarray, confidence: float = CONFIDENCE_LEVEL) -> Tuple[np.ndarray, np.ndarray]:
+        """Distance from the replicas' median margin down and up to the ends of their percentile interval, per row"""
+        tail = (1.0 - confidence) / 2 * 100
+        low, median, high = np.percentile(self.predict_margin(X), [tail, 50, 100 - tail], axis=1)
+        return low - median, high - median
+
+    def save(self, directory: Path):
+        directory = Path(directory)
+        self.engine.save_dir(directory)
+        with open(directory / REPLICAS_FILENAME, "w") as f:
+            json.dump({
+                **self.meta,
+                "tree_counts": self.tree_counts.tolist(),
+                "base_margins": self.base_margins.tolist(),
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: Path) -> "ReplicaEnsemble":
+        directory = Path(directory)
+        with open(directory / REPLICAS_FILENAME, "r") as f:
+            meta = json.load(f)
+        tree_counts = meta.pop("tree_counts")
+        base_margins = meta.pop("base_margins")
+        return cls(TreeEnsemble.load_dir(directory), tree_counts, base_margins, meta)
+
+
+def replicas_path(bundle: ModelBundle) -> Path:
+    # Replicas reproduce the raw model, so they outlive a change of its calibration
+    return Path(bundle.model_dir) / BOOTSTRAP_DIRNAME / bundle.base_version
+
+
+_replicas: Dict[Tuple[str, str], ReplicaEnsemble] = {}
+_replicas_lock = threading.Lock()
+_stats = {"bootstrap_intervals": 0, "fallback_intervals": 0}
+_stats_lock = threading.Lock()
+
+
+def get_replicas(bundle: ModelBundle) -> Optional[ReplicaEnsemble]:
+    """Replicas trained for the bundle's model version, or None if the job has not been run for it"""
+    key = (bundle.disease_type, bundle.version)
+    replicas = _replicas.get(key)
+    if replicas is not None:
+        return replicas
+    path = replicas_path(bundle)
+    if not (path / REPLICAS_FILENAME).exists():
+        return None
+    with _replicas_lock:
+        if key not in _replicas:
+            try:
+                _replicas[key] = ReplicaEnsemble.load(path)
+                print(f"Loaded {_replicas[key].n_replicas} bootstrap replicas for {bundle.disease_type} {bundle.version}")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: Could not load bootstrap replicas from {path}: {e}")
+                return None
+        return _replicas[key]
+
+
+def spread_matrix(disease_type: str, X: np.ndarray, version: str) -> Tuple[np.ndarray, np.ndarray]:
+    """margin_spread by disease name and model version, for process-pool workers"""
+    bundle = get_bundle_version(disease_type, version)
+    if bundle is None:
+        # This worker still serves an older model; pick up the new one
+        bundle = reload_bundle(disease_type)
+    replicas = get_replicas(bundle)
+    if replicas is None:
+        raise RuntimeError(f"No bootstrap replicas for {disease_type} {bundle.version}")
+    return replicas.margin_spread(X)
+
+
+def _spread_with(replicas: ReplicaEnsemble, disease_type: str, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return replicas.margin_spread(X)
+
+
+def confidence_intervals(bundle: ModelBundle, X: Optional[np.ndarray], probabilities: np.ndarray) -> List[Tuple[float, float]]:
+    """
+    Interval of every row's risk: the bootstrap replicas' margin spread placed
+    around the served probability, or the fixed-width approximation when the
+    model has no replicas or there are more than BOOTSTRAP_MAX_ROWS rows.
+    """
+    replicas = get_replicas(bundle) if X is not None and len(probabilities) <= BOOTSTRAP_MAX_ROWS else None
+    if replicas is None:
+        with _stats_lock:
+            _stats["fallback_intervals"] += len(probabilities)
+        return [shap_service.calculate_confidence_interval(float(p)) for p in probabilities]
+
+    if executor.uses_processes():
+        # Workers hold their own replicas and look them up by model version
+        below, above = executor.run_rows(spread_matrix, bundle.disease_type, X, bundle.version)
+    else:
+        below, above = executor.run_rows(partial(_spread_with, replicas), bundle.disease_type, X)
+    # Calibrated risks can be exactly 0 or 1, which have no finite margin
+    probabilities = np.clip(np.asarray(probabilities, dtype=np.float64), 1e-6, 1 - 1e-6)
+    margin = np.log(probabilities / (1.0 - probabilities))
+    low = (1.0 / (1.0 + np.exp(-(margin + below)))).round(3)
+    high = (1.0 / (1.0 + np.exp(-(margin + above)))).round(3)
+    with _stats_lock:
+        _stats["bootstrap_intervals"] += len(probabilities)
+    return list(zip(low.tolist(), high.tolist()))
+
+
+def _drop_replicas(disease_type: str):
+    """Free the replicas of a replaced model"""
+    with _replicas_lock:
+        for key in [k for k in _replicas if k[0] == disease_type]:
+            del _replicas[key]
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "loaded": {f"{disease_type}:{version}": r.n_replicas for (disease_type, version), r in list(_replicas.items())},
+        **stats,
+    }
+
+
+add_reload_listener(_drop_replicas)
+metrics.register_source("bootstrap", get_stats)
@@ -0,0 +1,120 @@
+"""
+CliniqAI Probability Calibration - Monotone lookup tables from raw model output to observed risk
+
+`python -m app.jobs.calibrate_probabilities` fits isotonic (or Platt)
+regression of the outcome on the model's raw probability and stores it as a
+piecewise-linear table per model version:
+
+    <model_dir>/calibration/<version>.json   knots, fit settings and reliability curves before and after
+
+A bundle loads the table of its model and maps every batch of raw
+probabilities through it with one np.interp. The table's digest is part of
+the served version, so the conformal, population and PDP tables, which hold
+served probabilities, have to be rebuilt whenever the calibration changes.
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+CALIBRATION_DIRNAME = "calibration"
+
+
+class ProbabilityCalibration:
+    """Piecewise-linear, non-decreasing map from raw to calibrated probability"""
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, meta: Dict[str, Any]):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.meta = meta
+        digest = hashlib.blake2b(digest_size=4)
+        digest.update(self.x.tobytes())
+        digest.update(self.y.tobytes())
+        self.digest = digest.hexdigest()
+
+    @property
+    def method(self) -> str:
+        return self.meta.get("method", "isotonic")
+
+    def apply(self, probabilities) -> np.ndarray:
+        """Calibrated probability for every raw one; outside the knots the end values hold"""
+        return np.interp(probabilities, self.x, self.y)
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({**self.meta, "x": self.x.tolist(), "y": self.y.tolist()}, f)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ProbabilityCalibration":
+        with open(path, "r") as f:
+            meta = json.load(f)
+        x, y = meta.pop("x"), meta.pop("y")
+        if len(x) != len(y) or len(x) < 2 or np.any(np.diff(x) < 0) or np.any(np.diff(y) < 0):
+            raise ValueError("calibration knots must be non-decreasing pairs")
+        return cls(x, y, meta)
+
+
+def calibration_path(model_dir: Path, version: str) -> Path:
+    return Path(model_dir) / CALIBRATION_DIRNAME / f"{version}.json"
+
+
+def load_calibration(model_dir: Path, version: str) -> Optional[ProbabilityCalibration]:
+    """The table fitted for a model version, or None if it has not been calibrated"""
+    path = calibration_path(model_dir, version)
+    if not path.exists():
+        return None
+    try:
+        return ProbabilityCalibration.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Could not load probability calibration from {path}: {e}")
+        return None
+
+
+# (directory, version) pairs already checked for tables of other calibrations
+_stale_checked = set()
+
+
+def warn_stale_tables(directory: Path, base_version: str, version: str, suffix: str, job: str):
+    """
+    Warn, once per directory and version, when a table a model version lacks
+    exists for the same model under another calibration (or none). Those hold
+    different served probabilities, so they are never used in its place.
+    """
+    key = (str(directory), version)
+    if key in _stale_checked:
+        return
+    _stale_checked.add(key)
+    directory = Path(directory)
+    if not directory.is_dir():
+        return
+    pattern = re.compile(rf"{re.escape(base_version)}(\.[0-9a-f]{{8}})?{re.escape(suffix)}")
+    stale = sorted(path.name for path in directory.iterdir() if pattern.fullmatch(path.name))
+    if stale:
+        print(
+            f"Warning: {directory} has no table for model version {version}, only {', '.join(stale)} "
+            f"built under another probability calibration; rerun python -m app.jobs.{job}"
+        )
+
+
+def reliability_curve(probabilities: np.ndarray, labels: np.ndarray, bins: int) -> List[Dict[str, Any]]:
+    """Mean predicted and observed risk in equal-width probability bins, skipping empty ones"""
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    index = np.minimum((probabilities * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(index, minlength=bins)
+    predicted = np.bincount(index, weights=probabilities, minlength=bins)
+    observed = np.bincount(index, weights=labels, minlength=bins)
+    return [
+        {
+            "predicted": round(float(predicted[i] / counts[i]), 4),
+            "observed": round(float(observed[i] / counts[i]), 4),
+            "count": int(counts[i]),
+        }
+        for i in np.flatnonzero(counts)
+    ]
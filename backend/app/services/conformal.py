@@ -0,0 +1,136 @@
+"""
+CliniqAI Conformal Service - Split-conformal intervals from precomputed calibration tables
+
+`python -m app.jobs.calibrate_conformal` scores a held-out split of each
+model's dataset and stores the sorted nonconformity scores |y - p| per model version:
+
+    <model_dir>/conformal/<version>.npy     sorted float32 scores
+    <model_dir>/conformal/<version>.json    conformal version, split and coverage of the table
+
+For coverage 1 - a, the interval p +/- q with q the ceil((n + 1)(1 - a))-th
+smallest score contains the patient's outcome with probability at least
+1 - a, for patients exchangeable with the calibration split.
+"""
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import CONFORMAL_DEFAULT_COVERAGE
+from . import metrics
+from .calibration import warn_stale_tables
+from .model_bundle import ModelBundle, add_reload_listener, get_bundle, get_bundle_version
+
+CONFORMAL_DIRNAME = "conformal"
+
+
+class Calibration:
+    """Sorted nonconformity scores of one model version"""
+
+    def __init__(self, scores: np.ndarray, meta: Dict[str, Any]):
+        self.scores = scores
+        self.meta = meta
+        self.version: str = meta["conformal_version"]
+
+    def quantile(self, coverage: float) -> float:
+        """Score quantile that gives at least `coverage`; 1.0 (the whole range) when n is too small for it"""
+        n = len(self.scores)
+        k = math.ceil((n + 1) * coverage)
+        return float(self.scores[k - 1]) if k <= n else 1.0
+
+    def intervals(self, probabilities: np.ndarray, coverage: float) -> Tuple[np.ndarray, np.ndarray]:
+        q = self.quantile(coverage)
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        return np.clip(probabilities - q, 0.0, 1.0), np.clip(probabilities + q, 0.0, 1.0)
+
+
+def calibration_paths(bundle: ModelBundle) -> Tuple[Path, Path]:
+    directory = Path(bundle.model_dir) / CONFORMAL_DIRNAME
+    return directory / f"{bundle.version}.npy", directory / f"{bundle.version}.json"
+
+
+_calibrations: Dict[Tuple[str, str], Calibration] = {}
+_calibrations_lock = threading.Lock()
+_stats = {"conformal_intervals": 0, "uncalibrated": 0}
+_stats_lock = threading.Lock()
+
+
+def get_calibration(bundle: ModelBundle) -> Optional[Calibration]:
+    """Calibration of the bundle's model version, or None if it has not been calibrated"""
+    key = (bundle.disease_type, bundle.version)
+    calibration = _calibrations.get(key)
+    if calibration is not None:
+        return calibration
+    scores_path, meta_path = calibration_paths(bundle)
+    if not meta_path.exists():
+        warn_stale_tables(meta_path.parent, bundle.base_version, bundle.version, ".json", "calibrate_conformal")
+        return None
+    with _calibrations_lock:
+        if key not in _calibrations:
+            try:
+                with open(meta_path, "r") as f:
+                    meta = json.load(f)
+                _calibrations[key] = Calibration(np.load(scores_path, mmap_mode="r"), meta)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: Could not load conformal calibration from {scores_path}: {e}")
+                return None
+        return _calibrations[key]
+
+
+def intervals(
+    disease_type: str,
+    model_version: Optional[str],
+    probabilities: List[float],
+    coverage: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Conformal interval fields for probabilities scored by one model version,
+    with every field None when that version has not been calibrated
+    """
+    coverage = coverage or CONFORMAL_DEFAULT_COVERAGE
+    bundle = (model_version and get_bundle_version(disease_type, model_version)) or get_bundle(disease_type)
+    calibration = get_calibration(bundle) if bundle.version == model_version else None
+    if calibration is None:
+        with _stats_lock:
+            _stats["uncalibrated"] += len(probabilities)
+        return [{
+            "conformal_interval_low": None,
+            "conformal_interval_high": None,
+            "conformal_coverage": None,
+            "conformal_version": None,
+        }] * len(probabilities)
+
+    low, high = calibration.intervals(probabilities, coverage)
+    with _stats_lock:
+        _stats["conformal_intervals"] += len(probabilities)
+    return [
+        {
+            "conformal_interval_low": round(l, 4),
+            "conformal_interval_high": round(h, 4),
+            "conformal_coverage": coverage,
+            "conformal_version": calibration.version,
+        }
+        for l, h in zip(low.tolist(), high.tolist())
+    ]
+
+
+def _drop_calibrations(disease_type: str):
+    with _calibrations_lock:
+        for key in [k for k in _calibrations if k[0] == disease_type]:
+            del _calibrations[key]
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "loaded": {f"{d}:{v}": c.version for (d, v), c in list(_calibrations.items())},
+        **stats,
+    }
+
+
+add_reload_listener(_drop_calibrations)
+metrics.register_source("conformal", get_stats)
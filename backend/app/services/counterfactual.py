@@ -0,0 +1,188 @@
+"""
+CliniqAI Counterfactual Service - Smallest plausible changes that bring a patient's risk under the threshold
+"""
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import (
+    COUNTERFACTUAL_BUDGET_MS,
+    COUNTERFACTUAL_MAX_CANDIDATES,
+    COUNTERFACTUAL_MAX_STEPS,
+)
+from ..schemas import DiabetesPredictionInput, HeartPredictionInput
+from . import model_service
+from .model_bundle import get_bundle
+from .what_if import encode_axis
+
+# Modifiable inputs and the changes that count as plausible.
+# Numbers only move down towards `floor` in multiples of `step`, and each
+# `unit` of change costs 1; flags and categories can only move to `to`, at `cost`.
+ACTIONS = {
+    "diabetes": {
+        "bmi": {"floor": 18.5, "step": 0.5, "unit": 1.0},
+        "HbA1c_level": {"floor": 4.0, "step": 0.1, "unit": 0.5},
+        "blood_glucose_level": {"floor": 70.0, "step": 5.0, "unit": 20.0},
+        "smoking_history": {"from": "current", "to": "former", "cost": 1.0},
+    },
+    "heart_disease": {
+        "ap_hi": {"floor": 90.0, "step": 2.0, "unit": 10.0},
+        "ap_lo": {"floor": 60.0, "step": 2.0, "unit": 5.0},
+        "bmi": {"floor": 18.5, "step": 0.5, "unit": 1.0},
+        "smoke": {"from": True, "to": False, "cost": 1.0},
+        "alco": {"from": True, "to": False, "cost": 1.0},
+        "active": {"from": False, "to": True, "cost": 1.0},
+    },
+}
+
+INPUT_MODELS = {
+    "diabetes": DiabetesPredictionInput,
+    "heart_disease": HeartPredictionInput,
+}
+
+
+def _input_bounds(disease_type: str, name: str) -> Tuple[Optional[float], Optional[float]]:
+    """The ge/le validation range of an input field"""
+    low = high = None
+    for constraint in INPUT_MODELS[disease_type].model_fields[name].metadata:
+        low = getattr(constraint, "ge", low)
+        high = getattr(constraint, "le", high)
+    return low, high
+
+
+def _candidate_values(disease_type: str, name: str, action: Dict[str, Any], current: Any) -> Tuple[List[Any], np.ndarray]:
+    """
+    Values one input may take, starting with its current value, and the cost
+    of each. Numeric ranges are coarsened to at most COUNTERFACTUAL_MAX_STEPS values.
+    """
+    if "to" in action:
+        if current != action["from"]:
+            return [current], np.zeros(1)
+        return [current, action["to"]], np.array([0.0, action["cost"]])
+
+    low, high = _input_bounds(disease_type, name)
+    floor = max(action["floor"], low if low is not None else action["floor"])
+    current = float(current)
+    if high is not None:
+        current = min(current, high)
+    if current <= floor:
+        return [current], np.zeros(1)
+
+    step = action["step"]
+    n_steps = int(np.floor((current - floor) / step + 1e-9))
+    stride = max(1, int(np.ceil(n_steps / (COUNTERFACTUAL_MAX_STEPS - 1))))
+    deltas = np.arange(0, n_steps + 1, stride) * step
+    values = [round(current - delta, 2) for delta in deltas]
+    return values, deltas / action["unit"]
+
+
+def search(
+    disease_type: str,
+    base: Dict[str, Any],
+    max_results: int = 3,
+    budget_ms: float = COUNTERFACTUAL_BUDGET_MS
+) -> Dict[str, Any]:
+    """
+    Cheapest combinations of changes to the modifiable inputs that take the
+    risk below the model's threshold, at most one per set of changed inputs.
+
+    Every combination on the candidate grid is costed up front, then scored
+    in batches from the cheapest up; the search stops once max_results
+    options are found, since every later candidate costs more, or when the
+    latency budget runs out. Raises RuntimeError if the model is not loaded.
+    """
+    started = time.perf_counter()
+    deadline = started + budget_ms / 1000
+    bundle = get_bundle(disease_type)
+    if not bundle.can_predict:
+        raise RuntimeError(f"{disease_type} model is not loaded")
+
+    base_x = bundle.encode(base)
+    base_probability = float(model_service.predict_proba_matrix(bundle, base_x)[0])
+    threshold = bundle.threshold
+
+    axes = []
+    for name, action in ACTIONS[disease_type].items():
+        values, costs = _candidate_values(disease_type, name, action, base.get(name))
+        if len(values) > 1:
+            columns, encoded = encode_axis(bundle, base, name, values)
+            axes.append((name, values, costs, columns, encoded))
+
+    result = {
+        "disease_type": disease_type,
+        "model_version": bundle.version,
+        "threshold": threshold,
+        "risk_probability": base_probability,
+        "options": [],
+        "candidates_total": 0,
+        "candidates_scored": 0,
+        "complete": True,
+    }
+    if base_probability < threshold or not axes:
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    # Coarsen the longest axes until the whole grid fits
+    shape = [len(values) for _, values, _, _, _ in axes]
+    while int(np.prod(shape)) > COUNTERFACTUAL_MAX_CANDIDATES:
+        longest = int(np.argmax(shape))
+        name, values, costs, columns, encoded = axes[longest]
+        keep = np.arange(0, len(values), 2)
+        axes[longest] = (name, [values[i] for i in keep], costs[keep], columns, encoded[keep])
+        shape[longest] = len(keep)
+
+    grid = np.indices(shape).reshape(len(shape), -1)[:, 1:]  # the first point is the unchanged patient
+    cost = sum(axis_costs[index] for (_, _, axis_costs, _, _), index in zip(axes, grid))
+    order = np.argsort(cost, kind="stable")
+    grid, cost = grid[:, order], cost[order]
+    changed = grid > 0
+    result["candidates_total"] = grid.shape[1]
+
+    options = []
+    seen_changes: List[frozenset] = []
+    scored = 0
+    # Batches small enough for the native engine, so none falls through to
+    # XGBoost and the deadline is checked at least every few milliseconds
+    batch_rows = model_service.NATIVE_ENGINE_MAX_ROWS
+    while scored < grid.shape[1] and len(options) < max_results:
+        if time.perf_counter() > deadline:
+            result["complete"] = False
+            break
+        batch = slice(scored, scored + batch_rows)
+        index = grid[:, batch]
+        X = np.repeat(base_x, index.shape[1], axis=0)
+        for (_, _, _, columns, encoded), axis_index in zip(axes, index):
+            X[:, columns] = encoded[axis_index]
+        probabilities = model_service.predict_proba_matrix(bundle, X)
+
+        for i in np.flatnonzero(probabilities < threshold):
+            candidate = batch.start + i
+            changes = frozenset(np.flatnonzero(changed[:, candidate]).tolist())
+            # Cheaper options come first, so one changing the same inputs or more is never better
+            if any(found <= changes for found in seen_changes):
+                continue
+            seen_changes.append(changes)
+            options.append(_option(axes, grid[:, candidate], float(probabilities[i]), float(cost[candidate]), base))
+            if len(options) == max_results:
+                break
+        scored += index.shape[1]
+
+    result["options"] = options
+    result["candidates_scored"] = scored
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _option(axes: List[Tuple], index: np.ndarray, probability: float, cost: float, base: Dict[str, Any]) -> Dict[str, Any]:
+    changes = [
+        {"feature": name, "from_value": base.get(name), "to_value": values[i]}
+        for (name, values, _, _, _), i in zip(axes, index)
+        if i > 0
+    ]
+    return {
+        "changes": changes,
+        "risk_probability": probability,
+        "risk_category": model_service.RISK_CATEGORIES[int(model_service.get_risk_category_indices(probability))],
+        "cost": round(cost, 4),
+    }
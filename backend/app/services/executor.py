@@ -0,0 +1,106 @@
+"""
+CliniqAI Inference Executor - Runs CPU-bound model and report work inline, on threads or in worker processes
+"""
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+from ..config import INFERENCE_BACKEND, INFERENCE_WORKERS, INFERENCE_MIN_CHUNK_ROWS
+from . import metrics
+from .model_bundle import DISEASE_TYPES, MODEL_DIRS, get_bundle
+
+BACKENDS = ("inline", "thread", "process")
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker(model_dirs: Dict[str, str]):
+    """Process initializer: load every bundle, its SHAP tables and bootstrap replicas once per worker"""
+    from . import bootstrap
+    MODEL_DIRS.update({disease_type: Path(path) for disease_type, path in model_dirs.items()})
+    for disease_type in DISEASE_TYPES:
+        bundle = get_bundle(disease_type)
+        if bundle.engine is not None:
+            try:
+                bundle.engine.build_shap_tables()
+            except ValueError:
+                pass
+            bootstrap.get_replicas(bundle)
+
+
+def _create_executor() -> Optional[Executor]:
+    if INFERENCE_BACKEND not in BACKENDS:
+        raise ValueError(f"INFERENCE_BACKEND must be one of {BACKENDS}, got '{INFERENCE_BACKEND}'")
+    if INFERENCE_BACKEND == "thread":
+        return ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    if INFERENCE_BACKEND == "process":
+        # spawn, not fork: the parent already runs batcher and server threads
+        return ProcessPoolExecutor(
+            max_workers=INFERENCE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=({disease_type: str(path) for disease_type, path in MODEL_DIRS.items()},)
+        )
+    return None
+
+
+def start():
+    """Create the configured pool (no-op for the inline backend)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = _create_executor()
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def uses_processes() -> bool:
+    """Whether work runs in worker processes, which must be sent arrays and names rather than objects"""
+    return INFERENCE_BACKEND == "process"
+
+
+def run(fn: Callable, *args, **kwargs):
+    """Run fn on the configured backend and wait for its result"""
+    if INFERENCE_BACKEND == "inline":
+        return fn(*args, **kwargs)
+    if _executor is None:
+        start()
+    return _executor.submit(fn, *args, **kwargs).result()
+
+
+def run_rows(fn: Callable[..., Tuple[np.ndarray, ...]], disease_type: str, X: np.ndarray, *args) -> Tuple[np.ndarray, ...]:
+    """
+    Run fn(disease_type, X, *args) -> tuple of per-row arrays, splitting large
+    matrices across workers. Only arrays cross the process boundary, never row dicts.
+    """
+    n_chunks = min(INFERENCE_WORKERS, len(X) // INFERENCE_MIN_CHUNK_ROWS)
+    if INFERENCE_BACKEND == "inline" or n_chunks < 2:
+        return run(fn, disease_type, X, *args)
+
+    if _executor is None:
+        start()
+    futures = [_executor.submit(fn, disease_type, chunk, *args) for chunk in np.array_split(X, n_chunks)]
+    parts = [future.result() for future in futures]
+    return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def get_stats() -> Dict[str, Any]:
+    return {
+        "backend": INFERENCE_BACKEND,
+        "workers": INFERENCE_WORKERS if INFERENCE_BACKEND != "inline" else 0,
+        "started": _executor is not None,
+    }
+
+
+metrics.register_source("executor", get_stats)
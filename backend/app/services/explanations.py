@@ -0,0 +1,228 @@
+"""
+CliniqAI Deferred Explanations - SHAP values and clinical explanations filled in after the risk is returned
+"""
+import asyncio
+import queue
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from ..config import DEFERRED_EXPLAIN_MAX_ROWS
+from ..database import SessionLocal
+from ..models import Prediction
+from . import inference, metrics
+from .model_bundle import get_bundle_version
+from .result_cache import result_cache, make_key
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+# Rows explained or failed, and failed rows by cause
+STAT_COUNTERS = ("queued", "explained", "failed", "batches", "version_unavailable", "explain_errors", "save_errors")
+
+
+class ExplanationWorker:
+    """
+    Background thread that explains predictions saved with explain=deferred.
+
+    Queued predictions are taken in batches of up to max_rows, explained with
+    the model version that scored them, written back to their rows and
+    announced to anyone waiting on them. Waiters are asyncio futures resolved
+    on their own event loop, so no thread is parked per waiting client.
+    """
+
+    def __init__(self, max_rows: int = DEFERRED_EXPLAIN_MAX_ROWS):
+        self.max_rows = max_rows
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = {}
+        self._pending_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(STAT_COUNTERS, 0)
+        self._worker = threading.Thread(target=self._run, name="deferred-explanations", daemon=True)
+        self._worker.start()
+
+    def submit(self, prediction_id: int, disease_type: str, row: Dict[str, Any], model_version: Optional[str]):
+        """Queue a saved prediction for explanation"""
+        with self._pending_lock:
+            self._pending.setdefault(prediction_id, [])
+        with self._stats_lock:
+            self._stats["queued"] += 1
+        self._queue.put((prediction_id, disease_type, row, model_version))
+
+    def watch(self, prediction_id: int) -> Optional[asyncio.Future]:
+        """Future on the running loop resolved once the prediction is explained; None if it is not queued here"""
+        with self._pending_lock:
+            waiters = self._pending.get(prediction_id)
+            if waiters is None:
+                return None
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            waiters.append((loop, future))
+            return future
+
+    def unwatch(self, prediction_id: int, future: asyncio.Future):
+        with self._pending_lock:
+            waiters = self._pending.get(prediction_id)
+            if waiters is not None:
+                waiters[:] = [(loop, f) for loop, f in waiters if f is not future]
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _collect(self) -> List[Tuple]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_rows:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Explain each group with the model version that scored it
+            groups: Dict[Tuple[str, Optional[str]], List[Tuple]] = {}
+            for item in batch:
+                groups.setdefault((item[1], item[3]), []).append(item)
+            for (disease_type, model_version), items in groups.items():
+                self._explain(disease_type, model_version, items)
+            with self._stats_lock:
+                self._stats["batches"] += 1
+
+    def _explain(self, disease_type: str, model_version: Optional[str], items: List[Tuple]):
+        ids = [item[0] for item in items]
+        failed = {prediction_id: {"explanation_status": FAILED} for prediction_id in ids}
+        failure = None
+        # Only the model that scored a row can explain its stored risk; once that
+        # version has been replaced and dropped, the row is marked failed
+        bundle = get_bundle_version(disease_type, model_version) if model_version else None
+        if bundle is None:
+            print(f"Warning: Deferred explanation for {disease_type} skipped, model {model_version} is no longer loaded")
+            updates, failure = failed, "version_unavailable"
+        else:
+            try:
+                rows = [item[2] for item in items]
+                X = bundle.encode_batch(rows)
+                results = inference.compute_results(bundle, rows, X)
+                for x, result in zip(X, results):
+                    result_cache.put(make_key(bundle, x), result)
+                updates = {
+                    prediction_id: {
+                        "shap_values": result["shap_values"],
+                        "clinical_explanation": result["clinical_explanation"],
+                        "explanation_status": READY,
+                    }
+                    for prediction_id, result in zip(ids, results)
+                }
+            except Exception as e:
+                print(f"Warning: Deferred explanation for {disease_type} failed: {e}")
+                updates, failure = failed, "explain_errors"
+
+        try:
+            self._save(updates)
+        except Exception as e:
+            print(f"Warning: Could not save deferred explanations: {e}")
+            failure = "save_errors"
+
+        with self._stats_lock:
+            if failure is None:
+                self._stats["explained"] += len(ids)
+            else:
+                self._stats["failed"] += len(ids)
+                self._stats[failure] += len(ids)
+        with self._pending_lock:
+            waiters = [waiter for prediction_id in ids for waiter in self._pending.pop(prediction_id, [])]
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The waiter's loop has closed
+                pass
+
+    def _save(self, updates: Dict[int, Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            predictions = db.execute(select(Prediction).where(Prediction.id.in_(list(updates)))).scalars().all()
+            for prediction in predictions:
+                for field, value in updates[prediction.id].items():
+                    setattr(prediction, field, value)
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self.depth()
+        return stats
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
+
+
+_worker: Optional[ExplanationWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_worker() -> ExplanationWorker:
+    """Get the shared worker, starting it on first use"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = ExplanationWorker()
+    return _worker
+
+
+def submit(prediction_id: int, disease_type: str, row: Dict[str, Any], model_version: Optional[str]):
+    get_worker().submit(prediction_id, disease_type, row, model_version)
+
+
+def queue_depth() -> int:
+    return _worker.depth() if _worker is not None else 0
+
+
+async def wait_for(prediction_id: int, timeout: float) -> bool:
+    """
+    Wait until a prediction is explained, returning False on timeout.
+    Predictions not queued here return after a short pause so callers re-check the database.
+    """
+    future = _worker.watch(prediction_id) if _worker is not None else None
+    if future is None:
+        await asyncio.sleep(min(timeout, 1.0))
+        return True
+    try:
+        await asyncio.wait_for(future, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        _worker.unwatch(prediction_id, future)
+
+
+def resume_pending():
+    """Queue predictions left pending by a previous process, e.g. after a restart"""
+    db = SessionLocal()
+    try:
+        pending = db.execute(
+            select(Prediction.id, Prediction.disease_type, Prediction.input_data, Prediction.model_version)
+            .where(Prediction.explanation_status == PENDING)
+        ).all()
+    finally:
+        db.close()
+    for prediction_id, disease_type, input_data, model_version in pending:
+        submit(prediction_id, disease_type, input_data, model_version)
+    if pending:
+        print(f"Resumed {len(pending)} deferred explanations")
+
+
+def get_stats() -> Dict[str, Any]:
+    return _worker.stats() if _worker is not None else {**dict.fromkeys(STAT_COUNTERS, 0), "queue_depth": 0}
+
+
+metrics.register_source("deferred_explanations", get_stats)
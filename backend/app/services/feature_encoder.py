@@ -0,0 +1,135 @@
+"""
+CliniqAI Feature Encoder - Compiled, pandas-free input encoding
+"""
+import numpy as np
+from typing import Dict, Any, List, Optional, Callable
+
+# How each model column is read from the API input:
+# column -> (input key, kind, mapping config key, default input value)
+# Columns not listed here are plain numbers read from the key of the same name.
+DIABETES_FEATURE_SOURCES = {
+    "gender_encoded": ("gender", "category", "gender_map", "Female"),
+    "hypertension": ("hypertension", "flag", None, False),
+    "heart_disease": ("heart_disease", "flag", None, False),
+    "smoking_history_encoded": ("smoking_history", "category", "smoking_map", "never"),
+}
+
+HEART_FEATURE_SOURCES = {
+    "gender": ("gender", "category", "gender_map", "Female"),
+    "smoke": ("smoke", "flag", None, False),
+    "alco": ("alco", "flag", None, False),
+    "active": ("active", "flag", None, False),
+}
+
+FEATURE_SOURCES = {
+    "diabetes": DIABETES_FEATURE_SOURCES,
+    "heart_disease": HEART_FEATURE_SOURCES,
+}
+
+DEFAULT_MAPS = {
+    "diabetes": {
+        "gender_map": {"Female": 0, "Male": 1, "Other": 2},
+        "smoking_map": {"never": 0, "not current": 1, "ever": 2, "former": 3, "current": 4, "unknown": -1},
+    },
+    "heart_disease": {
+        # Gender mapping (1=Female, 2=Male from original dataset)
+        "gender_map": {"Female": 1, "Male": 2},
+    },
+}
+
+
+def _category_map(disease_type: str, config: Dict[str, Any], map_key: str) -> Dict[str, float]:
+    """Get a label -> code mapping, accepting the code -> label form used by heart_config.json"""
+    mapping = config.get(map_key) or DEFAULT_MAPS[disease_type][map_key]
+    if all(isinstance(v, str) for v in mapping.values()):
+        mapping = {label: code for code, label in mapping.items()}
+    return {label: float(code) for label, code in mapping.items()}
+
+
+def _compile_reader(key: str, kind: str, mapping: Optional[Dict[str, float]], default: Any) -> Callable[[Dict[str, Any]], float]:
+    """Build the function that reads one raw feature value from an input dict"""
+    if kind == "category":
+        default_code = mapping.get(default, 0.0)
+        return lambda data: mapping.get(data.get(key, default), default_code)
+    if kind == "flag":
+        return lambda data: 1.0 if data.get(key, default) else 0.0
+    return lambda data: float(data.get(key, 0))
+
+
+class FeatureEncoder:
+    """
+    Encodes API inputs straight into a model-ready numpy matrix.
+
+    Built once per model from config.json and the fitted StandardScaler; the
+    scaler is folded into per-column center/scale vectors (identity for the
+    columns it does not touch), so encoding is one list build plus one
+    vectorized affine transform.
+    """
+
+    def __init__(
+        self,
+        feature_cols: List[str],
+        readers: List[Callable[[Dict[str, Any]], float]],
+        center: np.ndarray,
+        scale: np.ndarray,
+        dtype=np.float64
+    ):
+        self.feature_cols = list(feature_cols)
+        self.n_features = len(self.feature_cols)
+        self.dtype = np.dtype(dtype)
+        self._readers = readers
+        self.center = np.asarray(center, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def from_config(cls, disease_type: str, config: Dict[str, Any], scaler=None, dtype=np.float64) -> "FeatureEncoder":
+        """Compile an encoder from a model config and an optional fitted scaler"""
+        sources = FEATURE_SOURCES[disease_type]
+        feature_cols = config["feature_cols"]
+
+        readers = []
+        for col in feature_cols:
+            key, kind, map_key, default = sources.get(col, (col, "number", None, 0))
+            mapping = _category_map(disease_type, config, map_key) if map_key else None
+            readers.append(_compile_reader(key, kind, mapping, default))
+
+        center = np.zeros(len(feature_cols))
+        scale = np.ones(len(feature_cols))
+
+        if scaler is not None:
+            scale_cols = list(getattr(scaler, "feature_names_in_", config.get("scale_cols", [])))
+            mean = getattr(scaler, "mean_", None)
+            std = getattr(scaler, "scale_", None)
+            n_scaled = len(mean if mean is not None else std)
+            if len(scale_cols) != n_scaled:
+                raise ValueError(f"Scaler expects {n_scaled} columns but config lists {len(scale_cols)}")
+
+            for i, col in enumerate(scale_cols):
+                if col not in feature_cols:
+                    raise ValueError(f"Scaler column '{col}' is not a model feature")
+                j = feature_cols.index(col)
+                if mean is not None:
+                    center[j] = mean[i]
+                if std is not None:
+                    scale[j] = std[i]
+
+        return cls(feature_cols, readers, center, scale, dtype)
+
+    def encode(self, data: Dict[str, Any], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Encode one input into a (1, n_features) matrix"""
+        return self.encode_batch([data], out)
+
+    def encode_batch(self, rows: List[Dict[str, Any]], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Encode many inputs into an (n_rows, n_features) matrix, optionally into a preallocated block"""
+        readers = self._readers
+        raw = [[read(row) for read in readers] for row in rows]
+
+        if out is None:
+            out = np.array(raw, dtype=self.dtype).reshape(len(rows), self.n_features)
+        else:
+            out[:len(rows)] = raw
+            out = out[:len(rows)]
+
+        out -= self.center.astype(out.dtype, copy=False)
+        out /= self.scale.astype(out.dtype, copy=False)
+        return out
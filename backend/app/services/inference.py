@@ -0,0 +1,134 @@
+"""
+CliniqAI Inference Service - Scored, explained and cached prediction results
+"""
+import asyncio
+import numpy as np
+from typing import Dict, Any, List, Tuple
+
+from ..config import MICRO_BATCH_ENABLED
+from . import bootstrap, model_service, shap_service
+from .model_bundle import ModelBundle, get_bundle
+from .result_cache import result_cache, make_key
+from .scheduler import get_batcher
+
+
+def compute_results(
+    bundle: ModelBundle,
+    rows: List[Dict[str, Any]],
+    X: np.ndarray,
+    method: str = "exact"
+) -> List[Dict[str, Any]]:
+    """Probability, confidence interval, SHAP values and explanation for every row the bundle encoded"""
+    disease_type = bundle.disease_type
+    probabilities, shap_batch, _ = model_service.predict_and_explain(disease_type, rows, X, bundle, method)
+    intervals = bootstrap.confidence_intervals(bundle, X if bundle.can_predict else None, probabilities)
+
+    return [
+        build_result(bundle, row, float(probability), shap_values, interval)
+        for row, probability, shap_values, interval in zip(rows, probabilities, shap_batch, intervals)
+    ]
+
+
+def build_result(
+    bundle: ModelBundle,
+    row: Dict[str, Any],
+    probability: float,
+    shap_values: List[Dict[str, Any]],
+    interval: Tuple[float, float]
+) -> Dict[str, Any]:
+    """The result dict for one scored and explained row"""
+    ci_low, ci_high = interval
+    return {
+        "risk_probability": probability,
+        "confidence_interval_low": ci_low,
+        "confidence_interval_high": ci_high,
+        "shap_values": shap_values,
+        "clinical_explanation": shap_service.generate_clinical_explanation(
+            bundle.disease_type, probability, shap_values, row
+        ),
+        "model_version": bundle.version,
+    }
+
+
+def _score_one(bundle: ModelBundle, row: Dict[str, Any], x: np.ndarray) -> Dict[str, Any]:
+    """Score one row, batched together with concurrent requests for the same model"""
+    if MICRO_BATCH_ENABLED:
+        return get_batcher(bundle.disease_type, compute_results).submit(bundle, row, x).result()
+    return compute_results(bundle, [row], x[None, :])[0]
+
+
+def score_rows(disease_type: str, rows: List[Dict[str, Any]], method: str = "exact") -> List[Dict[str, Any]]:
+    """
+    Score and explain inputs with the given SHAP method, serving repeats from the result cache.
+    The whole call uses one bundle, so a concurrent model swap never mixes versions.
+    Results are shared between requests and must not be modified.
+    """
+    bundle = get_bundle(disease_type)
+    X = bundle.encode_batch(rows)
+    keys = [make_key(bundle, x, method) for x in X]
+
+    if len(rows) == 1:
+        if method != "exact":
+            # Approximate explanations are cheap enough to skip the batching window
+            return [result_cache.get_or_compute(keys[0], lambda: compute_results(bundle, rows, X, method)[0])]
+        return [result_cache.get_or_compute(keys[0], lambda: _score_one(bundle, rows[0], X[0]))]
+
+    # Batches look every row up, then score each distinct miss once, all together
+    results = [result_cache.get(key) for key in keys]
+    missing: Dict[Any, List[int]] = {}
+    for i, result in enumerate(results):
+        if result is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        first = [indices[0] for indices in missing.values()]
+        computed = compute_results(bundle, [rows[i] for i in first], X[first], method)
+        for (key, indices), result in zip(missing.items(), computed):
+            result_cache.put(key, result)
+            for i in indices:
+                results[i] = result
+
+    return results
+
+
+def score_risk(disease_type: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Probability and confidence interval only, skipping SHAP, for deferred
+    explanations. Rows whose full result is already cached get it whole;
+    the others have shap_values and clinical_explanation set to None.
+    """
+    bundle = get_bundle(disease_type)
+    X = bundle.encode_batch(rows)
+    results = [result_cache.get(make_key(bundle, x)) for x in X]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+
+    if not bundle.can_predict:
+        # The fallback scores are cheap and come with simulated explanations
+        for i, result in zip(missing, compute_results(bundle, [rows[i] for i in missing], X[missing])):
+            results[i] = result
+        return results
+
+    probabilities = model_service.predict_proba_matrix(bundle, X[missing])
+    intervals = bootstrap.confidence_intervals(bundle, X[missing], probabilities)
+    for i, probability, (ci_low, ci_high) in zip(missing, probabilities, intervals):
+        probability = float(probability)
+        results[i] = {
+            "risk_probability": probability,
+            "confidence_interval_low": ci_low,
+            "confidence_interval_high": ci_high,
+            "shap_values": None,
+            "clinical_explanation": None,
+            "model_version": bundle.version,
+        }
+    return results
+
+
+async def score_rows_async(disease_type: str, rows: List[Dict[str, Any]], method: str = "exact") -> List[Dict[str, Any]]:
+    """score_rows for async handlers: the CPU-bound work runs off the event loop"""
+    return await asyncio.to_thread(score_rows, disease_type, rows, method)
+
+
+async def score_risk_async(disease_type: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """score_risk for async handlers"""
+    return await asyncio.to_thread(score_risk, disease_type, rows)
@@ -0,0 +1,17 @@
+"""
+CliniqAI Metrics - In-process service statistics reported by /metrics
+"""
+from typing import Dict, Any, Callable
+
+# name -> function returning that component's current statistics
+_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register_source(name: str, source: Callable[[], Dict[str, Any]]):
+    """Report a component's statistics under `name` in every metrics snapshot"""
+    _sources[name] = source
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Current statistics of every registered component"""
+    return {name: source() for name, source in _sources.items()}
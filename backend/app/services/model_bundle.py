@@ -0,0 +1,388 @@
+"""
+CliniqAI Model Bundles - One loaded model, scaler, explainer and encoder per disease
+"""
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+import joblib
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+from ..config import DIABETES_MODEL_DIR, HEART_MODEL_DIR, MODEL_ARTIFACTS_ENABLED, ARTIFACT_VERIFY_CHECKSUMS
+from .artifacts import changed_sources, find_artifact, read_artifact, read_manifest
+from .calibration import ProbabilityCalibration, load_calibration
+from .feature_encoder import FeatureEncoder
+from .tree_engine import TreeEnsemble
+
+DISEASE_TYPES = ("diabetes", "heart_disease")
+
+MODEL_DIRS = {
+    "diabetes": DIABETES_MODEL_DIR,
+    "heart_disease": HEART_MODEL_DIR,
+}
+
+# Artifact file names inside each model directory. "trees" holds the
+# flattened arrays written by `python -m app.jobs.export_trees`.
+BUNDLE_FILES = {
+    "diabetes": {
+        "model": "model.pkl",
+        "scaler": "scaler.pkl",
+        "explainer": "shap_explainer.pkl",
+        "config": "config.json",
+        "trees": "model_trees.npz",
+        "demo": "demo_patients.json",
+    },
+    "heart_disease": {
+        "model": "heart_model.pkl",
+        "scaler": "heart_scaler.pkl",
+        "explainer": "heart_shap_explainer.pkl",
+        "config": "heart_config.json",
+        "trees": "heart_model_trees.npz",
+        "demo": "heart_demo_patients.json",
+    },
+}
+
+FALLBACK_CONFIGS = {
+    "diabetes": {
+        "feature_cols": [
+            "gender_encoded", "age", "hypertension", "heart_disease",
+            "smoking_history_encoded", "bmi", "HbA1c_level", "blood_glucose_level"
+        ],
+        "scale_cols": ["age", "bmi", "HbA1c_level", "blood_glucose_level"],
+        "feature_names_display": [
+            "Gender", "Age", "Hypertension", "Heart Disease",
+            "Smoking History", "BMI", "HbA1c Level", "Blood Glucose"
+        ],
+        "optimal_threshold": 0.3,
+        "gender_map": {"Female": 0, "Male": 1, "Other": 2},
+        "smoking_map": {"never": 0, "not current": 1, "ever": 2, "former": 3, "current": 4, "unknown": -1},
+        "model_performance": {
+            "accuracy": 95.06,
+            "auc": 0.9741,
+            "recall": 78.21,
+            "precision": 74.49,
+            "threshold": 0.3,
+            "training_samples": 82781,
+            "dataset": "Diabetes Prediction Dataset — 100K patients"
+        },
+        "risk_levels": {
+            "Low": "0-30%",
+            "Moderate": "30-50%",
+            "High": "50-70%",
+            "Critical": "70-100%"
+        },
+        "clinical_thresholds": {
+            "HbA1c_normal": 5.7,
+            "HbA1c_prediabetic": 6.4,
+            "HbA1c_diabetic": 6.5,
+            "blood_glucose_normal": 100,
+            "blood_glucose_prediabetic": 125,
+            "blood_glucose_diabetic": 126
+        }
+    },
+    "heart_disease": {
+        "feature_cols": ["age", "gender", "ap_hi", "ap_lo", "smoke", "alco", "active", "bmi"],
+        "scale_cols": ["age", "ap_hi", "ap_lo", "bmi"],
+        "feature_names_display": ["Age", "Gender", "Systolic BP", "Diastolic BP", "Smoking", "Alcohol", "Physical Activity", "BMI"],
+        "optimal_threshold": 0.4,
+        "gender_map": {"1": "Female", "2": "Male"},
+        "model_performance": {
+            "accuracy": 73.26,
+            "auc": 0.7969,
+            "threshold": 0.4,
+            "training_samples": 68000,
+            "dataset": "Cardiovascular Disease Dataset — 68K patients"
+        },
+        "clinical_thresholds": {
+            "systolic_normal": 120,
+            "systolic_high": 130,
+            "diastolic_normal": 80
+        }
+    },
+}
+
+DEFAULT_THRESHOLDS = {
+    "diabetes": 0.3,
+    "heart_disease": 0.4,
+}
+
+
+class ModelBundle:
+    """
+    Everything needed to score and explain one disease model.
+
+    Loaded once per disease and shared by model_service and shap_service, so
+    a request reads the artifacts zero times and encodes its input once.
+    """
+
+    def __init__(
+        self,
+        disease_type: str,
+        model_dir: Path,
+        config: Dict[str, Any],
+        model=None,
+        scaler=None,
+        explainer=None,
+        engine: Optional[TreeEnsemble] = None,
+        calibration: Optional[ProbabilityCalibration] = None,
+        version: str = "fallback",
+        source: str = "pickle",
+        load_seconds: Optional[float] = None,
+        error: Optional[str] = None
+    ):
+        self.disease_type = disease_type
+        self.model_dir = Path(model_dir)
+        self.config = config
+        self.model = model
+        self.scaler = scaler
+        self.explainer = explainer
+        self.engine = engine
+        self.calibration = calibration
+        # A calibration table changes every served probability, so it is part of the version
+        self.base_version = version
+        self.version = f"{version}.{calibration.digest}" if calibration is not None else version
+        self.source = source
+        self.load_seconds = load_seconds
+        self.error = error
+        self.encoder = FeatureEncoder.from_config(disease_type, config, scaler)
+        self.feature_cols = list(config.get("feature_cols", []))
+        self.feature_names = list(config.get("feature_names_display", self.feature_cols))
+
+    @property
+    def threshold(self) -> float:
+        """Decision threshold on served probabilities; tuned on raw ones, so it is calibrated like them"""
+        threshold = self.config.get("optimal_threshold", DEFAULT_THRESHOLDS[self.disease_type])
+        return float(self.calibration.apply(threshold)) if self.calibration is not None else threshold
+
+    def calibrate(self, probabilities) -> np.ndarray:
+        """Served probabilities for raw model outputs: the calibration table applied, if there is one"""
+        if self.calibration is None:
+            return np.asarray(probabilities, dtype=np.float64)
+        return self.calibration.apply(probabilities)
+
+    @property
+    def can_predict(self) -> bool:
+        """The trained model is only meaningful on scaled inputs"""
+        return self.model is not None and self.scaler is not None
+
+    def encode(self, data: Dict[str, Any]) -> np.ndarray:
+        """Encode one input into the (1, n_features) matrix both prediction and SHAP consume"""
+        return self.encoder.encode(data)
+
+    def encode_batch(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        """Encode many inputs into one (n_rows, n_features) matrix"""
+        return self.encoder.encode_batch(rows)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.model is not None,
+            "scaler_loaded": self.scaler is not None,
+            "explainer_loaded": self.explainer is not None,
+            "native_engine": self.engine is not None,
+            "native_shap": self.engine is not None and self.engine.has_shap_tables,
+            "version": self.version,
+            "base_version": self.base_version,
+            "calibration": self.calibration.method if self.calibration is not None else None,
+            "source": self.source,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+def _load_pickle(path: Path):
+    """Unpickle an artifact, trying plain pickle, latin1, joblib and pickle5 in turn"""
+    errors = []
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        errors.append(f"pickle: {e}")
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f, encoding="latin1")
+    except Exception as e:
+        errors.append(f"latin1: {e}")
+    try:
+        # Scalers and explainers are written with joblib.dump (see predict.py)
+        return joblib.load(path)
+    except Exception as e:
+        errors.append(f"joblib: {e}")
+    try:
+        import pickle5
+        with open(path, "rb") as f:
+            return pickle5.load(f)
+    except Exception as e:
+        errors.append(f"pickle5: {e}")
+    raise Exception(f"All loading methods failed for {path.name}: {'; '.join(errors)}")
+
+
+def source_files(disease_type: str, model_dir: Path) -> List[Path]:
+    """The pickled files and config that determine a model's outputs"""
+    files = BUNDLE_FILES[disease_type]
+    return [Path(model_dir) / files[name] for name in ("model", "scaler", "config")]
+
+
+def _source_version(paths: List[Path]) -> str:
+    """Short content hash of the artifacts that determine a bundle's outputs"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def _load_tree_engine(trees_path: Path, model) -> Optional[TreeEnsemble]:
+    """Load exported tree arrays, or flatten the loaded booster if none were exported"""
+    try:
+        if trees_path.exists():
+            return TreeEnsemble.load(trees_path)
+        return TreeEnsemble.from_booster(model)
+    except Exception as e:
+        print(f"Warning: Native tree engine unavailable, using model.predict_proba: {e}")
+        return None
+
+
+def _load_artifact_bundle(disease_type: str, model_dir: Path, artifact_dir: Path, started: float) -> ModelBundle:
+    """Build a bundle from a pickle-free artifact directory"""
+    artifact = read_artifact(artifact_dir, verify=ARTIFACT_VERIFY_CHECKSUMS)
+    return ModelBundle(
+        disease_type, model_dir, artifact["config"],
+        model=artifact["model"], scaler=artifact["scaler"], engine=artifact["engine"],
+        calibration=load_calibration(model_dir, artifact["version"]),
+        version=artifact["version"], source="artifact",
+        load_seconds=round(time.perf_counter() - started, 3)
+    )
+
+
+def load_bundle(disease_type: str, model_dir: Optional[Path] = None, use_artifacts: bool = MODEL_ARTIFACTS_ENABLED) -> ModelBundle:
+    """Load one disease model from its artifact directory, or from the pickles if none was built"""
+    model_dir = Path(model_dir or MODEL_DIRS[disease_type])
+    files = BUNDLE_FILES[disease_type]
+    started = time.perf_counter()
+
+    artifact_dir = find_artifact(model_dir) if use_artifacts else None
+    if artifact_dir is not None:
+        try:
+            # A retrained or reconfigured model must not be shadowed by the artifact built before it
+            changed = changed_sources(read_manifest(artifact_dir), source_files(disease_type, model_dir))
+            if not changed:
+                return _load_artifact_bundle(disease_type, model_dir, artifact_dir, started)
+            print(
+                f"Warning: {disease_type} artifact {artifact_dir.name} is older than {', '.join(changed)}, using pickles; "
+                f"rebuild it with python -m app.jobs.build_artifacts"
+            )
+        except Exception as e:
+            print(f"Warning: Could not load {disease_type} artifact {artifact_dir.name}, using pickles: {e}")
+
+    try:
+        model = _load_pickle(model_dir / files["model"])
+        with open(model_dir / files["config"], "r") as f:
+            config = json.load(f)
+    except Exception as e:
+        print(f"Error loading {disease_type} model: {e}")
+        return ModelBundle(
+            disease_type, model_dir, FALLBACK_CONFIGS[disease_type],
+            load_seconds=round(time.perf_counter() - started, 3), error=str(e)
+        )
+
+    try:
+        scaler = _load_pickle(model_dir / files["scaler"])
+        # A scaler that does not match the config is treated like a missing one
+        FeatureEncoder.from_config(disease_type, config, scaler)
+    except Exception as e:
+        print(f"Warning: Could not load {disease_type} scaler: {e}")
+        scaler = None
+
+    try:
+        explainer = _load_pickle(model_dir / files["explainer"])
+    except Exception as e:
+        print(f"Warning: Could not load {disease_type} SHAP explainer: {e}")
+        explainer = None
+
+    engine = _load_tree_engine(model_dir / files["trees"], model)
+    version = _source_version(source_files(disease_type, model_dir))
+
+    return ModelBundle(
+        disease_type, model_dir, config,
+        model=model, scaler=scaler, explainer=explainer, engine=engine,
+        calibration=load_calibration(model_dir, version), version=version,
+        load_seconds=round(time.perf_counter() - started, 3)
+    )
+
+
+# Loaded bundles; the lock makes sure only one thread loads each one
+_bundles: Dict[str, ModelBundle] = {}
+_bundle_lock = threading.Lock()
+
+# Recently served bundles per disease, by version, so work queued against a
+# replaced bundle can still finish on it
+KEEP_VERSIONS = 3
+_versions: Dict[str, "OrderedDict[str, ModelBundle]"] = {disease_type: OrderedDict() for disease_type in DISEASE_TYPES}
+
+# Called with the disease type whenever its bundle is replaced
+_reload_listeners: List[Callable[[str], None]] = []
+
+
+def _remember(bundle: ModelBundle):
+    """Record a served bundle under its version; caller holds the lock"""
+    versions = _versions[bundle.disease_type]
+    versions[bundle.version] = bundle
+    versions.move_to_end(bundle.version)
+    while len(versions) > KEEP_VERSIONS:
+        versions.popitem(last=False)
+
+
+def get_bundle(disease_type: str) -> ModelBundle:
+    """Get the shared bundle for a disease, loading it on first use"""
+    bundle = _bundles.get(disease_type)
+    if bundle is None:
+        with _bundle_lock:
+            bundle = _bundles.get(disease_type)
+            if bundle is None:
+                bundle = load_bundle(disease_type)
+                _bundles[disease_type] = bundle
+                _remember(bundle)
+    return bundle
+
+
+def get_bundle_version(disease_type: str, version: str) -> Optional[ModelBundle]:
+    """A recently served bundle by version, or None if it is not (or no longer) loaded"""
+    with _bundle_lock:
+        return _versions[disease_type].get(version)
+
+
+def add_reload_listener(listener: Callable[[str], None]):
+    """Register a callback for bundle reloads, e.g. to drop results cached for the old model"""
+    _reload_listeners.append(listener)
+
+
+def swap_bundle(disease_type: str, bundle: ModelBundle):
+    """
+    Atomically make a fully loaded bundle the one new requests get.
+    Requests already holding the old bundle finish on it.
+    """
+    with _bundle_lock:
+        _bundles[disease_type] = bundle
+        _remember(bundle)
+    for listener in _reload_listeners:
+        listener(disease_type)
+
+
+def reload_bundle(disease_type: str, model_dir: Optional[Path] = None) -> ModelBundle:
+    """Load a disease's artifacts again and swap the new bundle in"""
+    bundle = load_bundle(disease_type, model_dir)
+    swap_bundle(disease_type, bundle)
+    return bundle
+
+
+def get_load_status() -> Dict[str, Dict[str, Any]]:
+    """Load status of every bundle; bundles not loaded yet are reported as such"""
+    status = {}
+    for disease_type in DISEASE_TYPES:
+        bundle = _bundles.get(disease_type)
+        status[disease_type] = bundle.status() if bundle else {"loaded": False, "load_seconds": None, "error": None}
+    return status
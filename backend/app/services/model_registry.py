@@ -0,0 +1,176 @@
+"""
+CliniqAI Model Registry - Versioned hot reload of model bundles
+"""
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import MODEL_WATCH_INTERVAL_SECONDS
+from . import model_service
+from .artifacts import ARTIFACTS_DIRNAME, LATEST_FILENAME
+from .calibration import CALIBRATION_DIRNAME
+from .feature_encoder import FEATURE_SOURCES
+from .model_bundle import DISEASE_TYPES, BUNDLE_FILES, ModelBundle, get_bundle, load_bundle, swap_bundle, source_files
+
+# One reload at a time per disease
+_reload_locks = {disease_type: threading.Lock() for disease_type in DISEASE_TYPES}
+
+# Outcome of the latest reload attempt per disease
+_last_reload: Dict[str, Dict[str, Any]] = {}
+
+_watcher: Optional[threading.Thread] = None
+_watcher_stop = threading.Event()
+
+
+def demo_inputs(bundle: ModelBundle) -> List[Dict[str, Any]]:
+    """
+    API inputs rebuilt from the demo patients file, whose entries list each
+    feature's display name and original value (and for heart, the raw input)
+    """
+    path = bundle.model_dir / BUNDLE_FILES[bundle.disease_type]["demo"]
+    if not path.exists():
+        return []
+    with open(path, "r") as f:
+        patients = json.load(f)
+
+    columns = dict(zip(bundle.feature_names, bundle.feature_cols))
+    sources = FEATURE_SOURCES[bundle.disease_type]
+    inputs = []
+    for patient in patients.values():
+        row = {}
+        for contribution in patient.get("contributions", []):
+            col = columns.get(contribution["feature"])
+            if col is None:
+                continue
+            key, kind, _, _ = sources.get(col, (col, "number", None, 0))
+            value = contribution["original_value"]
+            row[key] = value == "Yes" if kind == "flag" else value
+        inputs.append(row)
+    return inputs
+
+
+def smoke_test(bundle: ModelBundle) -> Tuple[bool, str]:
+    """Score and explain the demo patients with a candidate bundle before it serves traffic"""
+    if not bundle.can_predict:
+        return False, bundle.error or "model or scaler could not be loaded"
+
+    rows = demo_inputs(bundle)
+    if not rows:
+        return False, "no demo patients to test with"
+
+    try:
+        # Runs in this process on the candidate itself, and builds its SHAP
+        # tables so the first request after the swap is warm
+        margin, contributions = model_service.contributions_matrix(bundle, bundle.encode_batch(rows))
+    except Exception as e:
+        return False, f"scoring demo patients failed: {e}"
+
+    if not np.all(np.isfinite(margin)) or not np.all(np.isfinite(contributions)):
+        return False, "demo patient scores are not finite"
+    if contributions.shape != (len(rows), len(bundle.feature_cols)):
+        return False, "demo patient SHAP values do not cover every feature"
+    return True, f"scored {len(rows)} demo patients"
+
+
+def reload_model(disease_type: str, force: bool = False) -> Dict[str, Any]:
+    """
+    Load the disease's current artifacts into a new bundle, smoke test it
+    and swap it in. The serving bundle is untouched until the new one has
+    passed, and a failed candidate is simply dropped.
+    """
+    with _reload_locks[disease_type]:
+        started = time.perf_counter()
+        current = get_bundle(disease_type)
+        candidate = load_bundle(disease_type)
+
+        result = {
+            "disease_type": disease_type,
+            "previous_version": current.version,
+            "candidate_version": candidate.version,
+            "attempted_at": datetime.utcnow().isoformat(),
+        }
+
+        if candidate.version == current.version and current.can_predict and not force:
+            result.update(status="unchanged", message="model files have not changed")
+        else:
+            passed, message = smoke_test(candidate)
+            if passed:
+                swap_bundle(disease_type, candidate)
+                result.update(status="swapped", message=message)
+            else:
+                result.update(status="rejected", message=message)
+
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        if result["status"] != "unchanged" or disease_type not in _last_reload:
+            _last_reload[disease_type] = result
+        print(f"Model reload {disease_type}: {result['status']} ({result['message']})")
+        return result
+
+
+def _fingerprint(disease_type: str) -> Tuple:
+    """Sizes and modification times of the files a reload would read"""
+    model_dir = get_bundle(disease_type).model_dir
+    # The calibration directory's mtime changes whenever a table is written into it
+    paths = source_files(disease_type, model_dir) + [
+        Path(model_dir) / ARTIFACTS_DIRNAME / LATEST_FILENAME,
+        Path(model_dir) / CALIBRATION_DIRNAME,
+    ]
+    stats = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            stats.append((path.name, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            stats.append((path.name, None, None))
+    return tuple(stats)
+
+
+def _watch(interval: float):
+    fingerprints = {disease_type: _fingerprint(disease_type) for disease_type in DISEASE_TYPES}
+    while not _watcher_stop.wait(interval):
+        for disease_type in DISEASE_TYPES:
+            fingerprint = _fingerprint(disease_type)
+            if fingerprint != fingerprints[disease_type]:
+                fingerprints[disease_type] = fingerprint
+                try:
+                    reload_model(disease_type)
+                except Exception as e:
+                    print(f"Warning: Model reload for {disease_type} failed: {e}")
+
+
+def start_watcher(interval: float = MODEL_WATCH_INTERVAL_SECONDS):
+    """Poll the model directories and hot reload a model whenever its files change (0 disables)"""
+    global _watcher
+    if interval <= 0 or _watcher is not None:
+        return
+    _watcher_stop.clear()
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="model-watcher", daemon=True)
+    _watcher.start()
+
+
+def stop_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher_stop.set()
+        _watcher.join()
+        _watcher = None
+
+
+def get_registry_status() -> Dict[str, Any]:
+    return {
+        "watch_interval_seconds": MODEL_WATCH_INTERVAL_SECONDS,
+        "watching": _watcher is not None,
+        "models": {
+            disease_type: {
+                "serving_version": get_bundle(disease_type).version,
+                "source": get_bundle(disease_type).source,
+                "last_reload": _last_reload.get(disease_type),
+            }
+            for disease_type in DISEASE_TYPES
+        },
+    }
@@ -1,276 +1,76 @@
 """
 CliniqAI Model Service - XGBoost Model Loading and Prediction
 """
-import os
-import pickle
 import numpy as np
-import pandas as pd
-from pathlib import Path
-from typing import Dict, Any, Tuple, Optional
-import json
+from functools import partial
+from typing import Dict, Any, List, Tuple, Optional
 
-# Model directories
-DIABETES_MODEL_DIR = Path("D:/cliniqai/diabetes_model")
-HEART_MODEL_DIR = Path("D:/cliniqai/heart_model")
+from . import executor, shap_service
+from .feature_encoder import FeatureEncoder
+from .model_bundle import ModelBundle, get_bundle, get_bundle_version, reload_bundle, FALLBACK_CONFIGS
 
-# Global model cache
-_diabetes_model = None
-_diabetes_scaler = None
-_diabetes_config = None
-_heart_model = None
-_heart_scaler = None
-_heart_config = None
+# Above this many rows XGBoost's threaded C++ predictor beats the numpy engine
+NATIVE_ENGINE_MAX_ROWS = 256
 
-# Fallback flags
-_diabetes_load_error = False
-_heart_load_error = False
+# "exact" is path-dependent TreeSHAP; "approximate" is Saabas path attribution,
+# an order of magnitude cheaper and meant for interactive views such as what-if
+SHAP_METHODS = ("exact", "approximate")
 
 
 def load_diabetes_model():
     """Load diabetes model, scaler and config"""
-    global _diabetes_model, _diabetes_scaler, _diabetes_config, _diabetes_load_error
-    
-    if _diabetes_load_error:
-        return None, None, get_diabetes_config_fallback()
-    
-    if _diabetes_model is None:
-        try:
-            # Try multiple methods to load the model
-            
-            # Method 1: Try with default pickle.load
-            try:
-                with open(DIABETES_MODEL_DIR / "model.pkl", "rb") as f:
-                    _diabetes_model = pickle.load(f)
-                print("Diabetes model loaded successfully with default pickle.load")
-            except Exception as e1:
-                print(f"Method 1 failed: {e1}")
-                # Method 2: Try with encoding='latin1' or 'bytes'
-                try:
-                    with open(DIABETES_MODEL_DIR / "model.pkl", "rb") as f:
-                        _diabetes_model = pickle.load(f, encoding='latin1')
-                    print("Diabetes model loaded successfully with encoding='latin1'")
-                except Exception as e2:
-                    print(f"Method 2 failed: {e2}")
-                    # Method 3: Try with fix_imports=True
-                    try:
-                        import pickle5
-                        with open(DIABETES_MODEL_DIR / "model.pkl", "rb") as f:
-                            _diabetes_model = pickle5.load(f)
-                        print("Diabetes model loaded successfully with pickle5")
-                    except Exception as e3:
-                        print(f"Method 3 failed: {e3}")
-                        raise Exception(f"All loading methods failed. Last error: {e3}")
-            
-            # Load scaler with similar fallback methods
-            try:
-                with open(DIABETES_MODEL_DIR / "scaler.pkl", "rb") as f:
-                    _diabetes_scaler = pickle.load(f, encoding='latin1')
-            except:
-                try:
-                    with open(DIABETES_MODEL_DIR / "scaler.pkl", "rb") as f:
-                        _diabetes_scaler = pickle.load(f)
-                except Exception as e:
-                    print(f"Warning: Could not load scaler: {e}")
-                    _diabetes_scaler = None
-            
-            # Load config
-            with open(DIABETES_MODEL_DIR / "config.json", "r") as f:
-                _diabetes_config = json.load(f)
-                
-        except Exception as e:
-            print(f"Error loading diabetes model: {e}")
-            _diabetes_load_error = True
-            return None, None, get_diabetes_config_fallback()
-    
-    return _diabetes_model, _diabetes_scaler, _diabetes_config
+    bundle = get_bundle("diabetes")
+    if bundle.model is None:
+        return None, None, bundle.config
+    return bundle.model, bundle.scaler, bundle.config
 
 
 def load_heart_model():
     """Load heart disease model, scaler and config"""
-    global _heart_model, _heart_scaler, _heart_config, _heart_load_error
-    
-    if _heart_load_error:
-        return None, None, get_heart_config_fallback()
-    
-    if _heart_model is None:
-        try:
-            # Try multiple methods to load the model
-            
-            # Method 1: Try with default pickle.load
-            try:
-                with open(HEART_MODEL_DIR / "heart_model.pkl", "rb") as f:
-                    _heart_model = pickle.load(f)
-                print("Heart model loaded successfully with default pickle.load")
-            except Exception as e1:
-                print(f"Heart model Method 1 failed: {e1}")
-                # Method 2: Try with encoding='latin1' or 'bytes'
-                try:
-                    with open(HEART_MODEL_DIR / "heart_model.pkl", "rb") as f:
-                        _heart_model = pickle.load(f, encoding='latin1')
-                    print("Heart model loaded successfully with encoding='latin1'")
-                except Exception as e2:
-                    print(f"Heart model Method 2 failed: {e2}")
-                    # Method 3: Try with pickle5
-                    try:
-                        import pickle5
-                        with open(HEART_MODEL_DIR / "heart_model.pkl", "rb") as f:
-                            _heart_model = pickle5.load(f)
-                        print("Heart model loaded successfully with pickle5")
-                    except Exception as e3:
-                        print(f"Heart model Method 3 failed: {e3}")
-                        raise Exception(f"All heart loading methods failed. Last error: {e3}")
-            
-            # Load scaler with similar fallback methods
-            try:
-                with open(HEART_MODEL_DIR / "heart_scaler.pkl", "rb") as f:
-                    _heart_scaler = pickle.load(f, encoding='latin1')
-            except:
-                try:
-                    with open(HEART_MODEL_DIR / "heart_scaler.pkl", "rb") as f:
-                        _heart_scaler = pickle.load(f)
-                except Exception as e:
-                    print(f"Warning: Could not load heart scaler: {e}")
-                    _heart_scaler = None
-            
-            # Load config
-            with open(HEART_MODEL_DIR / "heart_config.json", "r") as f:
-                _heart_config = json.load(f)
-                
-        except Exception as e:
-            print(f"Error loading heart model: {e}")
-            _heart_load_error = True
-            return None, None, get_heart_config_fallback()
-    
-    return _heart_model, _heart_scaler, _heart_config
+    bundle = get_bundle("heart_disease")
+    if bundle.model is None:
+        return None, None, bundle.config
+    return bundle.model, bundle.scaler, bundle.config
 
 
 def get_diabetes_config_fallback():
     """Get fallback diabetes config"""
-    return {
-        "feature_cols": [
-            "gender_encoded", "age", "hypertension", "heart_disease",
-            "smoking_history_encoded", "bmi", "HbA1c_level", "blood_glucose_level"
-        ],
-        "scale_cols": ["age", "bmi", "HbA1c_level", "blood_glucose_level"],
-        "feature_names_display": [
-            "Gender", "Age", "Hypertension", "Heart Disease",
-            "Smoking History", "BMI", "HbA1c Level", "Blood Glucose"
-        ],
-        "optimal_threshold": 0.3,
-        "gender_map": {"Female": 0, "Male": 1, "Other": 2},
-        "smoking_map": {"never": 0, "not current": 1, "ever": 2, "former": 3, "current": 4, "unknown": -1},
-        "model_performance": {
-            "accuracy": 95.06,
-            "auc": 0.9741,
-            "recall": 78.21,
-            "precision": 74.49,
-            "threshold": 0.3,
-            "training_samples": 82781,
-            "dataset": "Diabetes Prediction Dataset — 100K patients"
-        },
-        "risk_levels": {
-            "Low": "0-30%",
-            "Moderate": "30-50%",
-            "High": "50-70%",
-            "Critical": "70-100%"
-        },
-        "clinical_thresholds": {
-            "HbA1c_normal": 5.7,
-            "HbA1c_prediabetic": 6.4,
-            "HbA1c_diabetic": 6.5,
-            "blood_glucose_normal": 100,
-            "blood_glucose_prediabetic": 125,
-            "blood_glucose_diabetic": 126
-        }
-    }
+    return dict(FALLBACK_CONFIGS["diabetes"])
 
 
 def get_heart_config_fallback():
     """Get fallback heart config"""
-    return {
-        "feature_cols": ["age", "gender", "ap_hi", "ap_lo", "smoke", "alco", "active", "bmi"],
-        "scale_cols": ["age", "ap_hi", "ap_lo", "bmi"],
-        "feature_names_display": ["Age", "Gender", "Systolic BP", "Diastolic BP", "Smoking", "Alcohol", "Physical Activity", "BMI"],
-        "optimal_threshold": 0.4,
-        "gender_map": {"1": "Female", "2": "Male"},
-        "model_performance": {
-            "accuracy": 73.26,
-            "auc": 0.7969,
-            "threshold": 0.4,
-            "training_samples": 68000,
-            "dataset": "Cardiovascular Disease Dataset — 68K patients"
-        },
-        "clinical_thresholds": {
-            "systolic_normal": 120,
-            "systolic_high": 130,
-            "diastolic_normal": 80
-        }
-    }
+    return dict(FALLBACK_CONFIGS["heart_disease"])
+
+
+def get_diabetes_encoder() -> FeatureEncoder:
+    """Get the compiled diabetes feature encoder"""
+    return get_bundle("diabetes").encoder
+
+
+def get_heart_encoder() -> FeatureEncoder:
+    """Get the compiled heart disease feature encoder"""
+    return get_bundle("heart_disease").encoder
 
 
 def preprocess_diabetes_input(data: Dict[str, Any]) -> np.ndarray:
     """Preprocess diabetes input data"""
-    _, scaler, config = load_diabetes_model()
-    
-    # Create feature vector
-    gender_map = config.get("gender_map", {"Female": 0, "Male": 1, "Other": 2})
-    smoking_map = config.get("smoking_map", {"never": 0, "not current": 1, "ever": 2, "former": 3, "current": 4, "unknown": -1})
-    
-    features = {
-        "gender_encoded": gender_map.get(data.get("gender", "Female"), 0),
-        "age": float(data.get("age", 0)),
-        "hypertension": 1 if data.get("hypertension", False) else 0,
-        "heart_disease": 1 if data.get("heart_disease", False) else 0,
-        "smoking_history_encoded": smoking_map.get(data.get("smoking_history", "never"), 0),
-        "bmi": float(data.get("bmi", 0)),
-        "HbA1c_level": float(data.get("HbA1c_level", 0)),
-        "blood_glucose_level": float(data.get("blood_glucose_level", 0)),
-    }
-    
-    # Create DataFrame
-    df = pd.DataFrame([features])
-    
-    # Scale numerical features if scaler is available
-    if scaler is not None:
-        scale_cols = config.get("scale_cols", ["age", "bmi", "HbA1c_level", "blood_glucose_level"])
-        try:
-            df[scale_cols] = scaler.transform(df[scale_cols])
-        except:
-            pass  # Use unscaled values if scaling fails
-    
-    return df.values
+    return get_diabetes_encoder().encode(data)
+
+
+def preprocess_diabetes_batch(rows: List[Dict[str, Any]]) -> np.ndarray:
+    """Preprocess many diabetes inputs into a single feature matrix"""
+    return get_diabetes_encoder().encode_batch(rows)
 
 
 def preprocess_heart_input(data: Dict[str, Any]) -> np.ndarray:
     """Preprocess heart disease input data"""
-    _, scaler, config = load_heart_model()
-    
-    # Gender mapping (1=Female, 2=Male from original dataset)
-    gender_map = {"Female": 1, "Male": 2}
-    
-    features = {
-        "age": float(data.get("age", 0)),
-        "gender": gender_map.get(data.get("gender", "Female"), 1),
-        "ap_hi": float(data.get("ap_hi", 0)),
-        "ap_lo": float(data.get("ap_lo", 0)),
-        "smoke": 1 if data.get("smoke", False) else 0,
-        "alco": 1 if data.get("alco", False) else 0,
-        "active": 1 if data.get("active", False) else 0,
-        "bmi": float(data.get("bmi", 0)),
-    }
-    
-    # Create DataFrame
-    df = pd.DataFrame([features])
-    
-    # Scale numerical features if scaler is available
-    if scaler is not None:
-        scale_cols = config.get("scale_cols", ["age", "ap_hi", "ap_lo", "bmi"])
-        try:
-            df[scale_cols] = scaler.transform(df[scale_cols])
-        except:
-            pass  # Use unscaled values if scaling fails
-    
-    return df.values
+    return get_heart_encoder().encode(data)
+
+
+def preprocess_heart_batch(rows: List[Dict[str, Any]]) -> np.ndarray:
+    """Preprocess many heart disease inputs into a single feature matrix"""
+    return get_heart_encoder().encode_batch(rows)
 
 
 def calculate_diabetes_probability_fallback(data: Dict[str, Any]) -> float:
@@ -398,72 +198,237 @@ def calculate_heart_probability_fallback(data: Dict[str, Any]) -> float:
     return min(max(probability, 0.01), 0.99)
 
 
-def predict_diabetes(input_data: Dict[str, Any]) -> Tuple[float, float]:
+def predict_proba_matrix(bundle: ModelBundle, X: np.ndarray, calibrated: bool = True) -> np.ndarray:
+    """
+    Positive-class probabilities for an encoded matrix, preferring the native
+    tree engine; calibrated=False returns the model's raw output
+    """
+    if bundle.engine is not None and len(X) <= NATIVE_ENGINE_MAX_ROWS:
+        probabilities = bundle.engine.predict_proba(X)
+    else:
+        probabilities = bundle.model.predict_proba(X)[:, 1]
+    return bundle.calibrate(probabilities) if calibrated else probabilities
+
+
+def predict_diabetes(input_data: Dict[str, Any], X: Optional[np.ndarray] = None) -> Tuple[float, float]:
     """
     Make diabetes prediction
     Returns: (probability, threshold_adjusted_probability)
     """
-    model, scaler, config = load_diabetes_model()
+    bundle = get_bundle("diabetes")
+    threshold = bundle.threshold
     
     # Check if model is available
-    if model is None:
+    if bundle.model is None:
         # Use fallback calculation
-        probability = calculate_diabetes_probability_fallback(input_data)
-        threshold = config.get("optimal_threshold", 0.3)
-        return probability, threshold
+        return calculate_diabetes_probability_fallback(input_data), threshold
     
     # Check if scaler is available - if not, use fallback calculation
-    if scaler is None:
+    if bundle.scaler is None:
         print("Warning: Scaler not available, using fallback calculation")
-        probability = calculate_diabetes_probability_fallback(input_data)
-        threshold = config.get("optimal_threshold", 0.3)
-        return probability, threshold
+        return calculate_diabetes_probability_fallback(input_data), threshold
     
-    # Preprocess
-    X = preprocess_diabetes_input(input_data)
+    # Preprocess unless the caller already encoded the input
+    if X is None:
+        X = bundle.encode(input_data)
     
     # Get probability
-    prob = model.predict_proba(X)[0][1]
-    
-    # Get threshold
-    threshold = config.get("optimal_threshold", 0.3)
+    prob = float(predict_proba_matrix(bundle, X)[0])
     
     return prob, threshold
 
 
-def predict_heart_disease(input_data: Dict[str, Any]) -> Tuple[float, float]:
+def predict_heart_disease(input_data: Dict[str, Any], X: Optional[np.ndarray] = None) -> Tuple[float, float]:
     """
     Make heart disease prediction
     Returns: (probability, threshold_adjusted_probability)
     """
-    model, scaler, config = load_heart_model()
+    bundle = get_bundle("heart_disease")
+    threshold = bundle.threshold
     
     # Check if model is available
-    if model is None:
+    if bundle.model is None:
         # Use fallback calculation
-        probability = calculate_heart_probability_fallback(input_data)
-        threshold = config.get("optimal_threshold", 0.4)
-        return probability, threshold
+        return calculate_heart_probability_fallback(input_data), threshold
     
     # Check if scaler is available - if not, use fallback calculation
-    if scaler is None:
+    if bundle.scaler is None:
         print("Warning: Heart scaler not available, using fallback calculation")
-        probability = calculate_heart_probability_fallback(input_data)
-        threshold = config.get("optimal_threshold", 0.4)
-        return probability, threshold
+        return calculate_heart_probability_fallback(input_data), threshold
     
-    # Preprocess
-    X = preprocess_heart_input(input_data)
+    # Preprocess unless the caller already encoded the input
+    if X is None:
+        X = bundle.encode(input_data)
     
     # Get probability
-    prob = model.predict_proba(X)[0][1]
-    
-    # Get threshold
-    threshold = config.get("optimal_threshold", 0.4)
+    prob = float(predict_proba_matrix(bundle, X)[0])
     
     return prob, threshold
 
 
+def predict_diabetes_batch(rows: List[Dict[str, Any]], X: Optional[np.ndarray] = None) -> Tuple[np.ndarray, float]:
+    """
+    Make diabetes predictions for many patients with one predict_proba call
+    Returns: (probabilities, threshold)
+    """
+    bundle = get_bundle("diabetes")
+    
+    # Same fallback rules as the single-row path
+    if not bundle.can_predict:
+        probabilities = np.array([calculate_diabetes_probability_fallback(row) for row in rows])
+        return probabilities, bundle.threshold
+    
+    if X is None:
+        X = bundle.encode_batch(rows)
+    
+    return predict_proba_matrix(bundle, X), bundle.threshold
+
+
+def predict_heart_disease_batch(rows: List[Dict[str, Any]], X: Optional[np.ndarray] = None) -> Tuple[np.ndarray, float]:
+    """
+    Make heart disease predictions for many patients with one predict_proba call
+    Returns: (probabilities, threshold)
+    """
+    bundle = get_bundle("heart_disease")
+    
+    if not bundle.can_predict:
+        probabilities = np.array([calculate_heart_probability_fallback(row) for row in rows])
+        return probabilities, bundle.threshold
+    
+    if X is None:
+        X = bundle.encode_batch(rows)
+    
+    return predict_proba_matrix(bundle, X), bundle.threshold
+
+
+def contributions_matrix(bundle: ModelBundle, X: np.ndarray, method: str = "exact") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Raw margins and per-feature contributions from a single pass over the trees.
+    Contributions of each row sum to its margin minus the model's expected value.
+    """
+    if method not in SHAP_METHODS:
+        raise ValueError(f"SHAP method must be one of {SHAP_METHODS}, got '{method}'")
+    
+    if bundle.engine is not None:
+        try:
+            if method == "approximate":
+                margin, contributions, _ = bundle.engine.predict_contributions_approx(X)
+            else:
+                margin, contributions, _ = bundle.engine.predict_contributions(X)
+            return margin, contributions
+        except ValueError as e:
+            print(f"Warning: Native SHAP tables unavailable, using pred_contribs: {e}")
+    
+    import xgboost
+    dmatrix = xgboost.DMatrix(X, feature_names=bundle.feature_cols)
+    contribs = bundle.model.get_booster().predict(dmatrix, pred_contribs=True, approx_contribs=method == "approximate")
+    # Last column is the bias term
+    return contribs.sum(axis=1, dtype=np.float64), contribs[:, :-1]
+
+
+def explain_matrix(disease_type: str, X: np.ndarray, version: str, method: str = "exact") -> Tuple[np.ndarray, np.ndarray]:
+    """contributions_matrix by disease name and model version, for process-pool workers"""
+    bundle = get_bundle_version(disease_type, version)
+    if bundle is None:
+        # This worker still serves an older model; pick up the new one
+        bundle = reload_bundle(disease_type)
+        if bundle.version != version:
+            print(f"Warning: {disease_type} model {version} is not on disk any more, using {bundle.version}")
+    return contributions_matrix(bundle, X, method)
+
+
+def _explain_with(bundle: ModelBundle, disease_type: str, X: np.ndarray, method: str = "exact") -> Tuple[np.ndarray, np.ndarray]:
+    return contributions_matrix(bundle, X, method)
+
+
+def explain_batch(
+    bundle: ModelBundle,
+    X: np.ndarray,
+    method: str = "exact"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Margins and the (n_rows, n_features) contribution matrix for an encoded
+    batch in one call, split across inference workers when configured
+    """
+    if executor.uses_processes():
+        # Workers hold their own bundles and look this one up by version
+        return executor.run_rows(explain_matrix, bundle.disease_type, X, bundle.version, method)
+    return executor.run_rows(partial(_explain_with, bundle), bundle.disease_type, X, method)
+
+
+def explain_rows(
+    disease_type: str,
+    rows: List[Dict[str, Any]],
+    method: str = "exact",
+    top_k: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Contribution matrix, probabilities and base value for raw inputs, plus
+    each row's top_k features when asked. Raises RuntimeError if the model is not loaded.
+    """
+    bundle = get_bundle(disease_type)
+    if not bundle.can_predict:
+        raise RuntimeError(f"{disease_type} model is not loaded")
+    
+    X = bundle.encode_batch(rows)
+    margin, contributions = explain_batch(bundle, X, method)
+    
+    return {
+        "disease_type": disease_type,
+        "method": method,
+        "model_version": bundle.version,
+        "feature_names": bundle.feature_names,
+        "base_value": float(margin[0] - contributions[0].sum()),
+        "risk_probabilities": bundle.calibrate(1.0 / (1.0 + np.exp(-margin))).tolist(),
+        "contributions": contributions.tolist(),
+        "top_features": shap_service.format_shap_batch(bundle.feature_names, contributions, top_k) if top_k else None,
+    }
+
+
+def predict_and_explain(
+    disease_type: str,
+    rows: List[Dict[str, Any]],
+    X: Optional[np.ndarray] = None,
+    bundle: Optional[ModelBundle] = None,
+    method: str = "exact"
+) -> Tuple[np.ndarray, List[List[Dict[str, Any]]], float]:
+    """
+    Score and explain patients together: the probability is the sigmoid of the
+    summed SHAP contributions, so the displayed factors always add up to the
+    model's margin, mapped through the model's calibration table if it has one.
+    Pass the bundle that encoded X so a concurrent model swap cannot mix versions.
+    Returns: (probabilities, shap_values per row, threshold)
+    """
+    bundle = bundle or get_bundle(disease_type)
+    
+    if not bundle.can_predict:
+        fallback = calculate_diabetes_probability_fallback if disease_type == "diabetes" else calculate_heart_probability_fallback
+        probabilities = np.array([fallback(row) for row in rows])
+        return probabilities, shap_service.generate_simulated_shap_values_batch(disease_type, rows), bundle.threshold
+    
+    if X is None:
+        X = bundle.encode_batch(rows)
+    
+    margin, contributions = explain_batch(bundle, X, method)
+    probabilities = bundle.calibrate(1.0 / (1.0 + np.exp(-margin)))
+    shap_values = shap_service.format_shap_batch(bundle.feature_names, contributions)
+    
+    return probabilities, shap_values, bundle.threshold
+
+
+# Inclusive upper bounds (in percent) of every risk category but the last, as in get_risk_category.
+# Categories are bands of the served, calibrated risk. The decision threshold is
+# tuned on raw outputs and calibrated with them (ModelBundle.threshold), so it
+# need not fall on a band edge: a patient can be over the threshold and still Low.
+RISK_CATEGORIES = ("Low", "Moderate", "High", "Critical")
+RISK_CATEGORY_BOUNDS_PCT = np.array([30.0, 50.0, 70.0])
+
+
+def get_risk_category_indices(probabilities: np.ndarray) -> np.ndarray:
+    """Vectorized get_risk_category: index into RISK_CATEGORIES for every probability"""
+    return np.searchsorted(RISK_CATEGORY_BOUNDS_PCT, np.asarray(probabilities) * 100, side="left")
+
+
 def get_risk_category(probability: float, risk_levels: Dict[str, str]) -> str:
     """Determine risk category based on probability"""
     probability_pct = probability * 100
@@ -79,6 +79,10 @@ def generate_pdf_bytes(
     pdf.set_font('Helvetica', '', 11)
     pdf.cell(0, 8, f"Risk Category: {risk_category}", ln=True)
     pdf.cell(0, 8, f"Confidence Interval: {ci_low:.1f}% - {ci_high:.1f}%", ln=True)
+    if prediction.get("population_percentile") is not None:
+        pdf.cell(0, 8, f"Population Percentile: higher risk than {prediction['population_percentile']:.1f}% of the reference population", ln=True)
+    if prediction.get("peer_percentile") is not None:
+        pdf.cell(0, 8, f"Peer Percentile ({prediction['peer_group']}): higher risk than {prediction['peer_percentile']:.1f}% of peers", ln=True)
     pdf.ln(5)
     
     # Patient Data Section
@@ -0,0 +1,136 @@
+"""
+CliniqAI Partial Dependence Service - Precomputed PDP and ICE curves for every model input
+
+Curves are built offline by `python -m app.jobs.build_pdp` and stored per
+model version as a compressed .npz:
+
+    <model_dir>/pdp/<version>.npz
+        meta         JSON: sample size, ICE rows and each feature's name, display name, kind and grid
+        pd_<i>       float16 (grid,) mean risk over the sample with feature i set to each grid value
+        ice_<i>      float16 (ice rows, grid) the same for individual sampled patients
+"""
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from . import model_service
+from .calibration import warn_stale_tables
+from .feature_encoder import FEATURE_SOURCES
+from .model_bundle import ModelBundle, get_bundle
+from .what_if import encode_axis, input_keys
+
+PDP_DIRNAME = "pdp"
+
+_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_cache_lock = threading.Lock()
+
+
+def pdp_path(bundle: ModelBundle) -> Path:
+    return Path(bundle.model_dir) / PDP_DIRNAME / f"{bundle.version}.npz"
+
+
+def features(bundle: ModelBundle) -> List[Tuple[str, str, str]]:
+    """(input key, display name, kind) for every model input, in model column order"""
+    sources = FEATURE_SOURCES[bundle.disease_type]
+    seen = {}
+    for col, key, display in zip(bundle.feature_cols, input_keys(bundle), bundle.feature_names):
+        if key not in seen:
+            kind = sources[col][1] if col in sources else "numeric"
+            seen[key] = (key, display, kind)
+    return list(seen.values())
+
+
+def feature_grid(rows: List[Dict[str, Any]], name: str, kind: str, grid_points: int) -> List[Any]:
+    """Grid of one input: sample quantiles for numbers, every value seen for flags and categories"""
+    values = [row[name] for row in rows]
+    if kind == "flag":
+        return [False, True]
+    if kind == "category":
+        labels, counts = np.unique(np.asarray(values, dtype=object).astype(str), return_counts=True)
+        return [str(label) for label in labels[np.argsort(-counts, kind="stable")]]
+    quantiles = np.quantile(np.asarray(values, dtype=np.float64), np.linspace(0.0, 1.0, grid_points))
+    return sorted({round(float(q), 2) for q in quantiles})
+
+
+def compute_feature(
+    bundle: ModelBundle,
+    rows: List[Dict[str, Any]],
+    X: np.ndarray,
+    name: str,
+    grid: List[Any],
+    n_ice: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Partial dependence and ICE curves of one input over an encoded sample.
+    Every grid value is written into a copy of the sample and the whole
+    (grid x sample) matrix is scored in one call.
+    """
+    columns, encoded = encode_axis(bundle, rows[0], name, grid)
+    n_rows = len(X)
+    stacked = np.tile(X, (len(grid), 1))
+    stacked[:, columns] = np.repeat(encoded, n_rows, axis=0)
+    risk = model_service.predict_proba_matrix(bundle, stacked).reshape(len(grid), n_rows)
+    return risk.mean(axis=1), risk[:, :n_ice].T
+
+
+def write_pdp(
+    bundle: ModelBundle,
+    sample_size: int,
+    curves: List[Tuple[Tuple[str, str, str], List[Any], np.ndarray, np.ndarray]]
+) -> Path:
+    """Store computed curves as the PDP cache of the bundle's model version"""
+    path = pdp_path(bundle)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "disease_type": bundle.disease_type,
+        "model_version": bundle.version,
+        "sample_size": sample_size,
+        "ice_rows": int(curves[0][3].shape[0]) if curves else 0,
+        "created_at": datetime.utcnow().isoformat(),
+        "features": [
+            {"name": name, "display_name": display, "kind": kind, "grid": grid}
+            for (name, display, kind), grid, _, _ in curves
+        ],
+    }
+    arrays = {"meta": np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)}
+    for i, (_, _, pd, ice) in enumerate(curves):
+        arrays[f"pd_{i}"] = pd.astype(np.float16)
+        arrays[f"ice_{i}"] = ice.astype(np.float16)
+    # Written beside the target and renamed, so readers never see half a file
+    tmp = path.with_name(path.name + ".tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    tmp.replace(path)
+    with _cache_lock:
+        _cache.pop((bundle.disease_type, bundle.version), None)
+    return path
+
+
+def _load(path: Path) -> Dict[str, Any]:
+    with np.load(path) as data:
+        meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+        for i, feature in enumerate(meta["features"]):
+            feature["partial_dependence"] = data[f"pd_{i}"].astype(np.float64).round(4).tolist()
+            feature["ice"] = data[f"ice_{i}"].astype(np.float64).round(4).tolist()
+    return meta
+
+
+def get_pdp(disease_type: str) -> Optional[Dict[str, Any]]:
+    """Curves of the current model version, or None if the job has not been run for it"""
+    bundle = get_bundle(disease_type)
+    key = (disease_type, bundle.version)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    path = pdp_path(bundle)
+    if not path.exists():
+        warn_stale_tables(path.parent, bundle.base_version, bundle.version, ".npz", "build_pdp")
+        return None
+    curves = _load(path)
+    with _cache_lock:
+        _cache[key] = curves
+    return curves
@@ -0,0 +1,162 @@
+"""
+CliniqAI Population Service - Where a patient's risk falls among the training population
+
+`python -m app.jobs.build_population_index` scores every row of a model's
+dataset and stores the sorted risks per model version:
+
+    <model_dir>/population/<version>/
+        index.json          group -> file and row count, build settings
+        all.npy             sorted float32 risk of every row
+        <group>.npy         the same for one gender and age band ("Female 50-59")
+
+A request's percentile is a binary search into the memory-mapped arrays.
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import POPULATION_AGE_BANDS
+from . import metrics
+from .calibration import warn_stale_tables
+from .model_bundle import ModelBundle, add_reload_listener, get_bundle, get_bundle_version
+
+POPULATION_DIRNAME = "population"
+INDEX_FILENAME = "index.json"
+ALL_GROUP = "all"
+
+
+def age_band(age: float) -> str:
+    """Age band label of POPULATION_AGE_BANDS, e.g. "<30", "50-59", "70+" """
+    edges = POPULATION_AGE_BANDS
+    i = int(np.searchsorted(edges, age, side="right"))
+    if i == 0:
+        return f"<{edges[0]}"
+    if i == len(edges):
+        return f"{edges[-1]}+"
+    return f"{edges[i - 1]}-{edges[i] - 1}"
+
+
+def peer_group(row: Dict[str, Any]) -> Optional[str]:
+    """Gender and age band of an input, the key of its peer array"""
+    if row.get("gender") is None or row.get("age") is None:
+        return None
+    return f"{row['gender']} {age_band(float(row['age']))}"
+
+
+class PopulationIndex:
+    """Sorted population risks of one model version, overall and per peer group"""
+
+    def __init__(self, scores: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.scores = scores
+        self.meta = meta
+
+    @staticmethod
+    def percentile(scores: np.ndarray, probability: float) -> float:
+        """Percent of the population below this risk, counting ties as half"""
+        below = np.searchsorted(scores, probability, side="left")
+        at_or_below = np.searchsorted(scores, probability, side="right")
+        return round(float(below + at_or_below) / 2 / len(scores) * 100, 1)
+
+    def lookup(self, probability: float, row: Dict[str, Any]) -> Dict[str, Any]:
+        # Arrays hold float32, so compare at that precision
+        probability = np.float32(probability)
+        group = peer_group(row)
+        peers = self.scores.get(group) if group else None
+        return {
+            "population_percentile": self.percentile(self.scores[ALL_GROUP], probability),
+            "peer_percentile": self.percentile(peers, probability) if peers is not None else None,
+            "peer_group": group if peers is not None else None,
+        }
+
+    def save(self, directory: Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        groups = {}
+        for i, (group, scores) in enumerate(sorted(self.scores.items())):
+            filename = f"{ALL_GROUP}.npy" if group == ALL_GROUP else f"group_{i}.npy"
+            np.save(directory / filename, np.sort(scores).astype(np.float32))
+            groups[group] = {"file": filename, "n": int(len(scores))}
+        with open(directory / INDEX_FILENAME, "w") as f:
+            json.dump({**self.meta, "groups": groups}, f, indent=2)
+
+    @classmethod
+    def load(cls, directory: Path) -> "PopulationIndex":
+        directory = Path(directory)
+        with open(directory / INDEX_FILENAME, "r") as f:
+            meta = json.load(f)
+        groups = meta.pop("groups")
+        scores = {group: np.load(directory / entry["file"], mmap_mode="r") for group, entry in groups.items()}
+        return cls(scores, meta)
+
+
+def index_path(bundle: ModelBundle) -> Path:
+    return Path(bundle.model_dir) / POPULATION_DIRNAME / bundle.version
+
+
+_indexes: Dict[Tuple[str, str], PopulationIndex] = {}
+_indexes_lock = threading.Lock()
+_stats = {"lookups": 0, "unindexed": 0}
+_stats_lock = threading.Lock()
+
+EMPTY = {"population_percentile": None, "peer_percentile": None, "peer_group": None}
+
+
+def get_index(bundle: ModelBundle) -> Optional[PopulationIndex]:
+    """Population index of the bundle's model version, or None if it has not been built"""
+    key = (bundle.disease_type, bundle.version)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+    path = index_path(bundle)
+    if not (path / INDEX_FILENAME).exists():
+        warn_stale_tables(path.parent, bundle.base_version, bundle.version, "", "build_population_index")
+        return None
+    with _indexes_lock:
+        if key not in _indexes:
+            try:
+                _indexes[key] = PopulationIndex.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: Could not load population index from {path}: {e}")
+                return None
+        return _indexes[key]
+
+
+def percentiles(
+    disease_type: str,
+    model_version: Optional[str],
+    probabilities: List[float],
+    rows: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Population and peer-group percentile of risks scored by one model
+    version, with every field None when that version has no index
+    """
+    bundle = (model_version and get_bundle_version(disease_type, model_version)) or get_bundle(disease_type)
+    index = get_index(bundle) if bundle.version == model_version else None
+    with _stats_lock:
+        _stats["lookups" if index is not None else "unindexed"] += len(probabilities)
+    if index is None:
+        return [EMPTY] * len(probabilities)
+    return [index.lookup(p, row) for p, row in zip(probabilities, rows)]
+
+
+def _drop_indexes(disease_type: str):
+    with _indexes_lock:
+        for key in [k for k in _indexes if k[0] == disease_type]:
+            del _indexes[key]
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        "loaded": {f"{d}:{v}": len(index.scores[ALL_GROUP]) for (d, v), index in list(_indexes.items())},
+        **stats,
+    }
+
+
+add_reload_listener(_drop_indexes)
+metrics.register_source("population", get_stats)
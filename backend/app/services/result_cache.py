@@ -0,0 +1,168 @@
+"""
+CliniqAI Result Cache - Content-addressed cache of scored and explained inputs
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Optional, Tuple
+
+import numpy as np
+
+from ..config import RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS
+from . import metrics
+from .model_bundle import ModelBundle, add_reload_listener
+
+# (disease type, model version, SHAP method, digest of the encoded feature vector)
+CacheKey = Tuple[str, str, str, str]
+
+
+def make_key(bundle: ModelBundle, x: np.ndarray, method: str = "exact") -> CacheKey:
+    """Key one encoded row by the model that scores it, the SHAP method and its exact feature values"""
+    # float64, contiguous and +0.0 so equal vectors always hash to equal bytes
+    row = np.ascontiguousarray(x, dtype=np.float64).ravel() + 0.0
+    return bundle.disease_type, bundle.version, method, hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest()
+
+
+def _size_of(value: Any) -> int:
+    """Approximate memory held by a cached result (dicts, lists, strings and numbers)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_size_of(k) + _size_of(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_size_of(v) for v in value)
+    return size
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of prediction results with a per-entry TTL.
+
+    Memory is capped by the approximate size of the stored results rather
+    than their count. Concurrent misses on the same key share one
+    computation: the first caller computes, the others wait for its result.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[CacheKey, Tuple[Dict[str, Any], int, float]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, Future] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "shared_in_flight": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Cached result for a key, or None (counts a hit or a miss)"""
+        with self._lock:
+            value = self._lookup(key)
+            self._counters["hits" if value is not None else "misses"] += 1
+            return value
+
+    def put(self, key: CacheKey, value: Dict[str, Any]):
+        """Store a result, evicting least recently used entries to stay under max_bytes"""
+        if not self.enabled:
+            return
+        size = _size_of(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._counters["evictions"] += 1
+
+    def get_or_compute(self, key: CacheKey, compute: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Cached result for a key, computing it once even when many threads miss together"""
+        if not self.enabled:
+            return compute()
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self._counters["hits"] += 1
+                return value
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters["shared_in_flight"] += 1
+                owner = False
+            else:
+                self._counters["misses"] += 1
+                future = Future()
+                self._in_flight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def invalidate(self, disease_type: Optional[str] = None):
+        """Drop every cached result, or only those of one disease model"""
+        with self._lock:
+            keys = [k for k in self._entries if disease_type is None or k[0] == disease_type]
+            for key in keys:
+                self._remove(key)
+            self._counters["invalidations"] += len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "in_flight": len(self._in_flight),
+                **self._counters,
+            }
+
+    def _lookup(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """Return a live entry and mark it most recently used; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, _, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+# Shared cache for all prediction routes
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_ENABLED)
+
+# Results computed by a replaced model must never be served again
+add_reload_listener(result_cache.invalidate)
+metrics.register_source("result_cache", result_cache.stats)
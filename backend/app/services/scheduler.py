@@ -0,0 +1,148 @@
+"""
+CliniqAI Inference Scheduler - Micro-batching of concurrent single-patient requests
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, List, Callable
+
+import numpy as np
+
+from ..config import MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_ROWS, MICRO_BATCH_MAX_QUEUE
+from . import metrics
+from .model_bundle import ModelBundle
+
+# compute(bundle, rows, X) -> one result per row
+BatchCompute = Callable[[ModelBundle, List[Dict[str, Any]], np.ndarray], List[Any]]
+
+
+class SchedulerBusy(Exception):
+    """Raised when a model's request queue is full"""
+    pass
+
+
+class MicroBatcher:
+    """
+    Gathers concurrent requests for one disease model into batches.
+
+    A worker thread takes the oldest queued request, keeps collecting until
+    the window since that request arrived closes or max_rows are gathered,
+    then scores the whole batch with one call and resolves every caller's
+    future. A full queue rejects new requests instead of growing latency
+    without bound.
+    """
+
+    def __init__(
+        self,
+        disease_type: str,
+        compute: BatchCompute,
+        window_ms: float = MICRO_BATCH_WINDOW_MS,
+        max_rows: int = MICRO_BATCH_MAX_ROWS,
+        max_queue: int = MICRO_BATCH_MAX_QUEUE
+    ):
+        self.disease_type = disease_type
+        self.compute = compute
+        self.window_seconds = window_ms / 1000.0
+        self.max_rows = max_rows
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "rejected": 0,
+            "batches": 0,
+            "max_batch_size": 0,
+            "total_queue_delay_ms": 0.0,
+            "max_queue_delay_ms": 0.0,
+        }
+        self._worker = threading.Thread(target=self._run, name=f"micro-batcher-{disease_type}", daemon=True)
+        self._worker.start()
+
+    def submit(self, bundle: ModelBundle, row: Dict[str, Any], x: np.ndarray) -> Future:
+        """Queue one row encoded by `bundle`; the future resolves to its result"""
+        future = Future()
+        try:
+            self._queue.put_nowait((row, x, future, time.perf_counter(), bundle))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["rejected"] += 1
+            raise SchedulerBusy(f"{self.disease_type} inference queue is full")
+        return future
+
+    def _collect(self) -> List[tuple]:
+        """Block for the next request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        deadline = batch[0][3] + self.window_seconds
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            # Rows queued across a model swap are scored by the bundle that encoded them
+            groups: Dict[int, List[tuple]] = {}
+            for item in batch:
+                groups.setdefault(id(item[4]), []).append(item)
+
+            for group in groups.values():
+                rows = [item[0] for item in group]
+                X = np.vstack([item[1] for item in group])
+                try:
+                    results = self.compute(group[0][4], rows, X)
+                except Exception as e:
+                    for item in group:
+                        item[2].set_exception(e)
+                else:
+                    for item, result in zip(group, results):
+                        item[2].set_result(result)
+
+            delays = [(started - item[3]) * 1000.0 for item in batch]
+            with self._stats_lock:
+                self._stats["requests"] += len(batch)
+                self._stats["batches"] += 1
+                self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+                self._stats["total_queue_delay_ms"] += sum(delays)
+                self._stats["max_queue_delay_ms"] = max(self._stats["max_queue_delay_ms"], max(delays))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches, requests = stats["batches"], stats["requests"]
+        stats["mean_batch_size"] = round(requests / batches, 2) if batches else 0.0
+        stats["mean_queue_delay_ms"] = round(stats.pop("total_queue_delay_ms") / requests, 3) if requests else 0.0
+        stats["max_queue_delay_ms"] = round(stats["max_queue_delay_ms"], 3)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["window_ms"] = self.window_seconds * 1000.0
+        stats["max_rows"] = self.max_rows
+        return stats
+
+
+# One batcher per disease model, started on first use
+_batchers: Dict[str, MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(disease_type: str, compute: BatchCompute) -> MicroBatcher:
+    """Get the shared batcher for a disease, starting it on first use"""
+    batcher = _batchers.get(disease_type)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(disease_type)
+            if batcher is None:
+                batcher = MicroBatcher(disease_type, compute)
+                _batchers[disease_type] = batcher
+    return batcher
+
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    return {disease_type: batcher.stats() for disease_type, batcher in _batchers.items()}
+
+
+metrics.register_source("micro_batching", get_stats)
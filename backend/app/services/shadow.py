@@ -0,0 +1,269 @@
+"""
+CliniqAI Shadow Evaluation - Candidate models scored next to production after each response
+"""
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from fastapi import BackgroundTasks
+from sqlalchemy import select
+
+from ..config import SHADOW_MODEL_DIRS, SHADOW_SAMPLE_RATE, SHADOW_MAX_PENDING
+from ..database import SessionLocal
+from ..models import ShadowComparison
+from . import metrics, model_service
+from .model_bundle import DISEASE_TYPES, ModelBundle, load_bundle, get_bundle_version
+from .model_registry import smoke_test
+
+# Upper edges of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+_candidates: Dict[str, ModelBundle] = {}
+_candidates_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {
+    "scheduled": 0,
+    "evaluated_rows": 0,
+    "dropped": 0,
+    "skipped": 0,
+    "failed": 0,
+    "pending": 0,
+}
+
+
+def _count(name: str, n: int = 1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def load_candidate(disease_type: str, model_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Load and smoke test a disease's candidate model; it only runs in shadow once it passed"""
+    model_dir = model_dir or SHADOW_MODEL_DIRS.get(disease_type)
+    if not model_dir:
+        return {"disease_type": disease_type, "status": "disabled", "message": "no shadow model directory configured"}
+
+    candidate = load_bundle(disease_type, Path(model_dir))
+    passed, message = smoke_test(candidate)
+    if passed:
+        with _candidates_lock:
+            _candidates[disease_type] = candidate
+    print(f"Shadow candidate {disease_type} {candidate.version}: {'loaded' if passed else 'rejected'} ({message})")
+    return {
+        "disease_type": disease_type,
+        "status": "loaded" if passed else "rejected",
+        "candidate_version": candidate.version,
+        "message": message,
+    }
+
+
+def load_candidates():
+    """Load the candidate of every disease that has a shadow model directory configured"""
+    for disease_type in DISEASE_TYPES:
+        if SHADOW_MODEL_DIRS.get(disease_type):
+            try:
+                load_candidate(disease_type)
+            except Exception as e:
+                print(f"Warning: Could not load {disease_type} shadow candidate: {e}")
+
+
+def get_candidate(disease_type: str) -> Optional[ModelBundle]:
+    return _candidates.get(disease_type)
+
+
+def schedule(
+    background_tasks: BackgroundTasks,
+    disease_type: str,
+    rows: List[Dict[str, Any]],
+    results: List[Dict[str, Any]],
+    risk_levels: Dict[str, str]
+):
+    """
+    Queue a shadow evaluation of served results, run once the response is sent.
+    Requests are sampled, and dropped rather than queued when too many
+    evaluations are already pending, so shadow mode never backs up serving.
+    """
+    candidate = _candidates.get(disease_type)
+    if candidate is None or not rows or random.random() >= SHADOW_SAMPLE_RATE:
+        return
+    with _stats_lock:
+        if _stats["pending"] >= SHADOW_MAX_PENDING:
+            _stats["dropped"] += 1
+            return
+        _stats["pending"] += 1
+        _stats["scheduled"] += 1
+    background_tasks.add_task(evaluate, candidate, disease_type, rows, results, risk_levels)
+
+
+def _timed_probabilities(bundle: ModelBundle, X: np.ndarray):
+    """Probabilities and per-row milliseconds for one model on a matrix"""
+    started = time.perf_counter()
+    margin, _ = model_service.contributions_matrix(bundle, X)
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    return bundle.calibrate(1.0 / (1.0 + np.exp(-margin))), elapsed_ms / len(X)
+
+
+def evaluate(
+    candidate: ModelBundle,
+    disease_type: str,
+    rows: List[Dict[str, Any]],
+    results: List[Dict[str, Any]],
+    risk_levels: Dict[str, str]
+):
+    """
+    Score the served rows with the candidate and store one comparison per row.
+    Both models score and explain the same encoded matrix in this thread, so
+    their latencies are measured under the same conditions.
+    """
+    try:
+        production = get_bundle_version(disease_type, results[0]["model_version"])
+        if production is None or not production.can_predict:
+            # The production model was replaced before this evaluation ran
+            _count("skipped")
+            return
+
+        X = production.encode_batch(rows)
+        X_candidate = X if candidate.feature_cols == production.feature_cols else candidate.encode_batch(rows)
+
+        _, production_ms = _timed_probabilities(production, X)
+        candidate_probabilities, candidate_ms = _timed_probabilities(candidate, X_candidate)
+
+        comparisons = []
+        for result, candidate_probability in zip(results, candidate_probabilities):
+            production_probability = result["risk_probability"]
+            candidate_probability = float(candidate_probability)
+            comparisons.append(ShadowComparison(
+                disease_type=disease_type,
+                production_version=production.version,
+                candidate_version=candidate.version,
+                production_probability=production_probability,
+                candidate_probability=candidate_probability,
+                delta=candidate_probability - production_probability,
+                production_category=model_service.get_risk_category(production_probability, risk_levels),
+                candidate_category=model_service.get_risk_category(candidate_probability, risk_levels),
+                production_latency_ms=production_ms,
+                candidate_latency_ms=candidate_ms,
+                batch_size=len(rows)
+            ))
+
+        db = SessionLocal()
+        try:
+            db.add_all(comparisons)
+            db.commit()
+        finally:
+            db.close()
+        _count("evaluated_rows", len(comparisons))
+    except Exception as e:
+        _count("failed")
+        print(f"Warning: Shadow evaluation for {disease_type} failed: {e}")
+    finally:
+        _count("pending", -1)
+
+
+def _latency_summary(latencies_ms: np.ndarray) -> Dict[str, Any]:
+    counts = np.bincount(
+        np.searchsorted(LATENCY_BUCKETS_MS, latencies_ms, side="left"),
+        minlength=len(LATENCY_BUCKETS_MS) + 1
+    )
+    labels = [f"<={edge}" for edge in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        "mean": round(float(latencies_ms.mean()), 4),
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "histogram": dict(zip(labels, counts.tolist())),
+    }
+
+
+def get_report(disease_type: str, candidate_version: Optional[str] = None) -> Dict[str, Any]:
+    """Aggregate score deltas, risk category agreement and latencies of one candidate version"""
+    if candidate_version is None:
+        candidate = _candidates.get(disease_type)
+        candidate_version = candidate.version if candidate else None
+
+    db = SessionLocal()
+    try:
+        if candidate_version is None:
+            # No candidate loaded any more: report the last one evaluated
+            candidate_version = db.execute(
+                select(ShadowComparison.candidate_version)
+                .where(ShadowComparison.disease_type == disease_type)
+                .order_by(ShadowComparison.id.desc())
+                .limit(1)
+            ).scalar_one_or_none()
+
+        records = db.execute(
+            select(
+                ShadowComparison.production_version,
+                ShadowComparison.delta,
+                ShadowComparison.production_category,
+                ShadowComparison.candidate_category,
+                ShadowComparison.production_latency_ms,
+                ShadowComparison.candidate_latency_ms,
+            ).where(
+                ShadowComparison.disease_type == disease_type,
+                ShadowComparison.candidate_version == candidate_version
+            )
+        ).all()
+    finally:
+        db.close()
+
+    report = {
+        "disease_type": disease_type,
+        "candidate_version": candidate_version,
+        "samples": len(records),
+    }
+    if not records:
+        return report
+
+    production_versions, deltas, production_categories, candidate_categories, production_ms, candidate_ms = zip(*records)
+    abs_deltas = np.abs(np.asarray(deltas))
+    p50, p95, p99 = np.percentile(abs_deltas, [50, 95, 99])
+
+    transitions: Dict[str, int] = {}
+    for before, after in zip(production_categories, candidate_categories):
+        if before != after:
+            key = f"{before} -> {after}"
+            transitions[key] = transitions.get(key, 0) + 1
+    disagreements = sum(transitions.values())
+
+    production_latency = _latency_summary(np.asarray(production_ms))
+    candidate_latency = _latency_summary(np.asarray(candidate_ms))
+
+    report.update({
+        "production_versions": sorted(set(production_versions)),
+        "score_delta": {
+            "mean": round(float(np.mean(deltas)), 6),
+            "mean_abs": round(float(abs_deltas.mean()), 6),
+            "p50_abs": round(float(p50), 6),
+            "p95_abs": round(float(p95), 6),
+            "p99_abs": round(float(p99), 6),
+            "max_abs": round(float(abs_deltas.max()), 6),
+        },
+        "risk_category": {
+            "agreement_rate": round(1.0 - disagreements / len(records), 4),
+            "disagreements": disagreements,
+            "transitions": transitions,
+        },
+        "latency_ms": {
+            "production": production_latency,
+            "candidate": candidate_latency,
+        },
+        "p50_speedup": round(production_latency["p50"] / candidate_latency["p50"], 3) if candidate_latency["p50"] > 0 else None,
+    })
+    return report
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["sample_rate"] = SHADOW_SAMPLE_RATE
+    stats["candidates"] = {disease_type: bundle.version for disease_type, bundle in _candidates.items()}
+    return stats
+
+
+metrics.register_source("shadow", get_stats)
@@ -1,156 +1,112 @@
 """
 CliniqAI SHAP Service - Explainable AI
 """
-import pickle
 import numpy as np
-import json
-from pathlib import Path
-from typing import Dict, Any, List, Tuple
-import pandas as pd
+from typing import Dict, Any, List, Tuple, Optional
 
-# Model directories
-DIABETES_MODEL_DIR = Path("D:/cliniqai/diabetes_model")
-HEART_MODEL_DIR = Path("D:/cliniqai/heart_model")
-
-# Global explainer cache
-_diabetes_explainer = None
-_heart_explainer = None
+from .model_bundle import get_bundle
 
 
 def load_diabetes_explainer():
     """Load diabetes SHAP explainer"""
-    global _diabetes_explainer
-    
-    if _diabetes_explainer is None:
-        try:
-            with open(DIABETES_MODEL_DIR / "shap_explainer.pkl", "rb") as f:
-                _diabetes_explainer = pickle.load(f)
-        except:
-            _diabetes_explainer = None
-    
-    return _diabetes_explainer
+    return get_bundle("diabetes").explainer
 
 
 def load_heart_explainer():
     """Load heart disease SHAP explainer"""
-    global _heart_explainer
-    
-    if _heart_explainer is None:
-        try:
-            with open(HEART_MODEL_DIR / "heart_shap_explainer.pkl", "rb") as f:
-                _heart_explainer = pickle.load(f)
-        except:
-            _heart_explainer = None
-    
-    return _heart_explainer
+    return get_bundle("heart_disease").explainer
 
 
 def get_diabetes_config():
     """Get diabetes config"""
-    with open(DIABETES_MODEL_DIR / "config.json", "r") as f:
-        return json.load(f)
+    return get_bundle("diabetes").config
 
 
 def get_heart_config():
     """Get heart config"""
-    with open(HEART_MODEL_DIR / "heart_config.json", "r") as f:
-        return json.load(f)
+    return get_bundle("heart_disease").config
 
 
-def generate_shap_values_diabetes(input_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Generate SHAP values for diabetes prediction"""
-    explainer = load_diabetes_explainer()
-    config = get_diabetes_config()
-    
-    if explainer is None:
-        # Return simulated SHAP values if explainer not available
-        return generate_simulated_shap_values(input_data, config)
-    
-    # Preprocess input similar to model service
-    gender_map = config.get("gender_map", {"Female": 0, "Male": 1, "Other": 2})
-    smoking_map = config.get("smoking_map", {"never": 0, "not current": 1, "ever": 2, "former": 3, "current": 4, "unknown": -1})
-    
-    features = {
-        "gender_encoded": gender_map.get(input_data.get("gender", "Female"), 0),
-        "age": float(input_data.get("age", 0)),
-        "hypertension": 1 if input_data.get("hypertension", False) else 0,
-        "heart_disease": 1 if input_data.get("heart_disease", False) else 0,
-        "smoking_history_encoded": smoking_map.get(input_data.get("smoking_history", "never"), 0),
-        "bmi": float(input_data.get("bmi", 0)),
-        "HbA1c_level": float(input_data.get("HbA1c_level", 0)),
-        "blood_glucose_level": float(input_data.get("blood_glucose_level", 0)),
-    }
-    
-    feature_cols = config.get("feature_cols", list(features.keys()))
-    feature_names = config.get("feature_names_display", feature_cols)
-    
-    # Create DataFrame
-    df = pd.DataFrame([features])[feature_cols]
-    
-    try:
-        # Get SHAP values
-        shap_values = explainer.shap_values(df)
-        
-        # Flatten and create result
-        results = []
-        for i, (feature, name) in enumerate(zip(feature_cols, feature_names)):
-            value = float(shap_values[0][i]) if hasattr(shap_values, '__len__') else float(shap_values[i])
-            results.append({
-                "feature": name,
-                "value": round(value, 4),
-                "impact": "positive" if value > 0 else "negative"
-            })
-        
-        # Sort by absolute value
-        results.sort(key=lambda x: abs(x["value"]), reverse=True)
-        return results
-    except:
-        return generate_simulated_shap_values(input_data, config)
+def generate_shap_values_diabetes(input_data: Dict[str, Any], X: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Generate SHAP values for diabetes prediction, reusing the encoded matrix when given"""
+    if X is None:
+        X = get_bundle("diabetes").encode(input_data)
+    return generate_shap_values_batch("diabetes", [input_data], X)[0]
+
 
+def generate_shap_values_heart(input_data: Dict[str, Any], X: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Generate SHAP values for heart disease prediction, reusing the encoded matrix when given"""
+    if X is None:
+        X = get_bundle("heart_disease").encode(input_data)
+    return generate_shap_values_batch("heart_disease", [input_data], X)[0]
 
-def generate_shap_values_heart(input_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Generate SHAP values for heart disease prediction"""
-    explainer = load_heart_explainer()
+
+def rank_features(contributions: np.ndarray, top_k: Optional[int] = None) -> np.ndarray:
+    """
+    Column indices of every row's features by descending |contribution|, as
+    displayed (rounded to 4 places). With top_k only the k largest are
+    selected with argpartition and then ordered, instead of sorting every feature.
+    """
+    magnitude = np.abs(np.round(contributions, 4))
+    if top_k is None or top_k >= magnitude.shape[1]:
+        return np.argsort(-magnitude, axis=1, kind="stable")
+    top = np.argpartition(-magnitude, top_k - 1, axis=1)[:, :top_k]
+    order = np.argsort(-np.take_along_axis(magnitude, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1)
+
+
+def format_shap_batch(
+    feature_names: List[str],
+    contributions: np.ndarray,
+    top_k: Optional[int] = None
+) -> List[List[Dict[str, Any]]]:
+    """Turn a contribution matrix into the sorted SHAP lists the API returns, optionally only the top_k per row"""
+    order = rank_features(contributions, top_k)
+    ordered = np.take_along_axis(contributions, order, axis=1)
+    names = np.asarray(feature_names, dtype=object)[order].tolist()
+    rounded = np.round(ordered, 4).tolist()
+    positive = (ordered > 0).tolist()
+    return [
+        [
+            {"feature": name, "value": value, "impact": "positive" if is_positive else "negative"}
+            for name, value, is_positive in zip(row_names, row_values, row_positive)
+        ]
+        for row_names, row_values, row_positive in zip(names, rounded, positive)
+    ]
+
+
+def format_shap_values(feature_names: List[str], contributions: np.ndarray) -> List[Dict[str, Any]]:
+    """Turn one row of per-feature contributions into the sorted SHAP list the API returns"""
+    return format_shap_batch(feature_names, np.asarray(contributions)[None, :])[0]
+
+
+def generate_simulated_shap_values_batch(disease_type: str, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Simulated SHAP values for every row, used when the model cannot be explained"""
+    if disease_type == "diabetes":
+        config = get_diabetes_config()
+        return [generate_simulated_shap_values(row, config) for row in rows]
     config = get_heart_config()
+    return [generate_simulated_shap_values_heart(row, config) for row in rows]
+
+
+def generate_shap_values_batch(
+    disease_type: str,
+    rows: List[Dict[str, Any]],
+    X: np.ndarray
+) -> List[List[Dict[str, Any]]]:
+    """Generate SHAP values for a whole batch with one explainer call"""
+    bundle = get_bundle(disease_type)
     
-    if explainer is None:
-        return generate_simulated_shap_values_heart(input_data, config)
-    
-    # Preprocess input
-    gender_map = {"Female": 1, "Male": 2}
-    
-    features = {
-        "age": float(input_data.get("age", 0)),
-        "gender": gender_map.get(input_data.get("gender", "Female"), 1),
-        "ap_hi": float(input_data.get("ap_hi", 0)),
-        "ap_lo": float(input_data.get("ap_lo", 0)),
-        "smoke": 1 if input_data.get("smoke", False) else 0,
-        "alco": 1 if input_data.get("alco", False) else 0,
-        "active": 1 if input_data.get("active", False) else 0,
-        "bmi": float(input_data.get("bmi", 0)),
-    }
-    
-    feature_cols = config.get("feature_cols", list(features.keys()))
-    feature_names = config.get("feature_names_display", feature_cols)
-    
-    df = pd.DataFrame([features])[feature_cols]
+    if bundle.explainer is None:
+        return generate_simulated_shap_values_batch(disease_type, rows)
     
     try:
-        shap_values = explainer.shap_values(df)
-        
-        results = []
-        for i, (feature, name) in enumerate(zip(feature_cols, feature_names)):
-            value = float(shap_values[0][i]) if hasattr(shap_values, '__len__') else float(shap_values[i])
-            results.append({
-                "feature": name,
-                "value": round(value, 4),
-                "impact": "positive" if value > 0 else "negative"
-            })
-        
-        results.sort(key=lambda x: abs(x["value"]), reverse=True)
-        return results
-    except:
-        return generate_simulated_shap_values_heart(input_data, config)
+        shap_matrix = np.asarray(bundle.explainer.shap_values(X)).reshape(len(rows), -1)
+    except Exception as e:
+        print(f"Batch SHAP failed, using simulated values: {e}")
+        return generate_simulated_shap_values_batch(disease_type, rows)
+    
+    return format_shap_batch(bundle.feature_names, shap_matrix)
 
 
 # Helper function to safely get float values
@@ -237,10 +193,9 @@ def generate_simulated_shap_values_heart(input_data: Dict[str, Any], config: dic
 
 def calculate_confidence_interval(probability: float, n_iterations: int = 100, confidence: float = 0.95) -> Tuple[float, float]:
     """
-    Calculate bootstrap confidence interval for probability
+    Fixed-width approximation of the confidence interval, used when a model
+    has no bootstrap replicas (see bootstrap.confidence_intervals)
     """
-    # Simple bootstrap-like calculation with noise
-    # In production, would use actual bootstrap sampling
     std_dev = 0.05  # Assume 5% standard deviation
     z = 1.96 if confidence == 0.95 else 2.576  # z-score for 95% or 99%
     
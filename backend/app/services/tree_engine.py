@@ -0,0 +1,672 @@
+"""
+CliniqAI Tree Engine - Native numpy inference for exported XGBoost ensembles
+"""
+import json
+import math
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+# Longest leaf path that gets a precomputed SHAP table (2^splits rows per
+# leaf); deeper ensembles raise and callers fall back to XGBoost
+MAX_SHAP_PATH_SPLITS = 10
+
+# Rows scored per chunk when gathering SHAP tables, to bound temporary memory
+SHAP_CHUNK_ROWS = 64
+
+# Array entries of build_shap_tables(); the rest of the dict is scalars
+SHAP_TABLE_ARRAYS = ("internal", "leaf_values", "path_node", "path_left", "path_valid", "full_pattern", "offsets", "table")
+
+
+def _sigmoid(margin: np.ndarray) -> np.ndarray:
+    """Logistic link used by binary:logistic"""
+    return 1.0 / (1.0 + np.exp(-margin))
+
+
+class TreeEnsemble:
+    """
+    A boosted tree ensemble flattened into numpy node arrays.
+
+    All trees share one node table. Leaves point their children back at
+    themselves, so every row can take exactly `max_depth` steps through
+    every tree without any per-tree Python loop.
+    """
+
+    ARRAYS = ("feature", "threshold", "left", "right", "default_left", "value", "cover", "roots")
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        default_left: np.ndarray,
+        value: np.ndarray,
+        cover: np.ndarray,
+        roots: np.ndarray,
+        base_margin: float,
+        max_depth: int,
+        n_features: int
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.cover = cover
+        self.roots = roots
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+
+        # Traversal tables: leaves split on feature 0 and both children point
+        # back at the leaf, so a step is gather + compare + gather
+        self._split_feature = np.maximum(feature, 0).astype(np.intp)
+        self._children = np.stack([left, right], axis=1).reshape(-1).astype(np.intp)
+        self._shap_tables = None
+        self._node_means = None
+        self._tree_index = None
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_booster(cls, booster) -> "TreeEnsemble":
+        """Flatten an xgboost Booster (or XGBClassifier) through its JSON model dump"""
+        if hasattr(booster, "get_booster"):
+            booster = booster.get_booster()
+        return cls.from_model_json(json.loads(booster.save_raw(raw_format="json")))
+
+    @classmethod
+    def from_model_json(cls, model: Dict[str, Any]) -> "TreeEnsemble":
+        """Flatten the JSON document produced by Booster.save_raw('json')"""
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported objective: {objective}")
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        if any(int(t["tree_param"].get("size_leaf_vector", "1")) > 1 or t["categories_nodes"] for t in trees):
+            raise ValueError("Only scalar-leaf numerical trees are supported")
+
+        base_score = float(learner["learner_model_param"]["base_score"])
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+        feature, threshold, left, right, default_left, value, cover, roots = ([] for _ in range(8))
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            lc = np.asarray(tree["left_children"], dtype=np.int32)
+            rc = np.asarray(tree["right_children"], dtype=np.int32)
+            n_nodes = len(lc)
+            is_leaf = lc == -1
+            own = np.arange(n_nodes, dtype=np.int32)
+
+            feature.append(np.where(is_leaf, -1, tree["split_indices"]).astype(np.int32))
+            threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            left.append(np.where(is_leaf, own, lc) + offset)
+            right.append(np.where(is_leaf, own, rc) + offset)
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            # Leaves keep their output in split_conditions; internal nodes keep base_weights
+            value.append(np.where(is_leaf, tree["split_conditions"], tree["base_weights"]).astype(np.float32))
+            cover.append(np.asarray(tree["sum_hessian"], dtype=np.float32))
+            roots.append(offset)
+
+            depth = np.zeros(n_nodes, dtype=np.int32)
+            for node in range(n_nodes):
+                if not is_leaf[node]:
+                    depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += n_nodes
+
+        return cls(
+            feature=np.concatenate(feature),
+            threshold=np.concatenate(threshold),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value),
+            cover=np.concatenate(cover),
+            roots=np.asarray(roots, dtype=np.int32),
+            base_margin=base_margin,
+            max_depth=max_depth,
+            n_features=int(learner["learner_model_param"]["num_feature"])
+        )
+
+    @classmethod
+    def concatenate(cls, engines: List["TreeEnsemble"]) -> "TreeEnsemble":
+        """
+        One ensemble holding every tree of several ensembles over the same
+        features, so they can all be traversed in one pass. The base margin
+        is 0; callers that score each part separately add their own.
+        """
+        offsets = np.cumsum([0] + [len(engine.feature) for engine in engines[:-1]])
+        return cls(
+            feature=np.concatenate([engine.feature for engine in engines]),
+            threshold=np.concatenate([engine.threshold for engine in engines]),
+            left=np.concatenate([engine.left + offset for engine, offset in zip(engines, offsets)]).astype(np.int32),
+            right=np.concatenate([engine.right + offset for engine, offset in zip(engines, offsets)]).astype(np.int32),
+            default_left=np.concatenate([engine.default_left for engine in engines]),
+            value=np.concatenate([engine.value for engine in engines]),
+            cover=np.concatenate([engine.cover for engine in engines]),
+            roots=np.concatenate([engine.roots + offset for engine, offset in zip(engines, offsets)]).astype(np.int32),
+            base_margin=0.0,
+            max_depth=max(engine.max_depth for engine in engines),
+            n_features=engines[0].n_features
+        )
+
+    def save(self, path: Union[str, Path]):
+        """Write the node arrays to a single .npz file"""
+        np.savez(
+            path,
+            base_margin=self.base_margin,
+            max_depth=self.max_depth,
+            n_features=self.n_features,
+            **{name: getattr(self, name) for name in self.ARRAYS}
+        )
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "TreeEnsemble":
+        """Read node arrays written by save()"""
+        with np.load(path) as data:
+            return cls(
+                base_margin=float(data["base_margin"]),
+                max_depth=int(data["max_depth"]),
+                n_features=int(data["n_features"]),
+                **{name: data[name] for name in cls.ARRAYS}
+            )
+
+    def save_dir(self, directory: Union[str, Path]):
+        """
+        Write every array (and the SHAP tables, if built) as its own .npy file
+        plus a trees.json with the scalars, so load_dir can memory-map them
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        meta = {"base_margin": self.base_margin, "max_depth": self.max_depth, "n_features": self.n_features}
+        for name in self.ARRAYS:
+            np.save(directory / f"{name}.npy", getattr(self, name))
+        if self._shap_tables is not None:
+            for name in SHAP_TABLE_ARRAYS:
+                np.save(directory / f"shap_{name}.npy", self._shap_tables[name])
+            meta["shap_expected_value"] = self._shap_tables["expected_value"]
+        with open(directory / "trees.json", "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load_dir(cls, directory: Union[str, Path], mmap_mode: Optional[str] = "r") -> "TreeEnsemble":
+        """Read arrays written by save_dir(), memory-mapped by default so processes share pages"""
+        directory = Path(directory)
+        with open(directory / "trees.json", "r") as f:
+            meta = json.load(f)
+        engine = cls(
+            base_margin=meta["base_margin"],
+            max_depth=meta["max_depth"],
+            n_features=meta["n_features"],
+            **{name: np.load(directory / f"{name}.npy", mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        )
+        if "shap_expected_value" in meta:
+            tables = {name: np.load(directory / f"shap_{name}.npy", mmap_mode=mmap_mode) for name in SHAP_TABLE_ARRAYS}
+            tables["expected_value"] = meta["shap_expected_value"]
+            engine._shap_tables = tables
+        return engine
+
+    @property
+    def has_shap_tables(self) -> bool:
+        return self._shap_tables is not None
+
+    def leaf_indices(self, X: np.ndarray) -> np.ndarray:
+        """Return the (n_rows, n_trees) global leaf index reached by each row in each tree"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (n_rows, self.n_trees)).copy()
+
+        if np.isnan(X).any():
+            return self._leaf_indices_missing(X, nodes)
+
+        # XGBoost goes left on x < threshold, i.e. right on x >= threshold
+        flat_x = X.reshape(-1)
+        row_offset = (np.arange(n_rows, dtype=np.intp) * X.shape[1])[:, None]
+        for _ in range(self.max_depth):
+            go_right = flat_x[row_offset + self._split_feature[nodes]] >= self.threshold[nodes]
+            nodes = self._children[2 * nodes + go_right]
+
+        return nodes
+
+    def _leaf_indices_missing(self, X: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Slower traversal that follows default_left for missing (NaN) values"""
+        row_idx = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            x = X[row_idx, self._split_feature[nodes]]
+            go_left = np.where(np.isnan(x), self.default_left[nodes], x < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def predict_margin(self, X: np.ndarray) -> np.ndarray:
+        """Raw (log-odds) score for every row"""
+        leaves = self.leaf_indices(X)
+        return self.value[leaves].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Positive-class probability for every row, matching XGBClassifier.predict_proba(X)[:, 1]"""
+        return _sigmoid(self.predict_margin(X))
+
+    def _leaf_paths(self) -> List[List[Tuple[int, bool]]]:
+        """Root-to-leaf paths of every leaf as (node, went_left) steps, in node order"""
+        paths = []
+        for root in self.roots:
+            stack = [(int(root), [])]
+            while stack:
+                node, path = stack.pop()
+                if self.feature[node] < 0:
+                    paths.append((node, path))
+                    continue
+                stack.append((int(self.right[node]), path + [(node, False)]))
+                stack.append((int(self.left[node]), path + [(node, True)]))
+        paths.sort(key=lambda item: item[0])
+        return paths
+
+    def build_shap_tables(self):
+        """
+        Precompute exact path-dependent TreeSHAP for every leaf.
+
+        A leaf contributes value * prod_f (a_f if f in S else b_f) to the
+        expectation over feature subset S, where b_f is the cover fraction of
+        the path through splits on f and a_f is 1 when the row satisfies all
+        of those splits, else 0. Only which path splits a row satisfies
+        depends on the row, so every leaf gets a table with one Shapley vector
+        per satisfied-split bitmask and scoring becomes a gather. The leaf a
+        row actually reaches is the one whose splits are all satisfied, so
+        the same pass also yields the margin.
+        """
+        if self._shap_tables is not None:
+            return self._shap_tables
+
+        paths = self._leaf_paths()
+        n_leaves = len(paths)
+        max_len = max(len(path) for _, path in paths)
+        internal = np.flatnonzero(self.feature >= 0)
+        internal_index = np.full(len(self.feature), -1, dtype=np.intp)
+        internal_index[internal] = np.arange(len(internal))
+
+        leaf_nodes = np.zeros(n_leaves, dtype=np.intp)
+        path_node = np.zeros((max_len, n_leaves), dtype=np.intp)
+        path_left = np.zeros((max_len, n_leaves), dtype=bool)
+        path_valid = np.zeros((max_len, n_leaves), dtype=bool)
+        full_pattern = np.zeros(n_leaves, dtype=np.int64)
+        offsets = np.zeros(n_leaves, dtype=np.int64)
+        expected = 0.0
+
+        # Leaves grouped by (path length, distinct features) for vectorized table building
+        groups: Dict[Tuple[int, int], List[Tuple[int, List[int], List[int], List[float]]]] = {}
+
+        for i, (leaf, path) in enumerate(paths):
+            leaf_nodes[i] = leaf
+            features, fractions, slots = [], [], []
+            for p, (node, went_left) in enumerate(path):
+                f = int(self.feature[node])
+                child = self.left[node] if went_left else self.right[node]
+                fraction = float(self.cover[child]) / float(self.cover[node])
+                if f in features:
+                    slot = features.index(f)
+                    fractions[slot] *= fraction
+                else:
+                    slot = len(features)
+                    features.append(f)
+                    fractions.append(fraction)
+                slots.append(slot)
+                path_node[p, i] = internal_index[node]
+                path_left[p, i] = went_left
+                path_valid[p, i] = True
+
+            if len(path) > MAX_SHAP_PATH_SPLITS:
+                raise ValueError(f"Leaf path has {len(path)} splits; SHAP tables support at most {MAX_SHAP_PATH_SPLITS}")
+            full_pattern[i] = (1 << len(path)) - 1
+            expected += float(self.value[leaf]) * math.prod(fractions)
+            groups.setdefault((len(path), len(features)), []).append((i, features, slots, fractions))
+
+        sizes = full_pattern + 1
+        offsets[1:] = np.cumsum(sizes)[:-1]
+        table = np.zeros((int(sizes.sum()), self.n_features), dtype=np.float32)
+
+        for (m, d), members in groups.items():
+            if d == 0:
+                continue
+            idx = np.array([member[0] for member in members])
+            feats = np.array([member[1] for member in members], dtype=np.intp)
+            slots = np.array([member[2] for member in members], dtype=np.intp)
+            b = np.array([member[3] for member in members], dtype=np.float64)
+            phi = _leaf_shapley(b, self.value[leaf_nodes[idx]].astype(np.float64))
+
+            # A feature counts as satisfied only if every split on it along the path is
+            split_bits = (np.arange(1 << m)[:, None] >> np.arange(m)[None, :]) & 1  # (2^m, m)
+            feature_pattern = np.zeros((len(idx), 1 << m), dtype=np.intp)
+            for slot in range(d):
+                on_slot = slots == slot  # (n, m)
+                satisfied = np.all(split_bits[None, :, :].astype(bool) | ~on_slot[:, None, :], axis=2)
+                feature_pattern |= satisfied.astype(np.intp) << slot
+
+            rows = offsets[idx][:, None] + np.arange(1 << m)[None, :]
+            per_split = np.take_along_axis(phi, feature_pattern[:, :, None], axis=1)  # (n, 2^m, d)
+            for slot in range(d):
+                table[rows, feats[:, slot][:, None]] += per_split[:, :, slot]
+
+        self._shap_tables = {
+            "internal": internal,
+            "leaf_values": self.value[leaf_nodes].astype(np.float64),
+            "path_node": path_node,
+            "path_left": path_left,
+            "path_valid": path_valid,
+            "full_pattern": full_pattern,
+            "offsets": offsets,
+            "table": table,
+            "expected_value": expected + self.base_margin,
+        }
+        return self._shap_tables
+
+    @property
+    def expected_value(self) -> float:
+        """Cover-weighted mean margin (the SHAP base value)"""
+        return self.build_shap_tables()["expected_value"]
+
+    def leaf_patterns(self, X: np.ndarray) -> np.ndarray:
+        """(n_rows, n_leaves) bitmask of the path splits each row satisfies on the way to each leaf"""
+        t = self.build_shap_tables()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        internal = t["internal"]
+        x = X[:, self._split_feature[internal]]
+        go_left = x < self.threshold[internal]
+        missing = np.isnan(x)
+        if missing.any():
+            go_left = np.where(missing, self.default_left[internal], go_left)
+
+        patterns = np.zeros((X.shape[0], len(t["full_pattern"])), dtype=np.int64)
+        for p in range(len(t["path_node"])):
+            satisfied = (go_left.take(t["path_node"][p], axis=1) == t["path_left"][p]) & t["path_valid"][p]
+            patterns |= satisfied.astype(np.int64) << p
+        return patterns
+
+    def predict_contributions(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Exact TreeSHAP and margin in one pass.
+        Returns (margin (n_rows,), contributions (n_rows, n_features), expected_value)
+        with contributions.sum(axis=1) + expected_value == margin.
+        """
+        t = self.build_shap_tables()
+        n_rows = X.shape[0]
+        margin = np.empty(n_rows, dtype=np.float64)
+        contributions = np.empty((n_rows, self.n_features), dtype=np.float64)
+
+        for start in range(0, n_rows, SHAP_CHUNK_ROWS):
+            chunk = slice(start, start + SHAP_CHUNK_ROWS)
+            patterns = self.leaf_patterns(X[chunk])
+            reached = patterns == t["full_pattern"]
+            margin[chunk] = reached @ t["leaf_values"] + self.base_margin
+            gathered = t["table"].take(t["offsets"] + patterns, axis=0)  # (rows, leaves, features)
+            contributions[chunk] = gathered.sum(axis=1)
+
+        return margin, contributions, t["expected_value"]
+
+    def node_means(self) -> np.ndarray:
+        """Cover-weighted mean leaf value below every node (a leaf's own value)"""
+        if self._node_means is None:
+            means = self.value.astype(np.float64)
+            internal = np.flatnonzero(self.feature >= 0)
+            left, right = self.left[internal], self.right[internal]
+            left_cover = self.cover[left].astype(np.float64)
+            right_cover = self.cover[right].astype(np.float64)
+            total = left_cover + right_cover
+            # Each pass finalizes one more level from the bottom up
+            for _ in range(self.max_depth):
+                means[internal] = (left_cover * means[left] + right_cover * means[right]) / total
+            self._node_means = means
+        return self._node_means
+
+    def predict_contributions_approx(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, float]:
+        """
+        Saabas path attribution: each split on the way to a row's leaf credits
+        its feature with the change in mean leaf value it causes. Far cheaper
+        than TreeSHAP (one traversal, no tables) and matches XGBoost's
+        approx_contribs, but order-dependent rather than exact Shapley values.
+        Returns (margin, contributions, expected_value) like predict_contributions.
+        """
+        means = self.node_means()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(self.roots.astype(np.intp), (n_rows, self.n_trees)).copy()
+        expected_value = float(means[self.roots].sum()) + self.base_margin
+
+        has_missing = np.isnan(X).any()
+        row_offset = (np.arange(n_rows, dtype=np.intp) * self.n_features)[:, None]
+        flat_x = X.reshape(-1)
+        contributions = np.zeros(n_rows * self.n_features, dtype=np.float64)
+        for _ in range(self.max_depth):
+            # Leaves step onto themselves and so add nothing
+            cells = row_offset + self._split_feature[nodes]
+            x = flat_x[cells]
+            go_right = x >= self.threshold[nodes]
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.default_left[nodes], go_right)
+            children = self._children[2 * nodes + go_right]
+            contributions += np.bincount(cells.ravel(), weights=(means[children] - means[nodes]).ravel(), minlength=len(contributions))
+            nodes = children
+
+        contributions = contributions.reshape(n_rows, self.n_features)
+        margin = self.value[nodes].sum(axis=1, dtype=np.float64) + self.base_margin
+        return margin, contributions, expected_value
+
+    def tree_index(self) -> Dict[str, Any]:
+        """
+        Lookup tables for incremental scoring, over internal nodes in node order:
+        the splits on each feature, the tree of each split, and the tree of
+        each leaf in SHAP table order
+        """
+        if self._tree_index is None:
+            node_tree = np.searchsorted(self.roots, np.arange(len(self.feature)), side="right") - 1
+            internal = np.flatnonzero(self.feature >= 0)
+            split_feature = self.feature[internal]
+            self._tree_index = {
+                "internal": internal,
+                "feature_splits": [np.flatnonzero(split_feature == f) for f in range(self.n_features)],
+                "split_tree": node_tree[internal],
+                "leaf_tree": node_tree[self.feature < 0],
+            }
+        return self._tree_index
+
+    def split_leaves(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        For every split (internal node position), the leaves whose path passes
+        through it and the path bit it sets, as CSR arrays (indptr, leaves, bits)
+        """
+        index = self.tree_index()
+        if "split_leaves" not in index:
+            t = self.build_shap_tables()
+            bits, leaves = np.nonzero(t["path_valid"])
+            splits = t["path_node"][bits, leaves]
+            order = np.argsort(splits, kind="stable")
+            indptr = np.searchsorted(splits[order], np.arange(len(t["internal"]) + 1))
+            index["split_leaves"] = (indptr, leaves[order], bits[order].astype(np.int64))
+        return index["split_leaves"]
+
+    def _tree_contributions_approx(self, x: np.ndarray, trees: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Leaf value and Saabas contributions of one row in each of the given trees"""
+        means = self.node_means()
+        nodes = self.roots[trees].astype(np.intp)
+        rows = np.arange(len(trees))
+        contributions = np.zeros((len(trees), self.n_features))
+        for _ in range(self.max_depth):
+            features = self._split_feature[nodes]
+            value = x[features]
+            go_right = value >= self.threshold[nodes]
+            missing = np.isnan(value)
+            if missing.any():
+                go_right = np.where(missing, ~self.default_left[nodes], go_right)
+            children = self._children[2 * nodes + go_right]
+            # A tree can split on the same feature at several depths
+            np.add.at(contributions, (rows, features), means[children] - means[nodes])
+            nodes = children
+        return self.value[nodes].astype(np.float64), contributions
+
+    def row_scorer(self, x: np.ndarray, method: str = "exact") -> "RowScorer":
+        """Incremental scorer for one row whose features change a few at a time"""
+        return RowScorer(self, x, method)
+
+
+class RowScorer:
+    """
+    Margin and contributions of one row, updated incrementally as its features change.
+
+    The direction taken at every split is kept. A change only re-evaluates
+    the splits on the changed features, and only what lies below a split
+    that actually flipped is recomputed: the affected leaves' SHAP table
+    rows (exact) or the affected trees' paths (approximate). A slider step
+    usually flips a handful of splits, so an update costs far less than
+    scoring the row again. Per-tree leaf values and contributions are kept
+    so the totals are re-summed rather than drifting through repeated deltas.
+    """
+
+    def __init__(self, engine: TreeEnsemble, x: np.ndarray, method: str = "exact"):
+        self.engine = engine
+        self.method = method
+        self._index = engine.tree_index()
+        self._internal = self._index["internal"]
+        if method != "approximate":
+            self._tables = engine.build_shap_tables()
+            engine.split_leaves()
+        self._reset(x)
+
+    def _reset(self, x: np.ndarray):
+        """Score the row from scratch"""
+        engine = self.engine
+        self.x = np.ascontiguousarray(x, dtype=np.float32).ravel().copy()
+        self.go_left = self._go_left(self.x, self._internal)
+
+        if self.method == "approximate":
+            self.tree_values, self.tree_contributions = engine._tree_contributions_approx(self.x, np.arange(engine.n_trees))
+            return
+
+        t = self._tables
+        patterns = np.zeros(len(t["full_pattern"]), dtype=np.int64)
+        for p in range(len(t["path_node"])):
+            satisfied = (self.go_left[t["path_node"][p]] == t["path_left"][p]) & t["path_valid"][p]
+            patterns |= satisfied.astype(np.int64) << p
+        self.patterns = patterns
+
+        leaf_tree = self._index["leaf_tree"]
+        reached = np.where(patterns == t["full_pattern"], t["leaf_values"], 0.0)
+        self.tree_values = np.bincount(leaf_tree, weights=reached, minlength=engine.n_trees)
+        gathered = t["table"].take(t["offsets"] + patterns, axis=0).astype(np.float64)
+        leaf_start = np.searchsorted(leaf_tree, np.arange(engine.n_trees))
+        self.tree_contributions = np.add.reduceat(gathered, leaf_start, axis=0)
+
+    def _go_left(self, x: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        engine = self.engine
+        value = x[engine._split_feature[nodes]]
+        go_left = value < engine.threshold[nodes]
+        missing = np.isnan(value)
+        if missing.any():
+            go_left = np.where(missing, engine.default_left[nodes], go_left)
+        return go_left
+
+    @property
+    def margin(self) -> float:
+        return float(self.tree_values.sum()) + self.engine.base_margin
+
+    @property
+    def contributions(self) -> np.ndarray:
+        return self.tree_contributions.sum(axis=0)
+
+    def update(self, x: np.ndarray) -> int:
+        """Move to a new feature vector; returns how many splits flipped"""
+        x = np.ascontiguousarray(x, dtype=np.float32).ravel()
+        changed = np.flatnonzero(~((x == self.x) | (np.isnan(x) & np.isnan(self.x))))
+        if len(changed) == 0:
+            return 0
+        index = self._index
+        positions = np.concatenate([index["feature_splits"][f] for f in changed])
+        go_left = self._go_left(x, self._internal[positions])
+        flipped = positions[go_left != self.go_left[positions]]
+        if len(flipped) == 0:
+            self.x[changed] = x[changed]
+            return 0
+
+        if self.method == "approximate":
+            trees = np.unique(index["split_tree"][flipped])
+            if 2 * len(trees) > self.engine.n_trees:
+                self._reset(x)
+                return len(flipped)
+            self.x[changed] = x[changed]
+            self.go_left[flipped] = ~self.go_left[flipped]
+            self.tree_values[trees], self.tree_contributions[trees] = self.engine._tree_contributions_approx(self.x, trees)
+            return len(flipped)
+
+        # Every leaf below a flipped split has that split's path bit toggled;
+        # a jump that toggles more bits than there are leaves is cheaper to rescore
+        indptr, split_leaves, split_bits = self.engine.split_leaves()
+        starts, ends = indptr[flipped], indptr[flipped + 1]
+        counts = ends - starts
+        if counts.sum() > len(self.patterns):
+            self._reset(x)
+            return len(flipped)
+        self.x[changed] = x[changed]
+        self.go_left[flipped] = ~self.go_left[flipped]
+        entries = np.repeat(starts - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) + np.arange(counts.sum())
+        leaves, bits = split_leaves[entries], split_bits[entries]
+
+        t = self._tables
+        affected = np.unique(leaves)
+        old_patterns = self.patterns[affected]
+        np.bitwise_xor.at(self.patterns, leaves, np.left_shift(1, bits))
+        new_patterns = self.patterns[affected]
+
+        offsets = t["offsets"][affected]
+        delta = t["table"][offsets + new_patterns].astype(np.float64) - t["table"][offsets + old_patterns]
+        full = t["full_pattern"][affected]
+        values = t["leaf_values"][affected]
+        value_delta = np.where(new_patterns == full, values, 0.0) - np.where(old_patterns == full, values, 0.0)
+
+        trees = index["leaf_tree"][affected]
+        np.add.at(self.tree_contributions, trees, delta)
+        np.add.at(self.tree_values, trees, value_delta)
+        return len(flipped)
+
+
+def _leaf_shapley(b: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Shapley values of v(S) = value * prod_f (a_f if f in S else b_f) for
+    every bit pattern of a. b is (n_leaves, d); returns (n_leaves, 2^d, d).
+    """
+    n, d = b.shape
+    patterns = np.arange(1 << d)
+    a = ((patterns[:, None] >> np.arange(d)[None, :]) & 1).astype(np.float64)  # (2^d, d)
+    a = np.broadcast_to(a, (n, 1 << d, d))
+    bb = np.broadcast_to(b[:, None, :], (n, 1 << d, d))
+
+    # Coefficients of prod_f (b_f + a_f t), lowest degree first
+    poly = np.zeros((n, 1 << d, d + 1))
+    poly[..., 0] = 1.0
+    for j in range(d):
+        shifted = np.zeros_like(poly)
+        shifted[..., 1:] = poly[..., :-1] * a[..., j:j + 1]
+        poly = poly * bb[..., j:j + 1] + shifted
+
+    # Shapley weights k!(d-k-1)!/d! for coalitions of size k
+    weights = np.array([math.factorial(k) * math.factorial(d - k - 1) / math.factorial(d) for k in range(d)])
+
+    phi = np.empty((n, 1 << d, d))
+    for i in range(d):
+        ai, bi = a[..., i], bb[..., i]
+        # Divide the product by (b_i + a_i t): plain scaling when a_i = 0,
+        # synthetic division by (t + b_i) when a_i = 1
+        scaled = poly[..., :d] / bi[..., None]
+        divided = np.zeros((n, 1 << d, d))
+        divided[..., d - 1] = poly[..., d]
+        for k in range(d - 1, 0, -1):
+            divided[..., k - 1] = poly[..., k] - bi * divided[..., k]
+        quotient = np.where(ai[..., None] > 0, divided, scaled)
+        phi[..., i] = values[:, None] * (ai - bi) * (quotient @ weights)
+
+    return phi
@@ -0,0 +1,71 @@
+"""
+CliniqAI Warm-up Service - Eager model loading and readiness reporting
+"""
+import time
+from typing import Dict, Any
+
+import numpy as np
+
+from ..config import WARMUP_XGBOOST
+from . import bootstrap, model_service, population
+from .model_bundle import DISEASE_TYPES, get_bundle, get_load_status
+
+# Representative inputs used to exercise each model once at startup
+WARMUP_INPUTS = {
+    "diabetes": {
+        "gender": "Female", "age": 45.0, "hypertension": False, "heart_disease": False,
+        "smoking_history": "never", "bmi": 27.0, "HbA1c_level": 5.8, "blood_glucose_level": 120.0,
+    },
+    "heart_disease": {
+        "age": 55.0, "gender": "Male", "ap_hi": 130.0, "ap_lo": 85.0,
+        "smoke": False, "alco": False, "active": True, "bmi": 27.0,
+    },
+}
+
+_warmup_status = {
+    "started": False,
+    "finished": False,
+    "warmup_seconds": None,
+}
+
+
+def warm_up_models():
+    """Load every model and explainer, then score and explain one input per model"""
+    _warmup_status["started"] = True
+    started = time.perf_counter()
+    
+    for disease_type in DISEASE_TYPES:
+        get_bundle(disease_type)
+    
+    try:
+        # Also builds the native SHAP tables used by predict_and_explain
+        for disease_type in DISEASE_TYPES:
+            model_service.predict_and_explain(disease_type, [WARMUP_INPUTS[disease_type]])
+            bundle = get_bundle(disease_type)
+            if bundle.can_predict:
+                bootstrap.get_replicas(bundle)
+                population.get_index(bundle)
+                if WARMUP_XGBOOST:
+                    # Large matrices go to XGBoost, whose first prediction is slow
+                    X = bundle.encode(WARMUP_INPUTS[disease_type])
+                    model_service.predict_proba_matrix(bundle, np.repeat(X, model_service.NATIVE_ENGINE_MAX_ROWS + 1, axis=0))
+    except Exception as e:
+        print(f"Warning: Model warm-up prediction failed: {e}")
+    
+    _warmup_status["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    _warmup_status["finished"] = True
+
+
+def get_readiness() -> Dict[str, Any]:
+    """Per-model load status; ready once warm-up finished and every model can be scored and explained"""
+    status = get_load_status()
+    
+    ready = _warmup_status["finished"] and all(
+        s["loaded"] and (s.get("native_shap") or s.get("explainer_loaded")) for s in status.values()
+    )
+    
+    return {
+        "ready": ready,
+        "warmup": dict(_warmup_status),
+        "models": status,
+    }
@@ -0,0 +1,291 @@
+"""
+CliniqAI What-If Service - Risk response curves and surfaces over one or two features
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import WHAT_IF_SWEEP_MAX_POINTS, WHAT_IF_SESSION_MAX, WHAT_IF_SESSION_TTL_SECONDS
+from . import bootstrap, inference, metrics, model_service, shap_service
+from .feature_encoder import FEATURE_SOURCES
+from .model_bundle import ModelBundle, get_bundle, add_reload_listener
+from .tree_engine import RowScorer
+
+
+def input_keys(bundle: ModelBundle) -> List[str]:
+    """The API input key each model column is read from"""
+    sources = FEATURE_SOURCES[bundle.disease_type]
+    return [sources.get(col, (col,))[0] for col in bundle.feature_cols]
+
+
+def encode_axis(bundle: ModelBundle, base: Dict[str, Any], name: str, values: List[Any]) -> Tuple[List[int], np.ndarray]:
+    """
+    The model columns fed by one input and their encoded values for each of
+    its candidate values, so grids can be filled in without the per-row encoder.
+    Raises ValueError for an input the model does not use.
+    """
+    keys = input_keys(bundle)
+    columns = [i for i, key in enumerate(keys) if key == name]
+    if not columns:
+        raise ValueError(f"Unknown feature '{name}', expected one of {sorted(set(keys))}")
+    return columns, bundle.encode_batch([{**base, name: value} for value in values])[:, columns]
+
+
+def _axis_values(feature: Dict[str, Any]) -> List[Any]:
+    """Explicit values, or `steps` evenly spaced numbers from min to max"""
+    if feature.get("values"):
+        return list(feature["values"])
+    if feature.get("min") is None or feature.get("max") is None:
+        raise ValueError(f"Feature '{feature['name']}' needs either values or min and max")
+    if feature["max"] < feature["min"]:
+        raise ValueError(f"Feature '{feature['name']}' has max below min")
+    return [round(float(v), 6) for v in np.linspace(feature["min"], feature["max"], feature["steps"])]
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _crossing_point(v_a: Any, v_b: Any, p_a: float, p_b: float, level: float) -> Optional[float]:
+    """Linearly interpolated feature value where the risk passes `level`, for numeric axes"""
+    if not (_is_number(v_a) and _is_number(v_b)) or p_a == p_b:
+        return None
+    return round(v_a + (level - p_a) / (p_b - p_a) * (v_b - v_a), 6)
+
+
+def _find_crossings(
+    risk: np.ndarray,
+    threshold: float,
+    axes: List[Tuple[str, List[Any]]]
+) -> List[Dict[str, Any]]:
+    """
+    Every step along each axis of the grid where the risk moves across the
+    decision threshold or into another risk category
+    """
+    above = risk >= threshold
+    categories = model_service.get_risk_category_indices(risk)
+    crossings = []
+
+    for axis, (name, values) in enumerate(axes):
+        for kind, states in (("threshold", above), ("category", categories)):
+            changed = np.diff(states.astype(np.int64), axis=axis) != 0
+            for index in np.argwhere(changed):
+                a = tuple(index)
+                b = tuple(i + 1 if k == axis else i for k, i in enumerate(index))
+                p_a, p_b = float(risk[a]), float(risk[b])
+                if kind == "threshold":
+                    from_state = "above" if above[a] else "below"
+                    to_state = "above" if above[b] else "below"
+                    level = threshold
+                else:
+                    from_state = model_service.RISK_CATEGORIES[categories[a]]
+                    to_state = model_service.RISK_CATEGORIES[categories[b]]
+                    level = float(model_service.RISK_CATEGORY_BOUNDS_PCT[min(categories[a], categories[b])]) / 100
+                crossing = {
+                    "type": kind,
+                    "feature": name,
+                    "from_value": values[a[axis]],
+                    "to_value": values[b[axis]],
+                    "from_state": from_state,
+                    "to_state": to_state,
+                    "at": _crossing_point(values[a[axis]], values[b[axis]], p_a, p_b, level),
+                }
+                if len(axes) == 2:
+                    other_name, other_values = axes[1 - axis]
+                    crossing["fixed"] = {other_name: other_values[a[1 - axis]]}
+                crossings.append(crossing)
+
+    return crossings
+
+
+def sweep(disease_type: str, base: Dict[str, Any], features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Risk of a base patient over a grid of one or two features, scored as one matrix.
+
+    Swept values are encoded once per axis and written into copies of the
+    encoded base row, so the grid never goes through the per-row encoder.
+    Raises ValueError for an invalid sweep and RuntimeError if the model is not loaded.
+    """
+    bundle = get_bundle(disease_type)
+    if not bundle.can_predict:
+        raise RuntimeError(f"{disease_type} model is not loaded")
+
+    names = [feature["name"] for feature in features]
+    if len(set(names)) != len(names):
+        raise ValueError("Each feature can only be swept once")
+
+    axes = []
+    for feature in features:
+        values = _axis_values(feature)
+        columns, encoded = encode_axis(bundle, base, feature["name"], values)
+        axes.append((feature["name"], values, columns, encoded))
+
+    shape = tuple(len(values) for _, values, _, _ in axes)
+    n_points = math.prod(shape)
+    if n_points > WHAT_IF_SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep has {n_points} points, more than the limit of {WHAT_IF_SWEEP_MAX_POINTS}")
+
+    # One extra row at the end scores the unchanged base patient
+    base_x = bundle.encode(base)
+    X = np.repeat(base_x, n_points + 1, axis=0)
+    grid_index = np.indices(shape).reshape(len(shape), -1)
+    for (_, _, columns, encoded), index in zip(axes, grid_index):
+        X[:n_points, columns] = encoded[index]
+
+    probabilities = model_service.predict_proba_matrix(bundle, X)
+    risk = probabilities[:n_points].reshape(shape)
+    base_probability = float(probabilities[-1])
+    categories = model_service.get_risk_category_indices(risk)
+
+    return {
+        "disease_type": disease_type,
+        "model_version": bundle.version,
+        "threshold": bundle.threshold,
+        "base_risk_probability": base_probability,
+        "base_risk_category": model_service.RISK_CATEGORIES[int(model_service.get_risk_category_indices(base_probability))],
+        "features": [{"name": name, "values": values} for name, values, _, _ in axes],
+        "risk": risk.round(6).tolist(),
+        "risk_categories": np.asarray(model_service.RISK_CATEGORIES, dtype=object)[categories].tolist(),
+        "crossings": _find_crossings(risk, bundle.threshold, [(name, values) for name, values, _, _ in axes]),
+    }
+
+
+class WhatIfSession:
+    """One user's what-if patient, kept scored by the model version that scored it"""
+
+    def __init__(self, bundle: ModelBundle, method: str, x: np.ndarray):
+        self.bundle = bundle
+        self.scorer: RowScorer = bundle.engine.row_scorer(x, method)
+        self.lock = threading.Lock()
+        self.expires_at = time.monotonic() + WHAT_IF_SESSION_TTL_SECONDS
+
+
+class WhatIfSessions:
+    """
+    Bounded LRU of what-if sessions with a TTL, keyed by user, disease and SHAP method.
+
+    Each slider change re-scores the session's patient incrementally, so
+    only the splits on the changed features and the leaves or trees below
+    the ones that flip are re-evaluated.
+    """
+
+    def __init__(self, max_sessions: int = WHAT_IF_SESSION_MAX):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[Hashable, str, str], WhatIfSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "updates": 0, "unchanged": 0, "evictions": 0, "fallbacks": 0}
+
+    def score(self, owner: Hashable, disease_type: str, row: Dict[str, Any], method: str = "exact") -> Dict[str, Any]:
+        """Score a what-if edit of the owner's patient, like inference.score_rows for one row"""
+        bundle = get_bundle(disease_type)
+        engine = bundle.engine
+        if not bundle.can_predict or engine is None or (method == "exact" and not engine.has_shap_tables):
+            with self._lock:
+                self._stats["fallbacks"] += 1
+            return inference.score_rows(disease_type, [row], method)[0]
+
+        x = bundle.encode(row)[0]
+        session = self._session((owner, disease_type, method), bundle, method, x)
+        with session.lock:
+            flipped = session.scorer.update(x)
+            margin = session.scorer.margin
+            contributions = session.scorer.contributions
+        with self._lock:
+            self._stats["updates" if flipped else "unchanged"] += 1
+
+        probability = float(bundle.calibrate(1.0 / (1.0 + np.exp(-margin))))
+        shap_values = shap_service.format_shap_values(bundle.feature_names, contributions)
+        interval = bootstrap.confidence_intervals(bundle, x[None, :], [probability])[0]
+        return inference.build_result(bundle, row, probability, shap_values, interval)
+
+    def _session(self, key: Tuple[Hashable, str, str], bundle: ModelBundle, method: str, x: np.ndarray) -> WhatIfSession:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.bundle is bundle and session.expires_at > now:
+                session.expires_at = now + WHAT_IF_SESSION_TTL_SECONDS
+                self._sessions.move_to_end(key)
+                return session
+
+        # Scored outside the lock; a session for a replaced model starts over
+        session = WhatIfSession(bundle, method, x)
+        with self._lock:
+            self._sessions[key] = session
+            self._sessions.move_to_end(key)
+            self._stats["created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evictions"] += 1
+        return session
+
+    def invalidate(self, disease_type: Optional[str] = None):
+        """Drop every session, or only those of one disease model"""
+        with self._lock:
+            for key in [k for k in self._sessions if disease_type is None or k[1] == disease_type]:
+                del self._sessions[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "max_sessions": self.max_sessions, **self._stats}
+
+
+class EditStream:
+    """
+    Latest what-if state of one WebSocket connection.
+
+    Edits are merged into the patient as they arrive; the scorer only takes
+    the newest state, so edits superseded before scoring starts are never
+    scored. Every state carries the sequence number of the last edit in it.
+    """
+
+    def __init__(self, base: Dict[str, Any]):
+        self.row = dict(base)
+        self.seq = 0
+        self._changed = asyncio.Event()
+        self._changed.set()
+
+    def apply(self, seq: int, changes: Dict[str, Any]):
+        self.row.update(changes)
+        self.seq = seq
+        if self._changed.is_set():
+            _count_stream("coalesced")
+        self._changed.set()
+
+    async def latest(self) -> Tuple[int, Dict[str, Any]]:
+        """Wait for a state that has not been scored yet and take it"""
+        await self._changed.wait()
+        self._changed.clear()
+        _count_stream("scored")
+        return self.seq, dict(self.row)
+
+
+_stream_stats = {"connections": 0, "scored": 0, "coalesced": 0}
+_stream_stats_lock = threading.Lock()
+
+
+def _count_stream(counter: str, n: int = 1):
+    with _stream_stats_lock:
+        _stream_stats[counter] += n
+
+
+def open_stream(base: Dict[str, Any]) -> EditStream:
+    _count_stream("connections")
+    return EditStream(base)
+
+
+def get_stats() -> Dict[str, Any]:
+    with _stream_stats_lock:
+        streams = dict(_stream_stats)
+    return {**sessions.stats(), "streams": streams}
+
+
+# Shared sessions for the what-if routes
+sessions = WhatIfSessions()
+
+add_reload_listener(sessions.invalidate)
+metrics.register_source("what_if_sessions", get_stats)
@@ -0,0 +1,81 @@
+"""
+Shared fixtures: the bundled models, and an API client on a throwaway database
+"""
+import json
+import os
+import shutil
+import tempfile
+
+# Must be set before app.config is imported anywhere
+_DB_DIR = tempfile.mkdtemp(prefix="cliniqai-tests-")
+os.environ["CLINIQAI_DATABASE_URL"] = f"sqlite:///{_DB_DIR}/test.db"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.jobs.datasets import load_dataset
+from app.services.artifacts import write_artifact
+from app.services.model_bundle import BUNDLE_FILES, DISEASE_TYPES, get_bundle, load_bundle, source_files
+
+DIABETES_INPUT = {
+    "gender": "Male", "age": 52.0, "hypertension": True, "heart_disease": False,
+    "smoking_history": "former", "bmi": 33.5, "HbA1c_level": 7.2, "blood_glucose_level": 200.0,
+    "patient_name": "Test Patient",
+}
+HEART_INPUT = {
+    "age": 60.0, "gender": "Male", "ap_hi": 170.0, "ap_lo": 100.0,
+    "smoke": True, "alco": False, "active": False, "bmi": 31.0,
+    "patient_name": "Test Patient",
+}
+
+
+@pytest.fixture(scope="session", params=DISEASE_TYPES)
+def bundle(request):
+    bundle = get_bundle(request.param)
+    if not bundle.can_predict or bundle.engine is None:
+        pytest.skip(f"{request.param} model is not available")
+    return bundle
+
+
+@pytest.fixture(scope="session")
+def dataset_matrix(bundle):
+    """Encoded rows of the model's own dataset"""
+    rows, _ = load_dataset(bundle.disease_type, bundle.model_dir, limit=2000)
+    return bundle.encode_batch(rows)
+
+
+def edit_config(disease_type, model_dir, **changes):
+    """Change settings in a model directory's config file, as a retrain or reconfiguration would"""
+    path = model_dir / BUNDLE_FILES[disease_type]["config"]
+    config = json.loads(path.read_text())
+    config.update(changes)
+    path.write_text(json.dumps(config))
+
+
+@pytest.fixture
+def model_copy(bundle, tmp_path):
+    """Copy of a bundled model directory with an artifact built from its pickles"""
+    directory = tmp_path / bundle.disease_type
+    directory.mkdir()
+    for name in BUNDLE_FILES[bundle.disease_type].values():
+        if (bundle.model_dir / name).exists():
+            shutil.copy(bundle.model_dir / name, directory / name)
+    pickled = load_bundle(bundle.disease_type, directory, use_artifacts=False)
+    write_artifact(
+        directory, bundle.disease_type, pickled.base_version, pickled.config,
+        pickled.model, pickled.scaler, pickled.engine, source_files(bundle.disease_type, directory)
+    )
+    return directory
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client logged in as a doctor; the app's startup and shutdown run once for the session"""
+    from app.main import app
+    with TestClient(app) as client:
+        client.post("/api/v1/auth/register", json={
+            "email": "doctor@example.com", "username": "doctor", "password": "secret", "role": "doctor",
+        })
+        token = client.post("/api/v1/auth/login", json={"username": "doctor", "password": "secret"}).json()["access_token"]
+        client.headers.update({"Authorization": f"Bearer {token}"})
+        yield client
@@ -0,0 +1,46 @@
+"""
+Pickle-free model artifacts: round trips, and falling back to changed pickles
+"""
+import numpy as np
+import pytest
+
+from app.services.model_bundle import load_bundle, source_files
+from app.services.tree_engine import TreeEnsemble
+from conftest import edit_config
+
+
+def test_save_dir_round_trip(bundle, dataset_matrix, tmp_path):
+    bundle.engine.save_dir(tmp_path / "engine")
+    loaded = TreeEnsemble.load_dir(tmp_path / "engine")
+    np.testing.assert_array_equal(loaded.predict_margin(dataset_matrix), bundle.engine.predict_margin(dataset_matrix))
+
+
+def test_artifact_serves_the_pickled_model(bundle, model_copy, dataset_matrix):
+    pickled = load_bundle(bundle.disease_type, model_copy, use_artifacts=False)
+    artifact = load_bundle(bundle.disease_type, model_copy)
+
+    assert artifact.source == "artifact"
+    assert artifact.version == pickled.version
+    np.testing.assert_array_equal(artifact.engine.predict_proba(dataset_matrix), pickled.engine.predict_proba(dataset_matrix))
+
+
+def test_changed_config_is_served_instead_of_the_artifact(bundle, model_copy):
+    built = load_bundle(bundle.disease_type, model_copy)
+    edit_config(bundle.disease_type, model_copy, optimal_threshold=0.77)
+
+    reloaded = load_bundle(bundle.disease_type, model_copy)
+
+    assert reloaded.source == "pickle"
+    assert reloaded.version != built.version
+    assert reloaded.threshold == 0.77
+
+
+def test_artifact_without_deployed_pickles_is_served(bundle, model_copy):
+    built = load_bundle(bundle.disease_type, model_copy)
+    for path in source_files(bundle.disease_type, model_copy):
+        path.unlink()
+
+    reloaded = load_bundle(bundle.disease_type, model_copy)
+
+    assert reloaded.source == "artifact"
+    assert reloaded.version == built.version
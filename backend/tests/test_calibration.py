@@ -0,0 +1,86 @@
+"""
+Probability calibration lookup tables and reliability curves
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.jobs.calibrate_probabilities import out_of_fold_probabilities
+from app.jobs.datasets import load_dataset
+from app.services import conformal, model_service
+from app.services.calibration import ProbabilityCalibration, calibration_path, reliability_curve
+from app.services.model_bundle import load_bundle
+
+# Halves every raw probability
+HALVING = ProbabilityCalibration([0.0, 1.0], [0.0, 0.5], {"method": "isotonic"})
+
+
+def test_probability_calibration_interpolates_and_holds_ends():
+    calibration = ProbabilityCalibration([0.1, 0.5, 0.9], [0.05, 0.4, 0.8], {"method": "isotonic"})
+    np.testing.assert_allclose(calibration.apply([0.0, 0.1, 0.3, 0.9, 1.0]), [0.05, 0.05, 0.225, 0.8, 0.8])
+
+
+def test_probability_calibration_round_trip_keeps_digest(tmp_path):
+    calibration = ProbabilityCalibration([0.0, 0.5, 1.0], [0.01, 0.3, 0.99], {"method": "platt"})
+    calibration.save(tmp_path / "v1.json")
+    loaded = ProbabilityCalibration.load(tmp_path / "v1.json")
+
+    assert loaded.digest == calibration.digest
+    assert loaded.method == "platt"
+    assert ProbabilityCalibration([0.0, 0.5, 1.0], [0.01, 0.31, 0.99], {}).digest != calibration.digest
+
+
+def test_probability_calibration_rejects_decreasing_knots(tmp_path):
+    ProbabilityCalibration([0.0, 0.5, 1.0], [0.5, 0.2, 0.9], {}).save(tmp_path / "v1.json")
+    with pytest.raises(ValueError):
+        ProbabilityCalibration.load(tmp_path / "v1.json")
+
+
+def test_reliability_curve_skips_empty_bins():
+    curve = reliability_curve(np.array([0.05, 0.15, 0.15, 0.95]), np.array([0.0, 1.0, 0.0, 1.0]), 10)
+    assert curve == [
+        {"predicted": 0.05, "observed": 0.0, "count": 1},
+        {"predicted": 0.15, "observed": 0.5, "count": 2},
+        {"predicted": 0.95, "observed": 1.0, "count": 1},
+    ]
+
+
+def test_out_of_fold_probabilities_score_every_row(bundle):
+    rows, y = load_dataset(bundle.disease_type, bundle.model_dir, limit=2000)
+    raw = out_of_fold_probabilities(bundle, bundle.encode_batch(rows), y.astype(np.float64), 2, np.random.default_rng(0))
+    assert raw.shape == (len(rows),)
+    assert np.all((raw > 0.0) & (raw < 1.0))
+
+
+def test_calibrated_threshold_need_not_match_risk_categories(bundle, model_copy):
+    HALVING.save(calibration_path(model_copy, bundle.base_version))
+    calibrated = load_bundle(bundle.disease_type, model_copy)
+    raw_threshold = calibrated.config["optimal_threshold"]
+
+    assert calibrated.version == f"{bundle.base_version}.{HALVING.digest}"
+    assert calibrated.threshold == pytest.approx(raw_threshold / 2)
+    # Categories band the served risk itself, so a risk over the threshold can still be Low
+    probability = raw_threshold / 2 + 0.01
+    assert probability > calibrated.threshold
+    assert model_service.get_risk_category(probability, {}) == "Low"
+    assert model_service.RISK_CATEGORIES[int(model_service.get_risk_category_indices(probability))] == "Low"
+
+
+def test_tables_of_another_calibration_are_not_used(bundle, model_copy, capsys, monkeypatch):
+    monkeypatch.setattr(conformal, "_calibrations", {})
+    uncalibrated = load_bundle(bundle.disease_type, model_copy)
+    scores_path, meta_path = conformal.calibration_paths(uncalibrated)
+    scores_path.parent.mkdir()
+    np.save(scores_path, np.linspace(0.0, 1.0, 100, dtype=np.float32))
+    meta_path.write_text(json.dumps({"conformal_version": f"{uncalibrated.version}.test"}))
+    assert conformal.get_calibration(uncalibrated) is not None
+
+    HALVING.save(calibration_path(model_copy, bundle.base_version))
+    calibrated = load_bundle(bundle.disease_type, model_copy)
+    capsys.readouterr()
+    assert conformal.get_calibration(calibrated) is None
+    assert conformal.get_calibration(calibrated) is None
+    warnings = capsys.readouterr().out
+    assert warnings.count(f"no table for model version {calibrated.version}") == 1
+    assert "calibrate_conformal" in warnings
@@ -0,0 +1,40 @@
+"""
+Split-conformal intervals from calibration scores
+"""
+import numpy as np
+import pytest
+
+from app.services.conformal import Calibration
+
+
+def conformal_table(n):
+    return Calibration(np.linspace(0.01, 1.0, n), {"conformal_version": "v1.test"})
+
+
+def test_conformal_quantile_uses_finite_sample_rank():
+    calibration = conformal_table(99)
+    # k = ceil((n + 1) * coverage) = 90 -> the 90th smallest score
+    assert calibration.quantile(0.9) == pytest.approx(calibration.scores[89])
+    # Too few scores for the coverage asked: the interval spans everything
+    assert conformal_table(9).quantile(0.95) == 1.0
+
+
+def test_conformal_intervals_are_clipped_to_probabilities():
+    calibration = conformal_table(99)
+    q = calibration.quantile(0.8)
+    low, high = calibration.intervals([0.05, 0.5, 0.97], 0.8)
+    np.testing.assert_allclose(low, np.clip([0.05 - q, 0.5 - q, 0.97 - q], 0, 1))
+    np.testing.assert_allclose(high, np.clip([0.05 + q, 0.5 + q, 0.97 + q], 0, 1))
+
+
+def test_conformal_intervals_cover_at_the_requested_rate():
+    rng = np.random.default_rng(0)
+    probabilities = rng.random(40000)
+    outcomes = (rng.random(40000) < probabilities).astype(np.float64)
+    scores = np.abs(outcomes - probabilities)
+    calibration = Calibration(np.sort(scores[:20000]), {"conformal_version": "v1.test"})
+
+    for coverage in (0.8, 0.9):
+        low, high = calibration.intervals(probabilities[20000:], coverage)
+        covered = (outcomes[20000:] >= low) & (outcomes[20000:] <= high)
+        assert covered.mean() >= coverage - 0.01
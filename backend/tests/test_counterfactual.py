@@ -0,0 +1,37 @@
+"""
+Counterfactual search: batches stay on the native engine within the budget
+"""
+from app.services import counterfactual, model_service
+
+from conftest import DIABETES_INPUT, HEART_INPUT
+
+
+def test_search_scores_native_sized_batches(bundle, monkeypatch):
+    base = {"diabetes": DIABETES_INPUT, "heart_disease": HEART_INPUT}[bundle.disease_type]
+    base = {key: value for key, value in base.items() if key != "patient_name"}
+
+    batch_sizes = []
+    predict_proba_matrix = model_service.predict_proba_matrix
+
+    def recording(bundle, X, calibrated=True):
+        batch_sizes.append(len(X))
+        return predict_proba_matrix(bundle, X, calibrated)
+
+    def no_xgboost(X):
+        raise AssertionError("counterfactual batch fell through to XGBoost")
+
+    monkeypatch.setattr(model_service, "predict_proba_matrix", recording)
+    monkeypatch.setattr(bundle.model, "predict_proba", no_xgboost)
+
+    result = counterfactual.search(bundle.disease_type, base, max_results=100, budget_ms=60_000)
+    assert result["candidates_scored"] > model_service.NATIVE_ENGINE_MAX_ROWS
+    assert max(batch_sizes) <= model_service.NATIVE_ENGINE_MAX_ROWS
+
+
+def test_search_stops_at_the_deadline(bundle):
+    base = {"diabetes": DIABETES_INPUT, "heart_disease": HEART_INPUT}[bundle.disease_type]
+    base = {key: value for key, value in base.items() if key != "patient_name"}
+
+    result = counterfactual.search(bundle.disease_type, base, max_results=100, budget_ms=0)
+    assert result["complete"] is False
+    assert result["candidates_scored"] == 0
@@ -0,0 +1,41 @@
+"""
+Hot reload: changed model files are detected, loaded, smoke tested and swapped in
+"""
+import pytest
+
+from app.services import model_registry
+from app.services.model_bundle import MODEL_DIRS, get_bundle, load_bundle, swap_bundle
+from conftest import edit_config
+
+
+@pytest.fixture
+def serving_copy(bundle, model_copy, monkeypatch):
+    """Serve the disease from a copied model directory, restoring the bundled model afterwards"""
+    monkeypatch.setitem(MODEL_DIRS, bundle.disease_type, model_copy)
+    swap_bundle(bundle.disease_type, load_bundle(bundle.disease_type))
+    yield model_copy
+    swap_bundle(bundle.disease_type, bundle)
+
+
+def test_unchanged_files_are_not_reloaded(bundle, serving_copy):
+    serving = get_bundle(bundle.disease_type)
+    result = model_registry.reload_model(bundle.disease_type)
+
+    assert result["status"] == "unchanged"
+    assert get_bundle(bundle.disease_type) is serving
+
+
+def test_changed_config_is_swapped_in(bundle, serving_copy):
+    before = get_bundle(bundle.disease_type)
+    assert before.source == "artifact"
+    fingerprint = model_registry._fingerprint(bundle.disease_type)
+
+    edit_config(bundle.disease_type, serving_copy, optimal_threshold=0.77)
+    assert model_registry._fingerprint(bundle.disease_type) != fingerprint
+    result = model_registry.reload_model(bundle.disease_type)
+
+    serving = get_bundle(bundle.disease_type)
+    assert result["status"] == "swapped"
+    assert result["candidate_version"] == serving.version != before.version
+    assert model_registry.get_registry_status()["models"][bundle.disease_type]["serving_version"] == serving.version
+    assert serving.threshold == 0.77
@@ -0,0 +1,62 @@
+"""
+Keyset cursors and paging through the history and patient listings
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import decode_cursor, encode_cursor, split_page
+from conftest import HEART_INPUT
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2024, 3, 1, 12, 30, 5),
+    datetime(2024, 3, 1, 12, 30, 5, 123456),
+])
+def test_cursor_round_trip(created_at):
+    cursor = encode_cursor(created_at, 4211)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 4211)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2024, 1, 1), 1)[:-3] + "!!!"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def test_split_page():
+    rows = [SimpleNamespace(created_at=datetime(2024, 1, 1, 0, 0, 10 - i), id=10 - i) for i in range(4)]
+
+    page, next_cursor = split_page(rows, 3)
+    assert page == rows[:3]
+    assert decode_cursor(next_cursor) == (rows[2].created_at, rows[2].id)
+
+    assert split_page(rows, 4) == (rows, None)
+
+
+def test_history_pages_cover_every_prediction_once(client):
+    for i in range(7):
+        assert client.post("/api/v1/predictions/heart_disease", json=dict(HEART_INPUT, age=40.0 + i)).status_code == 200
+    everything = client.get("/api/v1/predictions/history", params={"limit": 200}).json()
+    assert everything["next_cursor"] is None
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/v1/predictions/history", params=params).json()
+        assert len(page["items"]) <= 3
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == [item["id"] for item in everything["items"]]
+    assert len(set(ids)) == len(ids) >= 7
+
+
+def test_history_rejects_bad_cursor(client):
+    assert client.get("/api/v1/predictions/history", params={"cursor": "garbage"}).status_code == 400
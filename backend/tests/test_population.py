@@ -0,0 +1,44 @@
+"""
+Population and peer-group risk percentiles
+"""
+import numpy as np
+import pytest
+
+from app.services.population import ALL_GROUP, PopulationIndex, age_band, peer_group
+
+
+@pytest.mark.parametrize("age, band", [(18, "<30"), (30, "30-39"), (59.9, "50-59"), (70, "70+"), (88, "70+")])
+def test_age_band(age, band):
+    assert age_band(age) == band
+
+
+def test_peer_group_needs_gender_and_age():
+    assert peer_group({"gender": "Female", "age": 52}) == "Female 50-59"
+    assert peer_group({"age": 52}) is None
+
+
+def test_population_percentile_counts_ties_as_half():
+    scores = np.array([0.1, 0.2, 0.2, 0.4], dtype=np.float32)
+    assert PopulationIndex.percentile(scores, np.float32(0.05)) == 0.0
+    assert PopulationIndex.percentile(scores, np.float32(0.2)) == 50.0
+    assert PopulationIndex.percentile(scores, np.float32(0.3)) == 75.0
+    assert PopulationIndex.percentile(scores, np.float32(0.9)) == 100.0
+
+
+def test_population_index_round_trip_and_lookup(tmp_path):
+    rng = np.random.default_rng(0)
+    index = PopulationIndex(
+        {ALL_GROUP: rng.random(1000), "Female 50-59": rng.random(300) * 0.5},
+        {"model_version": "v1"}
+    )
+    index.save(tmp_path / "v1")
+    loaded = PopulationIndex.load(tmp_path / "v1")
+
+    peer = loaded.lookup(0.25, {"gender": "Female", "age": 55})
+    assert peer["peer_group"] == "Female 50-59"
+    assert peer["population_percentile"] == pytest.approx(25.0, abs=3.0)
+    assert peer["peer_percentile"] == pytest.approx(50.0, abs=6.0)
+
+    # A group too small to be indexed falls back to the overall percentile only
+    assert loaded.lookup(0.25, {"gender": "Male", "age": 55})["peer_percentile"] is None
+    assert loaded.meta["model_version"] == "v1"
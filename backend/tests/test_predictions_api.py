@@ -0,0 +1,117 @@
+"""
+Prediction routes
+"""
+import pytest
+
+from app.config import MAX_BATCH_PREDICTION_ROWS
+from app.services import explanations
+from conftest import DIABETES_INPUT, HEART_INPUT
+
+BATCH_CASES = [
+    ("diabetes", DIABETES_INPUT, "HbA1c_level", [4.5, 6.0, 7.5, 9.0]),
+    ("heart_disease", HEART_INPUT, "ap_hi", [110.0, 130.0, 150.0, 190.0]),
+]
+
+
+def history_size(client):
+    return client.get("/api/v1/predictions/history/summary").json()["total"]
+
+
+@pytest.mark.parametrize("disease_type, base, field, values", BATCH_CASES)
+def test_batch_matches_single_predictions(client, disease_type, base, field, values):
+    patients = [dict(base, **{field: value}) for value in values]
+    response = client.post(f"/api/v1/predictions/{disease_type}/batch", json={"patients": patients})
+    assert response.status_code == 200
+    batch = response.json()
+
+    assert len(batch) == len(patients)
+    assert len({prediction["id"] for prediction in batch}) == len(patients)
+    for patient, prediction in zip(patients, batch):
+        single = client.post(f"/api/v1/predictions/{disease_type}", json=patient).json()
+        assert prediction["disease_type"] == disease_type
+        assert prediction["risk_probability"] == pytest.approx(single["risk_probability"], abs=1e-9)
+        assert prediction["risk_category"] == single["risk_category"]
+        assert prediction["shap_values"] == single["shap_values"]
+
+
+@pytest.mark.parametrize("disease_type", ["diabetes", "heart_disease"])
+def test_empty_batch_is_rejected(client, disease_type):
+    assert client.post(f"/api/v1/predictions/{disease_type}/batch", json={"patients": []}).status_code == 422
+
+
+def test_oversized_batch_is_rejected(client):
+    patients = [DIABETES_INPUT] * (MAX_BATCH_PREDICTION_ROWS + 1)
+    assert client.post("/api/v1/predictions/diabetes/batch", json={"patients": patients}).status_code == 422
+
+
+def test_batch_with_one_invalid_row_saves_nothing(client):
+    before = history_size(client)
+    patients = [DIABETES_INPUT, dict(DIABETES_INPUT, HbA1c_level=42.0), DIABETES_INPUT]
+    response = client.post("/api/v1/predictions/diabetes/batch", json={"patients": patients})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "patients", 1, "HbA1c_level"]
+    assert history_size(client) == before
+
+
+def test_explain_batch(client):
+    response = client.post("/api/v1/predictions/explain", json={
+        "disease_type": "diabetes", "patients": [DIABETES_INPUT, dict(DIABETES_INPUT, age=30.0)], "top_k": 2,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["contributions"]) == 2
+    assert len(body["contributions"][0]) == len(body["feature_names"])
+    assert all(len(features) == 2 for features in body["top_features"])
+
+
+@pytest.mark.parametrize("patients", [
+    [HEART_INPUT],  # rows of the other disease
+    [dict(DIABETES_INPUT, age="old")],
+    [dict(DIABETES_INPUT, smoking_history="sometimes")],
+    [{"bmi": 30.0}],
+])
+def test_explain_batch_rejects_invalid_rows(client, patients):
+    response = client.post("/api/v1/predictions/explain", json={"disease_type": "diabetes", "patients": patients})
+    assert response.status_code == 422
+    assert "patients[0]" in response.json()["detail"][0]["msg"]
+
+
+def test_deferred_explanation_is_streamed(client):
+    response = client.post("/api/v1/predictions/heart_disease?explain=deferred", json=dict(HEART_INPUT, bmi=27.4))
+    assert response.status_code == 200
+    prediction_id = response.json()["id"]
+
+    with client.stream("GET", f"/api/v1/predictions/{prediction_id}/explanation/stream") as stream:
+        lines = [line for line in stream.iter_lines() if line]
+    assert lines[0] == "event: explanation"
+
+    explanation = client.get(f"/api/v1/predictions/{prediction_id}/explanation").json()
+    assert explanation["status"] == "ready"
+    assert explanation["shap_values"]
+
+
+def test_full_deferred_explanation_queue_returns_503(client, monkeypatch):
+    monkeypatch.setattr(explanations, "queue_depth", lambda: 10 ** 9)
+    response = client.post("/api/v1/predictions/diabetes?explain=deferred", json=dict(DIABETES_INPUT, bmi=42.7))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_deferred_explanation_fails_once_its_model_version_is_gone(client, monkeypatch):
+    before = client.get("/metrics").json()["deferred_explanations"]
+    # The worker can no longer find the model version that scored the prediction
+    monkeypatch.setattr(explanations, "get_bundle_version", lambda disease_type, version: None)
+    response = client.post("/api/v1/predictions/heart_disease?explain=deferred", json=dict(HEART_INPUT, bmi=26.1))
+    prediction_id = response.json()["id"]
+
+    with client.stream("GET", f"/api/v1/predictions/{prediction_id}/explanation/stream") as stream:
+        list(stream.iter_lines())
+
+    explanation = client.get(f"/api/v1/predictions/{prediction_id}/explanation").json()
+    assert explanation["status"] == "failed"
+    assert not explanation["shap_values"]
+    after = client.get("/metrics").json()["deferred_explanations"]
+    assert after["version_unavailable"] == before["version_unavailable"] + 1
+    assert after["failed"] == before["failed"] + 1
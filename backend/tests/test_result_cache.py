@@ -0,0 +1,131 @@
+"""
+Result cache keys, TTL, LRU eviction, invalidation and shared computation
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import result_cache as result_cache_module
+from app.services.result_cache import ResultCache, make_key
+
+DIABETES = SimpleNamespace(disease_type="diabetes", version="v1")
+HEART = SimpleNamespace(disease_type="heart_disease", version="v1")
+
+
+def test_key_ignores_dtype_layout_and_signed_zero():
+    x = np.array([0.0, 1.5, -2.25])
+    assert make_key(DIABETES, x) == make_key(DIABETES, x.astype(np.float32))
+    assert make_key(DIABETES, x) == make_key(DIABETES, np.array([[-0.0, 1.5, -2.25]]))
+    assert make_key(DIABETES, x) == make_key(DIABETES, np.asfortranarray(np.stack([x, x]))[0])
+
+
+def test_key_separates_model_version_method_and_values():
+    x = np.array([0.0, 1.5, -2.25])
+    key = make_key(DIABETES, x)
+    assert key != make_key(HEART, x)
+    assert key != make_key(SimpleNamespace(disease_type="diabetes", version="v2"), x)
+    assert key != make_key(DIABETES, x, "approximate")
+    assert key != make_key(DIABETES, x + 1e-6)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    key = make_key(DIABETES, np.zeros(3))
+    cache.put(key, {"risk": 0.5})
+
+    now[0] += 59
+    assert cache.get(key) == {"risk": 0.5}
+    now[0] += 1
+    assert cache.get(key) is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0 and stats["bytes"] == 0
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    value = {"risk": 0.5, "shap_values": [0.1] * 10}
+    size = result_cache_module._size_of(value)
+    cache = ResultCache(max_bytes=3 * size, ttl_seconds=60)
+    keys = [make_key(DIABETES, np.full(3, i, dtype=np.float64)) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, dict(value))
+
+    cache.get(keys[0])  # now the most recently used
+    cache.put(keys[3], dict(value))
+
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(key) is not None for key in (keys[0], keys[2], keys[3]))
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_invalidate_one_disease_or_all():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    diabetes_key, heart_key = make_key(DIABETES, np.zeros(3)), make_key(HEART, np.zeros(3))
+    cache.put(diabetes_key, {"risk": 0.1})
+    cache.put(heart_key, {"risk": 0.2})
+
+    cache.invalidate("diabetes")
+    assert cache.get(diabetes_key) is None
+    assert cache.get(heart_key) == {"risk": 0.2}
+
+    cache.invalidate()
+    assert cache.get(heart_key) is None
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60, enabled=False)
+    key = make_key(DIABETES, np.zeros(3))
+    cache.put(key, {"risk": 0.1})
+    assert cache.get(key) is None
+    assert cache.get_or_compute(key, lambda: {"risk": 0.3}) == {"risk": 0.3}
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    key = make_key(DIABETES, np.zeros(3))
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"risk": 0.4}
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute(key, compute)))
+    owner.start()
+    started.wait()
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_compute(key, compute))) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["shared_in_flight"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [owner, *waiters]:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"risk": 0.4}] * 5
+    assert cache.stats()["shared_in_flight"] == 4
+
+
+def test_failed_computation_is_not_cached():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    key = make_key(DIABETES, np.zeros(3))
+
+    def fail():
+        raise ValueError("model error")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute(key, fail)
+    assert cache.get_or_compute(key, lambda: {"risk": 0.6}) == {"risk": 0.6}
+    assert cache.stats()["in_flight"] == 0
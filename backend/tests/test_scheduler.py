@@ -0,0 +1,91 @@
+"""
+Micro-batching of single-patient requests and load shedding when queues are full
+"""
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import scheduler
+from app.services.scheduler import MicroBatcher, SchedulerBusy
+from conftest import DIABETES_INPUT
+
+BUNDLE = SimpleNamespace(disease_type="diabetes", version="v1")
+
+
+def test_concurrent_rows_are_scored_in_one_batch():
+    batches = []
+
+    def compute(bundle, rows, X):
+        batches.append(len(rows))
+        return [float(x.sum()) for x in X]
+
+    batcher = MicroBatcher("diabetes", compute, window_ms=200, max_rows=8)
+    futures = [batcher.submit(BUNDLE, {"i": i}, np.full(3, i, dtype=np.float64)) for i in range(8)]
+
+    assert [future.result(timeout=5) for future in futures] == [3.0 * i for i in range(8)]
+    assert batches == [8]
+    assert batcher.stats()["max_batch_size"] == 8
+
+
+def test_rows_of_different_bundles_are_scored_separately():
+    seen = []
+
+    def compute(bundle, rows, X):
+        seen.append((bundle.version, len(rows)))
+        return [bundle.version] * len(rows)
+
+    old, new = SimpleNamespace(disease_type="diabetes", version="old"), SimpleNamespace(disease_type="diabetes", version="new")
+    batcher = MicroBatcher("diabetes", compute, window_ms=200, max_rows=4)
+    futures = [batcher.submit(bundle, {}, np.zeros(3)) for bundle in (old, new, old, new)]
+
+    assert [future.result(timeout=5) for future in futures] == ["old", "new", "old", "new"]
+    assert sorted(seen) == [("new", 2), ("old", 2)]
+
+
+def test_compute_errors_reach_every_caller():
+    def compute(bundle, rows, X):
+        raise RuntimeError("model is not loaded")
+
+    batcher = MicroBatcher("diabetes", compute, window_ms=50, max_rows=4)
+    futures = [batcher.submit(BUNDLE, {}, np.zeros(3)) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="not loaded"):
+            future.result(timeout=5)
+
+
+def test_full_queue_rejects_with_scheduler_busy():
+    release = threading.Event()
+    taken = threading.Event()
+
+    def compute(bundle, rows, X):
+        taken.set()
+        release.wait(5)
+        return [None] * len(rows)
+
+    batcher = MicroBatcher("diabetes", compute, window_ms=0, max_rows=1, max_queue=2)
+    first = batcher.submit(BUNDLE, {}, np.zeros(3))
+    assert taken.wait(5)
+    queued = [batcher.submit(BUNDLE, {}, np.zeros(3)) for _ in range(2)]
+
+    with pytest.raises(SchedulerBusy):
+        batcher.submit(BUNDLE, {}, np.zeros(3))
+    assert batcher.stats()["rejected"] == 1
+
+    release.set()
+    for future in [first, *queued]:
+        future.result(timeout=5)
+
+
+def test_busy_batcher_returns_503(client, monkeypatch):
+    def busy(self, bundle, row, x):
+        raise SchedulerBusy(f"{self.disease_type} inference queue is full")
+
+    monkeypatch.setattr(scheduler.MicroBatcher, "submit", busy)
+    # An input no earlier test has scored, so the result cache cannot answer it
+    response = client.post("/api/v1/predictions/diabetes", json=dict(DIABETES_INPUT, bmi=41.3, age=37.0))
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert "queue is full" in response.json()["detail"]
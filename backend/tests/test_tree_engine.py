@@ -0,0 +1,48 @@
+"""
+Native tree engine parity with XGBoost on the bundled models
+"""
+import numpy as np
+
+
+def xgboost_predict(bundle, X, **kwargs):
+    import xgboost
+    dmatrix = xgboost.DMatrix(X, feature_names=bundle.feature_cols)
+    return bundle.model.get_booster().predict(dmatrix, **kwargs)
+
+
+def with_missing(X, seed=0):
+    """Copy of X with a tenth of its cells set to NaN, to exercise default directions"""
+    X = X.astype(np.float32)
+    mask = np.random.default_rng(seed).random(X.shape) < 0.1
+    X[mask] = np.nan
+    return X
+
+
+def test_predict_proba_matches_xgboost(bundle, dataset_matrix):
+    expected = bundle.model.predict_proba(dataset_matrix)[:, 1]
+    np.testing.assert_allclose(bundle.engine.predict_proba(dataset_matrix), expected, atol=1e-6)
+
+
+def test_predict_margin_matches_xgboost_with_missing_values(bundle, dataset_matrix):
+    X = with_missing(dataset_matrix)
+    expected = xgboost_predict(bundle, X, output_margin=True)
+    np.testing.assert_allclose(bundle.engine.predict_margin(X), expected, atol=1e-4)
+
+
+def test_predict_contributions_matches_pred_contribs(bundle, dataset_matrix):
+    X = dataset_matrix[:500]
+    margin, contributions, expected_value = bundle.engine.predict_contributions(X)
+    expected = xgboost_predict(bundle, X, pred_contribs=True)
+
+    np.testing.assert_allclose(contributions, expected[:, :-1], atol=1e-4)
+    np.testing.assert_allclose(expected_value, expected[0, -1], atol=1e-4)
+    np.testing.assert_allclose(contributions.sum(axis=1) + expected_value, margin, atol=1e-4)
+
+
+def test_predict_contributions_approx_matches_approx_contribs(bundle, dataset_matrix):
+    X = with_missing(dataset_matrix[:500], seed=1)
+    margin, contributions, expected_value = bundle.engine.predict_contributions_approx(X)
+    expected = xgboost_predict(bundle, X, pred_contribs=True, approx_contribs=True)
+
+    np.testing.assert_allclose(contributions, expected[:, :-1], atol=1e-4)
+    np.testing.assert_allclose(contributions.sum(axis=1) + expected_value, margin, atol=1e-4)
@@ -0,0 +1,72 @@
+"""
+What-if scoring: incremental row updates and the WebSocket session
+"""
+import numpy as np
+import pytest
+
+from conftest import DIABETES_INPUT, HEART_INPUT
+
+
+@pytest.mark.parametrize("method", ["exact", "approximate"])
+def test_row_scorer_updates_match_full_scoring(bundle, dataset_matrix, method):
+    engine = bundle.engine
+    full = engine.predict_contributions if method == "exact" else engine.predict_contributions_approx
+    rng = np.random.default_rng(2)
+    scorer = engine.row_scorer(dataset_matrix[0], method)
+
+    # Move one, then several features at a time towards other rows of the dataset
+    x = dataset_matrix[0].astype(np.float32).copy()
+    for step in range(40):
+        target = dataset_matrix[rng.integers(len(dataset_matrix))]
+        changed = rng.choice(len(x), size=1 if step % 2 else 3, replace=False)
+        x[changed] = target[changed]
+        scorer.update(x)
+
+        margin, contributions, _ = full(x[None, :])
+        assert scorer.margin == pytest.approx(margin[0], abs=1e-4)
+        np.testing.assert_allclose(scorer.contributions, contributions[0], atol=1e-4)
+
+
+def test_what_if_socket_validates_edits(client):
+    token = client.headers["Authorization"].split()[1]
+    with client.websocket_connect("/api/v1/predictions/what-if/ws") as ws:
+        ws.send_json({"token": token, "disease_type": "heart_disease", "input_data": HEART_INPUT})
+        opening = ws.receive_json()
+        assert opening["type"] == "result" and opening["seq"] == 0
+
+        ws.send_json({"seq": 1, "changes": {"cholesterol": 3}})
+        assert ws.receive_json() == {"type": "error", "seq": 1, "detail": "Unknown heart_disease fields: cholesterol"}
+
+        ws.send_json({"seq": 2, "changes": {"ap_hi": "high"}})
+        error = ws.receive_json()
+        assert error["type"] == "error" and error["seq"] == 2 and error["detail"][0]["loc"] == ["ap_hi"]
+
+        ws.send_json({"seq": 3, "changes": {"ap_hi": "120"}})
+        result = ws.receive_json()
+        assert result["type"] == "result" and result["seq"] == 3
+        assert result["risk_probability"] < opening["risk_probability"]
+
+
+def test_what_if_socket_rejects_invalid_opening_input(client):
+    token = client.headers["Authorization"].split()[1]
+    with client.websocket_connect("/api/v1/predictions/what-if/ws") as ws:
+        ws.send_json({"token": token, "disease_type": "heart_disease", "input_data": DIABETES_INPUT})
+        assert ws.receive_json()["type"] == "error"
+
+
+def test_what_if_scores_validated_input(client):
+    response = client.post("/api/v1/predictions/what-if", json={"disease_type": "heart_disease", "input_data": HEART_INPUT})
+    assert response.status_code == 200
+    assert 0.0 <= response.json()["risk_probability"] <= 1.0
+
+
+@pytest.mark.parametrize("input_data", [
+    dict(HEART_INPUT, bmi="x"),
+    dict(HEART_INPUT, ap_hi=400.0),
+    {key: value for key, value in HEART_INPUT.items() if key != "smoke"},
+    DIABETES_INPUT,
+])
+def test_what_if_rejects_invalid_input(client, input_data):
+    response = client.post("/api/v1/predictions/what-if", json={"disease_type": "heart_disease", "input_data": input_data})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["msg"].startswith("Value error, input_data.")
@@ -40,13 +40,24 @@ export const predictionsAPI = {
   predictDiabetes: (data) => api.post('/api/v1/predictions/diabetes', data),
   predictHeartDisease: (data) => api.post('/api/v1/predictions/heart_disease', data),
   whatIf: (data) => api.post('/api/v1/predictions/what-if', data),
+  whatIfSweep: (data) => api.post('/api/v1/predictions/what-if/sweep', data),
+  getCounterfactuals: (predictionId, params) => api.get(`/api/v1/predictions/${predictionId}/counterfactuals`, { params }),
   getModelInfo: (diseaseType) => api.get(`/api/v1/predictions/info/${diseaseType}`),
-  getHistory: () => api.get('/api/v1/predictions/history')
+  getPartialDependence: (diseaseType, params) => api.get(`/api/v1/predictions/info/${diseaseType}/pdp`, { params }),
+  getCalibrationCurve: (diseaseType) => api.get(`/api/v1/predictions/info/${diseaseType}/calibration`),
+  // One page, newest first: { items, next_cursor }; pass next_cursor back as params.cursor
+  getHistory: (params) => api.get('/api/v1/predictions/history', { params }),
+  getHistorySummary: () => api.get('/api/v1/predictions/history/summary')
 }
 
+// What-if WebSocket: one authenticated connection for a stream of slider edits
+export const openWhatIfSocket = () =>
+  new WebSocket(`${api.defaults.baseURL.replace(/^http/, 'ws')}/api/v1/predictions/what-if/ws`)
+
 // Patients API
 export const patientsAPI = {
-  getAll: () => api.get('/api/v1/patients/'),
+  // One page, newest first: { items, next_cursor }
+  getAll: (params) => api.get('/api/v1/patients/', { params }),
   create: (data) => api.post('/api/v1/patients/', data),
   getOne: (id) => api.get(`/api/v1/patients/${id}`),
   compare: (data) => api.post('/api/v1/patients/compare', data),
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { motion } from 'framer-motion'
 import { Users, Activity, Heart, ArrowRight, AlertCircle, Filter } from 'lucide-react'
 import { 
@@ -14,20 +14,40 @@ export default function ComparePatients() {
   const [comparison, setComparison] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const currentDisease = useRef(selectedDisease)
 
   useEffect(() => {
+    currentDisease.current = selectedDisease
+    setPatients([])
+    setNextCursor(null)
     fetchPatients()
-  }, [])
+  }, [selectedDisease])
 
-  const fetchPatients = async () => {
+  // Records of the selected disease, newest first, one page at a time;
+  // "Load more" follows next_cursor to the older ones
+  const fetchPatients = async (cursor = null) => {
+    const disease = selectedDisease
     try {
-      const response = await api.get('/api/v1/patients/')
-      setPatients(response.data)
+      const params = { disease_type: disease, limit: 200 }
+      if (cursor) params.cursor = cursor
+      const response = await api.get('/api/v1/patients/', { params })
+      // Drop pages that arrive after the disease was switched
+      if (disease !== currentDisease.current) return
+      setPatients(previous => cursor ? [...previous, ...response.data.items] : response.data.items)
+      setNextCursor(response.data.next_cursor)
     } catch (error) {
       console.error('Error fetching patients:', error)
     }
   }
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true)
+    await fetchPatients(nextCursor)
+    setLoadingMore(false)
+  }
+
   // Filter patients by selected disease type
   const filteredPatients = patients.filter(p => p.disease_type === selectedDisease)
 
@@ -195,6 +215,18 @@ export default function ComparePatients() {
               </div>
             </div>
 
+            {nextCursor && (
+              <div className="mt-4 flex justify-center">
+                <button
+                  onClick={handleLoadMore}
+                  disabled={loadingMore}
+                  className="text-sm text-cyan-400 hover:text-cyan-300 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load older patients'}
+                </button>
+              </div>
+            )}
+
             {/* Error Message */}
             {error && (
               <div className="mt-4 bg-red-500/20 border border-red-500/50 rounded-lg p-3 text-red-300 text-sm flex items-center gap-2">
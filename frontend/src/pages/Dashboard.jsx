@@ -15,11 +15,10 @@ export default function Dashboard() {
 
   const fetchStats = async () => {
     try {
-      const response = await predictionsAPI.getHistory()
-      const predictions = response.data
-      const diabetesCount = predictions.filter(p => p.disease_type === 'diabetes').length
-      const heartCount = predictions.filter(p => p.disease_type === 'heart_disease').length
-      setStats({ totalPredictions: predictions.length, diabetesPredictions: diabetesCount, heartPredictions: heartCount, recentPatients: predictions.slice(0, 5) })
+      // Counts come from the server; only the five rows shown are downloaded
+      const [summary, recent] = await Promise.all([predictionsAPI.getHistorySummary(), predictionsAPI.getHistory({ limit: 5 })])
+      const counts = summary.data.by_disease_type
+      setStats({ totalPredictions: summary.data.total, diabetesPredictions: counts.diabetes || 0, heartPredictions: counts.heart_disease || 0, recentPatients: recent.data.items })
     } catch (error) { console.error('Error fetching stats:', error) } 
     finally { setLoading(false) }
   }
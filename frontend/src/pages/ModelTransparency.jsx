@@ -2,12 +2,15 @@ import { useState, useEffect } from 'react'
 import { motion } from 'framer-motion'
 import { Shield, Activity, Heart, Target, Database, CheckCircle, XCircle } from 'lucide-react'
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Area, AreaChart } from 'recharts'
-import api from '../api'
+import api, { predictionsAPI } from '../api'
 
 export default function ModelTransparency() {
   const [diabetesInfo, setDiabetesInfo] = useState(null)
   const [heartInfo, setHeartInfo] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [pdp, setPdp] = useState({})
+  const [pdpFeature, setPdpFeature] = useState({})
+  const [calibration, setCalibration] = useState({})
 
   useEffect(() => {
     fetchModelInfo()
@@ -26,8 +29,36 @@ export default function ModelTransparency() {
     } finally {
       setLoading(false)
     }
+
+    // Curves are precomputed offline; a model without them simply shows none
+    const loadCurves = async (fetch) => {
+      const results = await Promise.allSettled(['diabetes', 'heart_disease'].map(fetch))
+      const loaded = {}
+      results.forEach((result, i) => {
+        if (result.status === 'fulfilled') loaded[['diabetes', 'heart_disease'][i]] = result.value.data
+      })
+      return loaded
+    }
+    const [pdpCurves, calibrationCurves] = await Promise.all([
+      loadCurves((id) => predictionsAPI.getPartialDependence(id)),
+      loadCurves((id) => predictionsAPI.getCalibrationCurve(id))
+    ])
+    setPdp(pdpCurves)
+    setCalibration(calibrationCurves)
   }
 
+  const toPercentPoints = (curve) =>
+    curve.map((bin) => ({ predicted: bin.predicted * 100, observed: bin.observed * 100, count: bin.count }))
+
+  // Chart rows for one feature: the mean curve plus a few individual patients
+  const ICE_LINES = 10
+  const getPdpData = (feature) =>
+    feature.grid.map((value, i) => {
+      const point = { value: String(value), pd: feature.partial_dependence[i] * 100 }
+      feature.ice.slice(0, ICE_LINES).forEach((curve, j) => { point[`ice${j}`] = curve[i] * 100 })
+      return point
+    })
+
   // Generate ROC curve data points
   const generateROCData = (auc) => {
     const points = []
@@ -226,6 +257,113 @@ export default function ModelTransparency() {
                 </div>
               )}
 
+              {/* Partial Dependence */}
+              {pdp[model.id] && (() => {
+                const features = pdp[model.id].features
+                const feature = features.find((f) => f.name === pdpFeature[model.id]) || features[0]
+                return (
+                  <div className="mt-8">
+                    <div className="flex flex-wrap items-center justify-between gap-4 mb-4">
+                      <h3 className="text-lg font-semibold text-white">Partial Dependence</h3>
+                      <select
+                        value={feature.name}
+                        onChange={(e) => setPdpFeature({ ...pdpFeature, [model.id]: e.target.value })}
+                        className="bg-slate-800/50 border border-slate-700 rounded-lg px-3 py-1 text-sm text-slate-300"
+                      >
+                        {features.map((f) => (
+                          <option key={f.name} value={f.name}>{f.display_name}</option>
+                        ))}
+                      </select>
+                    </div>
+                    <p className="text-slate-400 text-sm mb-4">
+                      Average predicted risk over {pdp[model.id].sample_size.toLocaleString()} dataset patients as {feature.display_name} changes,
+                      with faint lines for individual patients
+                    </p>
+                    <div className="h-64">
+                      <ResponsiveContainer width="100%" height="100%">
+                        <LineChart data={getPdpData(feature)}>
+                          <CartesianGrid strokeDasharray="3 3" stroke="rgba(255,255,255,0.1)" />
+                          <XAxis dataKey="value" stroke="#94a3b8" />
+                          <YAxis stroke="#94a3b8" domain={[0, 100]} unit="%" />
+                          <Tooltip
+                            contentStyle={{
+                              backgroundColor: '#1e293b',
+                              border: '1px solid rgba(255,255,255,0.1)',
+                              borderRadius: '8px'
+                            }}
+                            formatter={(value, name) => [`${value.toFixed(1)}%`, name === 'pd' ? 'Average risk' : 'Patient']}
+                          />
+                          {feature.ice.slice(0, ICE_LINES).map((_, j) => (
+                            <Line
+                              key={j}
+                              type="monotone"
+                              dataKey={`ice${j}`}
+                              stroke="rgba(148,163,184,0.25)"
+                              strokeWidth={1}
+                              dot={false}
+                              isAnimationActive={false}
+                            />
+                          ))}
+                          <Line type="monotone" dataKey="pd" stroke="#0ea5e9" strokeWidth={3} dot={false} />
+                        </LineChart>
+                      </ResponsiveContainer>
+                    </div>
+                  </div>
+                )
+              })()}
+
+              {/* Calibration */}
+              {calibration[model.id] && (
+                <div className="mt-8">
+                  <h3 className="text-lg font-semibold text-white mb-4">Calibration</h3>
+                  <p className="text-slate-400 text-sm mb-4">
+                    Observed outcome rate against predicted risk on {calibration[model.id].evaluation_rows.toLocaleString()} held-out
+                    dataset patients, before and after {calibration[model.id].method} calibration
+                    (Brier score {calibration[model.id].brier_raw.toFixed(4)} → {calibration[model.id].brier_calibrated.toFixed(4)})
+                  </p>
+                  <div className="h-64">
+                    <ResponsiveContainer width="100%" height="100%">
+                      <LineChart>
+                        <CartesianGrid strokeDasharray="3 3" stroke="rgba(255,255,255,0.1)" />
+                        <XAxis dataKey="predicted" type="number" domain={[0, 100]} stroke="#94a3b8" unit="%" />
+                        <YAxis dataKey="observed" type="number" domain={[0, 100]} stroke="#94a3b8" unit="%" />
+                        <Tooltip
+                          contentStyle={{
+                            backgroundColor: '#1e293b',
+                            border: '1px solid rgba(255,255,255,0.1)',
+                            borderRadius: '8px'
+                          }}
+                          formatter={(value) => `${value.toFixed(1)}%`}
+                        />
+                        <Line
+                          data={[{ predicted: 0, observed: 0 }, { predicted: 100, observed: 100 }]}
+                          dataKey="observed"
+                          name="Perfect calibration"
+                          stroke="#64748b"
+                          strokeDasharray="5 5"
+                          dot={false}
+                          isAnimationActive={false}
+                        />
+                        <Line
+                          data={toPercentPoints(calibration[model.id].raw_curve)}
+                          dataKey="observed"
+                          name="Raw model"
+                          stroke="#f59e0b"
+                          strokeWidth={2}
+                        />
+                        <Line
+                          data={toPercentPoints(calibration[model.id].calibrated_curve)}
+                          dataKey="observed"
+                          name="Calibrated"
+                          stroke="#0ea5e9"
+                          strokeWidth={3}
+                        />
+                      </LineChart>
+                    </ResponsiveContainer>
+                  </div>
+                </div>
+              )}
+
               {/* Features */}
               {model.info && (
                 <div className="mt-8">
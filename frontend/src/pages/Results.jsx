@@ -1,9 +1,9 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useLocation, useNavigate } from 'react-router-dom'
 import { motion } from 'framer-motion'
 import { Activity, Heart, Download, RefreshCw, AlertCircle, Info } from 'lucide-react'
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts'
-import { predictionsAPI, reportsAPI } from '../api'
+import { predictionsAPI, reportsAPI, openWhatIfSocket } from '../api'
 
 export default function Results() {
   const location = useLocation()
@@ -14,6 +14,12 @@ export default function Results() {
   const [predictionId, setPredictionId] = useState(null)
   const [whatIfData, setWhatIfData] = useState(inputData || {})
   const [loading, setLoading] = useState(false)
+  // Socket edits and fallback POSTs are numbered separately: the server echoes
+  // socket sequence numbers, while POST responses are matched in the browser
+  const whatIfSeq = useRef(0)
+  const whatIfPost = useRef(0)
+  const whatIfTimeout = useRef(null)
+  const whatIfSocket = useRef(null)
 
   const diseaseName = disease === 'diabetes' ? 'Diabetes' : 'Heart Disease'
   const Icon = disease === 'diabetes' ? Activity : Heart
@@ -32,23 +38,76 @@ export default function Results() {
     }
   }, [initialPrediction, inputData])
 
+  // One authenticated connection for the simulator; edits stream over it without debouncing
+  useEffect(() => {
+    if (!disease || !inputData) return
+    const socket = openWhatIfSocket()
+    socket.onopen = () => {
+      socket.send(JSON.stringify({
+        token: localStorage.getItem('token'),
+        disease_type: disease,
+        input_data: inputData,
+        shap_method: 'approximate'
+      }))
+    }
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data)
+      // The server coalesces edits, so only the answer to the latest one matters
+      if (whatIfSeq.current === 0 || message.seq !== whatIfSeq.current) return
+      if (message.type === 'result') {
+        const { type, seq, ...result } = message
+        setPrediction(result)
+      } else {
+        console.error('What-if prediction error:', message.detail)
+      }
+      setLoading(false)
+    }
+    socket.onclose = () => {
+      if (whatIfSocket.current === socket) whatIfSocket.current = null
+    }
+    whatIfSocket.current = socket
+    return () => {
+      clearTimeout(whatIfTimeout.current)
+      socket.close()
+    }
+  }, [disease, inputData])
+
   const handleWhatIfChange = async (field, value) => {
     const newData = { ...whatIfData, [field]: value }
     setWhatIfData(newData)
     
-    clearTimeout(window.whatIfTimeout)
-    window.whatIfTimeout = setTimeout(async () => {
+    const socket = whatIfSocket.current
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      // The whole form goes along so edits made while the socket was connecting are not lost
+      // Drop any POST still pending from before the socket opened
+      clearTimeout(whatIfTimeout.current)
+      whatIfPost.current++
+      setLoading(true)
+      socket.send(JSON.stringify({ seq: ++whatIfSeq.current, changes: newData }))
+      return
+    }
+
+    // Without the socket, fall back to one debounced POST per pause in typing,
+    // and ignore responses that arrive after a newer request was sent.
+    clearTimeout(whatIfTimeout.current)
+    whatIfTimeout.current = setTimeout(async () => {
+      const request = ++whatIfPost.current
       setLoading(true)
       try {
         const response = await predictionsAPI.whatIf({
           disease_type: disease,
-          input_data: newData
+          input_data: newData,
+          shap_method: 'approximate'
         })
-        setPrediction(response.data)
+        if (request === whatIfPost.current) {
+          setPrediction(response.data)
+        }
       } catch (error) {
         console.error('What-if prediction error:', error)
       } finally {
-        setLoading(false)
+        if (request === whatIfPost.current) {
+          setLoading(false)
+        }
       }
     }, 500)
   }